@@ -226,7 +226,7 @@ def convert_conala(file: str) -> None:
     for task in tasks:
         sol = task.solution
         assert sol is not None
-        for P in sol.depth_first_iter():
+        for P in sol.post_order():
             if isinstance(P, Primitive):
                 primitives.add(P.primitive)
     print("Primitives:", primitives)
@@ -44,7 +44,7 @@ def __count_programs__(solution: Program, pcfg: ProbDetGrammar) -> int:
     if solution is None:
         return {None: None}
     counters: Dict[Program, Tuple[int, int]] = {}
-    for sub_program in solution.depth_first_iter():
+    for sub_program in solution.post_order():
         found: bool = False
         if isinstance(sub_program, Function):
             counter = 0
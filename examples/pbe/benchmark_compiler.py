@@ -0,0 +1,128 @@
+import os
+import sys
+from typing import Callable, List
+
+import tqdm
+
+from dsl_loader import add_dsl_choice_arg, load_DSL
+
+from synth import Dataset, PBE, Task
+from synth.semantic.evaluator import DSLEvaluatorWithConstant
+from synth.specification import PBEWithConstants
+from synth.syntax import CFG, ProbDetGrammar, enumerate_prob_grammar, Program
+from synth.utils import chrono
+
+import argparse
+
+parser = argparse.ArgumentParser(
+    description="Compare the evaluation of enumerated programs by the evaluator and by compiled programs"
+)
+parser.add_argument(
+    "-d",
+    "--dataset",
+    type=str,
+    default="{dsl_name}.pickle",
+    help="dataset (default: {dsl_name}}.pickle)",
+)
+add_dsl_choice_arg(parser)
+parser.add_argument(
+    "-n", "--tasks", type=int, default=20, help="number of tasks (default: 20)"
+)
+parser.add_argument(
+    "-p",
+    "--programs",
+    type=int,
+    default=10000,
+    help="number of programs per task (default: 10000)",
+)
+parser.add_argument(
+    "--max-depth", type=int, default=5, help="max depth of programs (default: 5)"
+)
+
+
+parameters = parser.parse_args()
+dsl_name: str = parameters.dsl
+dataset_file: str = parameters.dataset.format(dsl_name=dsl_name)
+max_tasks: int = parameters.tasks
+max_programs: int = parameters.programs
+max_depth: int = parameters.max_depth
+
+if not os.path.exists(dataset_file) or not os.path.isfile(dataset_file):
+    print("Dataset must be a valid dataset file!", file=sys.stderr)
+    sys.exit(1)
+
+
+def check_all(
+    programs: List[Program],
+    task: Task[PBE],
+    run: Callable[[Program], Callable],
+) -> int:
+    """
+    Evaluate each program on each example and each pair of constants like constants_injector in evaluate.py.
+    Return the number of programs correct on all examples.
+    """
+    constants_in, constants_out = [""], [""]
+    specification = task.specification.get_specification(PBEWithConstants)
+    if specification is not None:
+        constants_in = specification.constants_in or constants_in
+        constants_out = specification.constants_out or constants_out
+    solved = 0
+    for program in programs:
+        f = run(program)
+        solved += all(
+            any(
+                f(ex.inputs, cons_in, cons_out) == ex.output
+                for cons_in in constants_in
+                for cons_out in constants_out
+            )
+            for ex in task.specification.examples
+        )
+    return solved
+
+
+def main() -> None:
+    dsl_module = load_DSL(dsl_name)
+    dsl, evaluator = dsl_module.dsl, dsl_module.evaluator
+    print(f"Loading {dataset_file}...", end="")
+    with chrono.clock("dataset.load") as c:
+        full_dataset: Dataset[PBE] = Dataset.load(dataset_file)
+        print("done in", c.elapsed_time(), "s")
+    tasks = full_dataset.tasks[:max_tasks]
+    cfgs = {
+        t: CFG.depth_constraint(dsl, t, max_depth)
+        for t in set(task.type_request for task in tasks)
+    }
+    programs = {}
+    for t, cfg in cfgs.items():
+        programs[t] = []
+        for program in enumerate_prob_grammar(ProbDetGrammar.uniform(cfg)):
+            programs[t].append(program)
+            if len(programs[t]) >= max_programs:
+                break
+
+    if isinstance(evaluator, DSLEvaluatorWithConstant):
+        interpreter = lambda p: lambda input, cons_in, cons_out: (
+            evaluator.eval_with_constant(p, input, cons_in, cons_out)
+        )
+        compiled = lambda p: evaluator.compile(p)
+    else:
+        interpreter = lambda p: lambda input, cons_in, cons_out: evaluator.eval(
+            p, input
+        )
+        compiled = lambda p: (lambda f: lambda input, cons_in, cons_out: f(input))(
+            evaluator.compile(p)
+        )
+    times = {}
+    for name, run in [("interpreter", interpreter), ("compiled", compiled)]:
+        solved = 0
+        with chrono.clock(name) as c:
+            for task in tqdm.tqdm(tasks, desc=name):
+                evaluator.clear_cache()
+                solved += check_all(programs[task.type_request], task, run)
+            times[name] = c.elapsed_time()
+        print(f"{name}: {times[name]:.2f}s, {solved} correct programs")
+    print(f"Speedup: x{times['interpreter'] / max(1e-9, times['compiled']):.2f}")
+
+
+if __name__ == "__main__":
+    main()
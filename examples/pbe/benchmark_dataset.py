@@ -0,0 +1,128 @@
+import bz2
+import os
+import pickle
+import random
+import resource
+import sys
+from multiprocessing import Process, Queue
+from typing import Callable, Dict, Tuple
+
+from synth import Dataset, PBE
+from synth.chunked_dataset import ChunkedDataset, convert
+from synth.utils import chrono
+
+import argparse
+
+parser = argparse.ArgumentParser(
+    description="Compare the load time and peak memory of a dataset as a bz2 pickle and in the chunked format"
+)
+parser.add_argument("dataset", type=str, help="dataset file, in any format")
+parser.add_argument(
+    "--chunk-size",
+    type=int,
+    default=256,
+    help="number of tasks per compressed block (default: 256)",
+)
+parser.add_argument(
+    "-n",
+    "--accesses",
+    type=int,
+    default=1000,
+    help="number of random accesses (default: 1000)",
+)
+parser.add_argument("-s", "--seed", type=int, default=1, help="seed (default: 1)")
+
+
+parameters = parser.parse_args()
+dataset_file: str = parameters.dataset
+chunk_size: int = parameters.chunk_size
+accesses: int = parameters.accesses
+seed: int = parameters.seed
+
+if not os.path.exists(dataset_file) or not os.path.isfile(dataset_file):
+    print("Dataset must be a valid dataset file!", file=sys.stderr)
+    sys.exit(1)
+
+pickle_file = dataset_file + ".bench.bz2"
+chunked_file = dataset_file + ".bench.chunked"
+
+
+def load_pickle() -> None:
+    with bz2.BZ2File(pickle_file, "rb") as fd:
+        pickle.load(fd)
+
+
+def load_chunked() -> None:
+    Dataset.load(chunked_file)
+
+
+def iterate_chunked() -> None:
+    for _ in ChunkedDataset(chunked_file):
+        pass
+
+
+def random_access_pickle() -> None:
+    with bz2.BZ2File(pickle_file, "rb") as fd:
+        dataset: Dataset[PBE] = pickle.load(fd)
+    random.seed(seed)
+    for _ in range(accesses):
+        dataset[random.randrange(len(dataset))]
+
+
+def random_access_chunked() -> None:
+    dataset: Dataset[PBE] = ChunkedDataset(chunked_file)
+    random.seed(seed)
+    for _ in range(accesses):
+        dataset[random.randrange(len(dataset))]
+
+
+def measure(f: Callable[[], None], queue: Queue) -> None:
+    with chrono.clock("measure") as c:
+        f()
+        elapsed = c.elapsed_time()
+    # ru_maxrss is in KB on Linux
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10))
+
+
+def run(f: Callable[[], None]) -> Tuple[float, float]:
+    """
+    Run f in a fresh process so that its peak RSS is not shared with other measures.
+    """
+    queue: Queue = Queue()
+    process = Process(target=measure, args=(f, queue))
+    process.start()
+    result: Tuple[float, float] = queue.get()
+    process.join()
+    return result
+
+
+def main() -> None:
+    print(f"Loading {dataset_file}...", end="", flush=True)
+    with chrono.clock("dataset.load") as c:
+        full_dataset: Dataset[PBE] = Dataset.load(dataset_file)
+        print("done in", c.elapsed_time(), "s")
+    with bz2.BZ2File(pickle_file, "w") as fd:
+        pickle.dump(full_dataset, fd)
+    convert(dataset_file, chunked_file, chunk_size)
+    print(f"{len(full_dataset)} tasks")
+    print(f"bz2 pickle: {os.path.getsize(pickle_file) / 2**20:.1f}MB")
+    print(f"chunked: {os.path.getsize(chunked_file) / 2**20:.1f}MB")
+    del full_dataset
+
+    results: Dict[str, Tuple[float, float]] = {}
+    for name, f in [
+        ("pickle load", load_pickle),
+        ("chunked load", load_chunked),
+        ("chunked lazy iteration", iterate_chunked),
+        (f"pickle {accesses} random accesses", random_access_pickle),
+        (f"chunked {accesses} random accesses", random_access_chunked),
+    ]:
+        results[name] = run(f)
+        elapsed, peak = results[name]
+        print(f"{name}: {elapsed:.2f}s, peak RSS {peak:.0f}MB")
+    os.remove(pickle_file)
+    os.remove(chunked_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import os
+import sys
+from typing import Tuple
+
+import tqdm
+
+from dsl_loader import add_dsl_choice_arg, load_DSL
+
+from synth import Dataset, PBE, Task
+from synth.semantic import DSLEvaluator
+from synth.syntax import (
+    CFG,
+    ProbDetGrammar,
+    enumerate_prob_grammar,
+    enumerate_prob_grammar_bottom_up,
+)
+from synth.utils import chrono
+
+import argparse
+
+parser = argparse.ArgumentParser(
+    description="Compare the throughput of heap search and bottom-up search"
+)
+parser.add_argument(
+    "-d",
+    "--dataset",
+    type=str,
+    default="{dsl_name}.pickle",
+    help="dataset (default: {dsl_name}}.pickle)",
+)
+add_dsl_choice_arg(parser)
+parser.add_argument(
+    "-n", "--tasks", type=int, default=20, help="number of tasks (default: 20)"
+)
+parser.add_argument(
+    "--max-depth", type=int, default=5, help="max depth of programs (default: 5)"
+)
+parser.add_argument(
+    "-t", "--timeout", type=float, default=10, help="task timeout in s (default: 10)"
+)
+
+
+parameters = parser.parse_args()
+dsl_name: str = parameters.dsl
+dataset_file: str = parameters.dataset.format(dsl_name=dsl_name)
+max_tasks: int = parameters.tasks
+max_depth: int = parameters.max_depth
+task_timeout: float = parameters.timeout
+
+if not os.path.exists(dataset_file) or not os.path.isfile(dataset_file):
+    print("Dataset must be a valid dataset file!", file=sys.stderr)
+    sys.exit(1)
+
+
+def heap_search(
+    evaluator: DSLEvaluator, task: Task[PBE], pgrammar: ProbDetGrammar
+) -> Tuple[bool, int, float]:
+    programs = 0
+    with chrono.clock("heap_search") as c:
+        for program in enumerate_prob_grammar(pgrammar):
+            if c.elapsed_time() >= task_timeout:
+                break
+            programs += 1
+            if all(
+                evaluator.eval(program, ex.inputs) == ex.output
+                for ex in task.specification.examples
+            ):
+                return True, programs, c.elapsed_time()
+        return False, programs, c.elapsed_time()
+
+
+def bottom_up(
+    evaluator: DSLEvaluator, task: Task[PBE], pgrammar: ProbDetGrammar
+) -> Tuple[bool, int, float]:
+    """
+    Outputs are computed while building programs, programs with the same outputs are only generated once.
+    """
+    programs = 0
+    inputs = [ex.inputs for ex in task.specification.examples]
+    outputs = [ex.output for ex in task.specification.examples]
+    with chrono.clock("bottom_up") as c:
+        enumerator = enumerate_prob_grammar_bottom_up(pgrammar, evaluator, inputs)
+        for _ in enumerator:
+            if c.elapsed_time() >= task_timeout:
+                break
+            programs += 1
+            if enumerator.current_outputs == outputs:
+                return True, programs, c.elapsed_time()
+        return False, programs, c.elapsed_time()
+
+
+def main() -> None:
+    dsl_module = load_DSL(dsl_name)
+    dsl, evaluator = dsl_module.dsl, dsl_module.evaluator
+    print(f"Loading {dataset_file}...", end="")
+    with chrono.clock("dataset.load") as c:
+        full_dataset: Dataset[PBE] = Dataset.load(dataset_file)
+        print("done in", c.elapsed_time(), "s")
+    tasks = full_dataset.tasks[:max_tasks]
+    cfgs = {
+        t: CFG.depth_constraint(dsl, t, max_depth)
+        for t in set(task.type_request for task in tasks)
+    }
+    for name, search in [("heap_search", heap_search), ("bottom_up", bottom_up)]:
+        solved, programs, time = 0, 0, 0.0
+        for task in tqdm.tqdm(tasks, desc=name):
+            pgrammar = ProbDetGrammar.uniform(cfgs[task.type_request])
+            evaluator.clear_cache()
+            task_solved, task_programs, task_time = search(evaluator, task, pgrammar)
+            solved += task_solved
+            programs += task_programs
+            time += task_time
+        print(
+            f"{name}: solved {solved}/{len(tasks)} in {time:.2f}s,",
+            f"{programs} programs ({programs / max(1e-9, time):.0f} programs/s)",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import tracemalloc
+
+import tqdm
+
+from dsl_loader import add_dsl_choice_arg, load_DSL
+
+from synth import Dataset, PBE
+from synth.syntax import CFG, ProbDetGrammar, enumerate_prob_grammar
+from synth.utils import chrono
+
+import argparse
+
+parser = argparse.ArgumentParser(
+    description="Measure the memory used by the programs of an enumeration"
+)
+parser.add_argument(
+    "-d",
+    "--dataset",
+    type=str,
+    default="{dsl_name}.pickle",
+    help="dataset, its first task gives the type request (default: {dsl_name}}.pickle)",
+)
+add_dsl_choice_arg(parser)
+parser.add_argument(
+    "-p",
+    "--programs",
+    type=int,
+    default=1000000,
+    help="number of programs to enumerate (default: 1000000)",
+)
+parser.add_argument(
+    "--max-depth", type=int, default=5, help="max depth of programs (default: 5)"
+)
+
+
+parameters = parser.parse_args()
+dsl_name: str = parameters.dsl
+dataset_file: str = parameters.dataset.format(dsl_name=dsl_name)
+max_programs: int = parameters.programs
+max_depth: int = parameters.max_depth
+
+if not os.path.exists(dataset_file) or not os.path.isfile(dataset_file):
+    print("Dataset must be a valid dataset file!", file=sys.stderr)
+    sys.exit(1)
+
+
+def main() -> None:
+    dsl_module = load_DSL(dsl_name)
+    full_dataset: Dataset[PBE] = Dataset.load(dataset_file)
+    type_request = full_dataset.tasks[0].type_request
+    cfg = CFG.depth_constraint(dsl_module.dsl, type_request, max_depth)
+    pgrammar = ProbDetGrammar.uniform(cfg)
+
+    tracemalloc.start()
+    programs = []
+    with chrono.clock("enumeration") as c:
+        enumerator = enumerate_prob_grammar(pgrammar)
+        for program in tqdm.tqdm(enumerator, total=max_programs):
+            programs.append(program)
+            if len(programs) >= max_programs:
+                break
+        elapsed = c.elapsed_time()
+    # Only the programs remain
+    del enumerator
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Sub-programs are shared between programs
+    nodes = set()
+    for program in programs:
+        for sub_program in program.post_order():
+            nodes.add(id(sub_program))
+    print(f"{len(programs)} programs enumerated in {elapsed:.2f}s")
+    print(f"peak traced memory during the enumeration: {peak / 2**20:.1f}MB")
+    print(
+        f"traced memory held by the programs: {current / 2**20:.2f}MB,",
+        f"{len(nodes)} distinct nodes, {current / len(nodes):.0f} bytes per node",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import multiprocessing as mp
+import os
+import queue
+import sys
+from typing import List, Optional, Tuple
+
+import tqdm
+
+from dsl_loader import add_dsl_choice_arg, load_DSL
+
+from synth import Dataset, PBE, Task
+from synth.semantic import DSLEvaluator
+from synth.syntax import (
+    CFG,
+    ProbDetGrammar,
+    enumerate_prob_grammar,
+    split,
+    Program,
+)
+from synth.utils import chrono
+
+import argparse
+
+parser = argparse.ArgumentParser(
+    description="Compare heap search on a grammar against heap search on its splits racing in parallel"
+)
+parser.add_argument(
+    "-d",
+    "--dataset",
+    type=str,
+    default="{dsl_name}.pickle",
+    help="dataset (default: {dsl_name}}.pickle)",
+)
+add_dsl_choice_arg(parser)
+parser.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    default=mp.cpu_count(),
+    help="number of splits, one process per split (default: number of CPUs)",
+)
+parser.add_argument(
+    "-n", "--tasks", type=int, default=20, help="number of tasks (default: 20)"
+)
+parser.add_argument(
+    "--max-depth", type=int, default=5, help="max depth of programs (default: 5)"
+)
+parser.add_argument(
+    "-t", "--timeout", type=float, default=60, help="task timeout in s (default: 60)"
+)
+
+
+parameters = parser.parse_args()
+dsl_name: str = parameters.dsl
+dataset_file: str = parameters.dataset.format(dsl_name=dsl_name)
+workers: int = parameters.workers
+max_tasks: int = parameters.tasks
+max_depth: int = parameters.max_depth
+task_timeout: float = parameters.timeout
+
+if not os.path.exists(dataset_file) or not os.path.isfile(dataset_file):
+    print("Dataset must be a valid dataset file!", file=sys.stderr)
+    sys.exit(1)
+
+
+def search(
+    evaluator: DSLEvaluator, task: Task[PBE], pgrammar: ProbDetGrammar
+) -> Tuple[bool, int, Optional[Program]]:
+    programs = 0
+    with chrono.clock("search") as c:
+        for program in enumerate_prob_grammar(pgrammar):
+            if c.elapsed_time() >= task_timeout:
+                break
+            programs += 1
+            if all(
+                evaluator.eval(program, ex.inputs) == ex.output
+                for ex in task.specification.examples
+            ):
+                return True, programs, program
+    return False, programs, None
+
+
+def __race_worker__(
+    evaluator: DSLEvaluator,
+    task: Task[PBE],
+    pgrammar: ProbDetGrammar,
+    results: "mp.Queue[Tuple[bool, int, Optional[Program]]]",
+) -> None:
+    try:
+        results.put(search(evaluator, task, pgrammar))
+    except Exception as e:
+        print("Worker failed:", e, file=sys.stderr)
+        results.put((False, 0, None))
+
+
+def race(
+    evaluator: DSLEvaluator, task: Task[PBE], pgrammars: List[ProbDetGrammar]
+) -> Tuple[bool, int, Optional[Program]]:
+    """
+    Enumerate each grammar in its own process, the first one to find a solution wins.
+    """
+    ctx = mp.get_context("fork")
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=__race_worker__, args=(evaluator, task, pgrammar, results))
+        for pgrammar in pgrammars
+    ]
+    for process in processes:
+        process.start()
+    programs = 0
+    out: Tuple[bool, int, Optional[Program]] = (False, 0, None)
+    for _ in processes:
+        try:
+            solved, generated, program = results.get(timeout=task_timeout + 10)
+        except queue.Empty:
+            # a worker died without reporting
+            print("Race aborted: a worker did not answer in time!", file=sys.stderr)
+            break
+        programs += generated
+        out = (solved, programs, program)
+        if solved:
+            break
+    for process in processes:
+        process.terminate()
+        process.join()
+    return out
+
+
+def main() -> None:
+    dsl_module = load_DSL(dsl_name)
+    dsl, evaluator = dsl_module.dsl, dsl_module.evaluator
+    print(f"Loading {dataset_file}...", end="")
+    with chrono.clock("dataset.load") as c:
+        full_dataset: Dataset[PBE] = Dataset.load(dataset_file)
+        print("done in", c.elapsed_time(), "s")
+    tasks = full_dataset.tasks[:max_tasks]
+    cfgs = {
+        t: CFG.depth_constraint(dsl, t, max_depth)
+        for t in set(task.type_request for task in tasks)
+    }
+    single_time, race_time, split_time = 0.0, 0.0, 0.0
+    single_solved, race_solved = 0, 0
+    for task in tqdm.tqdm(tasks, desc="Tasks"):
+        pgrammar = ProbDetGrammar.uniform(cfgs[task.type_request])
+        with chrono.clock("single") as c:
+            solved, _, _ = search(evaluator, task, pgrammar)
+            single_time += c.elapsed_time()
+        single_solved += solved
+        with chrono.clock("split") as c:
+            pgrammars, _ = split(pgrammar, workers)
+            split_time += c.elapsed_time()
+        with chrono.clock("race") as c:
+            solved, _, _ = race(evaluator, task, pgrammars)
+            race_time += c.elapsed_time()
+        race_solved += solved
+    print(
+        f"Single heap search: solved {single_solved}/{len(tasks)} in {single_time:.2f}s"
+    )
+    print(
+        f"{workers} racing heap searches: solved {race_solved}/{len(tasks)} in {race_time:.2f}s",
+        f"(+{split_time:.2f}s to split)",
+    )
+    print(f"Speedup: x{single_time / max(1e-9, race_time + split_time):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+import pickle
+import sys
+from typing import Generator, List
+
+from dsl_loader import add_dsl_choice_arg, load_DSL
+
+from synth import Dataset, PBE
+from synth.syntax import CFG, ProbDetGrammar, Function, Program
+from synth.utils import chrono
+
+import argparse
+
+parser = argparse.ArgumentParser(
+    description="Compare the traversal of deep programs by nested generators and by the cached post-order"
+)
+parser.add_argument(
+    "-d",
+    "--dataset",
+    type=str,
+    default="{dsl_name}.pickle",
+    help="dataset, its type requests are used (default: {dsl_name}}.pickle)",
+)
+add_dsl_choice_arg(parser)
+parser.add_argument(
+    "-n",
+    "--programs",
+    type=int,
+    default=10000,
+    help="number of sampled programs (default: 10000)",
+)
+parser.add_argument(
+    "--max-depth", type=int, default=12, help="max depth of programs (default: 12)"
+)
+parser.add_argument(
+    "--min-depth",
+    type=int,
+    default=8,
+    help="min depth of the sampled programs (default: 8)",
+)
+parser.add_argument("-s", "--seed", type=int, default=1, help="seed (default: 1)")
+
+
+parameters = parser.parse_args()
+dsl_name: str = parameters.dsl
+dataset_file: str = parameters.dataset.format(dsl_name=dsl_name)
+nb_programs: int = parameters.programs
+max_depth: int = parameters.max_depth
+min_depth: int = parameters.min_depth
+seed: int = parameters.seed
+
+if not os.path.exists(dataset_file) or not os.path.isfile(dataset_file):
+    print("Dataset must be a valid dataset file!", file=sys.stderr)
+    sys.exit(1)
+
+
+def nested_generators(program: Program) -> Generator[Program, None, None]:
+    """
+    The traversal by nested generators, each node is yielded through the generators of all its ancestors.
+    """
+    if isinstance(program, Function):
+        for sub in nested_generators(program.function):
+            yield sub
+        for arg in program.arguments:
+            for sub in nested_generators(arg):
+                yield sub
+    yield program
+
+
+def traverse_all(programs: List[Program], traversal: str) -> int:
+    nodes = 0
+    for program in programs:
+        iterable = (
+            nested_generators(program)
+            if traversal == "generators"
+            else program.post_order()
+        )
+        for _ in iterable:
+            nodes += 1
+    return nodes
+
+
+def main() -> None:
+    dsl_module = load_DSL(dsl_name)
+    full_dataset: Dataset[PBE] = Dataset.load(dataset_file)
+    type_requests = sorted(full_dataset.type_requests(), key=str)
+    programs: List[Program] = []
+    for i, type_request in enumerate(type_requests):
+        cfg = CFG.depth_constraint(dsl_module.dsl, type_request, max_depth)
+        pgrammar = ProbDetGrammar.uniform(cfg)
+        pgrammar.init_sampling(seed)
+        wanted = (nb_programs * (i + 1)) // len(type_requests)
+        tries = 0
+        while len(programs) < wanted and tries < 100 * nb_programs:
+            tries += 1
+            program = pgrammar.sample_program()
+            if program.depth() >= min_depth:
+                programs.append(program)
+    # Fresh copies so that no post-order is cached yet
+    fresh = pickle.dumps(programs)
+    nodes = sum(program.length() for program in programs)
+    depth = sum(program.depth() for program in programs) / max(1, len(programs))
+    print(f"{len(programs)} programs, mean depth {depth:.1f}, {nodes} nodes")
+    times = {}
+    for name in ["generators", "post-order (first)", "post-order (cached)"]:
+        if name != "post-order (cached)":
+            programs = pickle.loads(fresh)
+        with chrono.clock(name) as c:
+            traverse_all(programs, name)
+            times[name] = c.elapsed_time()
+        print(
+            f"{name}: {times[name]:.3f}s, {nodes / max(1e-9, times[name]):.0f} nodes/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
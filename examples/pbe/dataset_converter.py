@@ -0,0 +1,62 @@
+import argparse
+import os
+
+from synth import Dataset
+from synth.chunked_dataset import convert
+from synth.pbe import ColumnarDataset
+from synth.utils import chrono
+
+
+parser = argparse.ArgumentParser(
+    description="Convert a dataset saved as a single bz2 pickle to the chunked dataset format, or to a columnar dataset folder"
+)
+parser.add_argument("dataset", type=str, help="dataset file to convert")
+parser.add_argument(
+    "-o",
+    "--output",
+    type=str,
+    default=None,
+    help="output file, or folder with --columnar (default: replaces the dataset file)",
+)
+parser.add_argument(
+    "--chunk-size",
+    type=int,
+    default=256,
+    help="number of tasks per compressed block (default: 256)",
+)
+
+parser.add_argument(
+    "--columnar",
+    action="store_true",
+    default=False,
+    help="write a memory-mapped columnar dataset folder, only for tasks with ints, bools and lists of ints",
+)
+
+parameters = parser.parse_args()
+dataset_file: str = parameters.dataset
+output_file: str = parameters.output or dataset_file
+chunk_size: int = parameters.chunk_size
+columnar: bool = parameters.columnar
+
+if columnar:
+    if parameters.output is None:
+        parser.error("--columnar requires an output folder")
+    print(f"Converting {dataset_file}...", end="", flush=True)
+    with chrono.clock("dataset.convert") as c:
+        dataset = Dataset.load(dataset_file, lazy=True)
+        ColumnarDataset.write(output_file, dataset, dataset.metadata)
+        print("done in", c.elapsed_time(), "s")
+    size = sum(
+        os.path.getsize(os.path.join(output_file, name))
+        for name in os.listdir(output_file)
+    )
+    print(f"{size / 2**20:.1f}MB written to {output_file}")
+    parser.exit()
+
+print(f"Converting {dataset_file}...", end="", flush=True)
+with chrono.clock("dataset.convert") as c:
+    # Write next to the output so that the dataset can be replaced in place
+    convert(dataset_file, output_file + ".tmp", chunk_size)
+    os.replace(output_file + ".tmp", output_file)
+    print("done in", c.elapsed_time(), "s")
+print(f"{os.path.getsize(output_file) / 2**20:.1f}MB written to {output_file}")
@@ -1,7 +1,14 @@
 import argparse
+from multiprocessing import Pool
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
 from dsl_loader import add_dsl_choice_arg, load_DSL
 
 from synth import Dataset, PBE
+from synth.pbe.task_generator import TaskGenerator
+from synth.syntax import Program, Type
 from synth.utils import chrono, gen_take
 
 DREAMCODER = "dreamcoder"
@@ -44,6 +51,18 @@ parser.add_argument(
     default=False,
     help="does not try to generate unique tasks",
 )
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="number of worker processes, with more than one the dataset is generated in shards and the output file is a manifest of the shards (default: 1)",
+)
+parser.add_argument(
+    "--shard-size",
+    type=int,
+    default=0,
+    help="number of tasks per shard (default: the dataset size divided by the number of workers)",
+)
 parameters = parser.parse_args()
 dsl_name: str = parameters.dsl
 dataset_file: str = parameters.dataset.format(dsl_name=dsl_name)
@@ -53,6 +72,8 @@ max_depth: int = parameters.max_depth
 gen_dataset_size: int = parameters.size
 uniform: bool = parameters.uniform
 no_unique: bool = parameters.no_unique
+workers: int = parameters.workers
+shard_size: int = parameters.shard_size or -(-gen_dataset_size // max(1, workers))
 # ================================
 # Load constants specific to DSL
 # ================================
@@ -72,14 +93,24 @@ if dsl_name == DREAMCODER:
 # ================================
 # Load dataset & Task Generator
 # ================================
-# Load dataset
-print(f"Loading {dataset_file}...", end="")
-with chrono.clock("dataset.load") as c:
-    full_dataset: Dataset[PBE] = Dataset.load(dataset_file)
-    print("done in", c.elapsed_time(), "s")
-# Reproduce dataset distribution
-print("Reproducing dataset...", end="", flush=True)
-with chrono.clock("dataset.reproduce") as c:
+metadata = {
+    "seed": seed,
+    "max_depth": max_depth,
+    "dsl": dsl_name,
+    "max_list_length": max_list_length,
+}
+
+
+def load_dataset() -> Dataset[PBE]:
+    print(f"Loading {dataset_file}...", end="")
+    with chrono.clock("dataset.load") as c:
+        full_dataset: Dataset[PBE] = Dataset.load(dataset_file)
+        print("done in", c.elapsed_time(), "s")
+    return full_dataset
+
+
+def reproduce(full_dataset: Dataset[PBE], seed: int) -> Tuple[TaskGenerator, List]:
+    # Reproduce dataset distribution
     task_generator, lexicon = reproduce_dataset(
         full_dataset,
         dsl,
@@ -89,32 +120,147 @@ with chrono.clock("dataset.reproduce") as c:
         default_max_depth=max_depth,
         uniform_pgrammar=uniform,
     )
-    print("done in", c.elapsed_time(), "s")
-# Add some exceptions that are ignored during task generation
-task_generator.skip_exceptions.add(TypeError)
-task_generator.uniques = not no_unique
-task_generator.verbose = True
-print("Generating dataset...", gen_dataset_size, end="", flush=True)
-with chrono.clock("dataset.generate") as c:
-    gen_dataset = Dataset(
-        gen_take(task_generator.generator(), gen_dataset_size, progress=True),
-        {
-            "seed": seed,
-            "max_depth": max_depth,
-            "dsl": dsl_name,
-            "max_list_length": max_list_length,
-        },
+    # Add some exceptions that are ignored during task generation
+    task_generator.skip_exceptions.add(TypeError)
+    task_generator.uniques = not no_unique
+    return task_generator, lexicon
+
+
+def generate() -> None:
+    full_dataset = load_dataset()
+    print("Reproducing dataset...", end="", flush=True)
+    with chrono.clock("dataset.reproduce") as c:
+        task_generator, lexicon = reproduce(full_dataset, seed)
+        print("done in", c.elapsed_time(), "s")
+    task_generator.verbose = True
+    print("Generating dataset...", gen_dataset_size, end="", flush=True)
+    with chrono.clock("dataset.generate") as c:
+        gen_dataset = Dataset(
+            gen_take(task_generator.generator(), gen_dataset_size, progress=True),
+            metadata,
+        )
+        print("done in", c.elapsed_time(), "s")
+    print("Saving dataset...", end="", flush=True)
+    with chrono.clock("dataset.save") as c:
+        gen_dataset.save(output_file)
+        print("done in", c.elapsed_time(), "s")
+    print_stats(gen_dataset.type_requests(), lexicon)
+
+
+# ================================
+# Sharded generation
+# ================================
+def shard_seed(index: int) -> int:
+    """
+    Seed of the index-th shard, derived from the seed of the dataset.
+    """
+    return int(np.random.SeedSequence([seed, index]).generate_state(1)[0])
+
+
+def shard_file(index: int) -> str:
+    root, ext = os.path.splitext(output_file)
+    return f"{root}.shard{index:04d}{ext}"
+
+
+# The dataset to reproduce, loaded once by each worker
+worker_dataset: Optional[Dataset[PBE]] = None
+
+
+def init_worker() -> None:
+    global worker_dataset
+    worker_dataset = Dataset.load(dataset_file)
+
+
+def generate_shard(job: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Generate the index-th shard with size tasks and save it in its file.
+    """
+    index, size = job
+    assert worker_dataset is not None
+    task_generator, _ = reproduce(worker_dataset, shard_seed(index))
+    shard = Dataset(
+        gen_take(task_generator.generator(), size),
+        {**metadata, "seed": shard_seed(index)},
     )
-    print("done in", c.elapsed_time(), "s")
-print("Saving dataset...", end="", flush=True)
-with chrono.clock("dataset.save") as c:
-    gen_dataset.save(output_file)
-    print("done in", c.elapsed_time(), "s")
+    shard.save(shard_file(index))
+    return index, len(shard)
+
+
+def deduplicate(index: int, solutions: Set[Program], types: Set[Type]) -> int:
+    """
+    Remove from the index-th shard the tasks whose solution is in solutions, which is updated.
+    Return the number of remaining tasks.
+    """
+    shard: Dataset[PBE] = Dataset.load(shard_file(index))
+    tasks = []
+    for task in shard:
+        if task.solution is not None and not no_unique:
+            if task.solution in solutions:
+                continue
+            solutions.add(task.solution)
+        tasks.append(task)
+        types.add(task.type_request)
+    if len(tasks) < len(shard):
+        Dataset(tasks, shard.metadata).save(shard_file(index))
+    return len(tasks)
+
+
+def generate_sharded() -> None:
+    """
+    Each shard is generated by a worker with its own seed, then the shards are deduplicated in order:
+    a task is dropped if its solution is the solution of a task of a previous shard.
+    Shards are generated by rounds until the dataset has the requested size, so the output
+    only depends on the seed, the dataset size and the shard size.
+    """
+    lexicon = reproduce(load_dataset(), seed)[1]
+    shards: List[Dict[str, Any]] = []
+    solutions: Set[Program] = set()
+    types: Set[Type] = set()
+    total = 0
+    jobs: List[Tuple[int, int]] = []
+    print("Generating dataset...", gen_dataset_size, flush=True)
+    with chrono.clock("dataset.generate") as c, Pool(
+        workers, initializer=init_worker
+    ) as pool:
+        while total < gen_dataset_size:
+            missing = gen_dataset_size - total
+            if shards and all(shard["size"] == 0 for shard in shards[-len(jobs) :]):
+                print("The last round only generated duplicates, stopping.")
+                break
+            jobs = [
+                (len(shards) + i, min(shard_size, missing - i * shard_size))
+                for i in range(-(-missing // shard_size))
+            ]
+            for index, size in pool.imap(generate_shard, jobs):
+                kept = deduplicate(index, solutions, types)
+                total += kept
+                shards.append(
+                    {
+                        "file": os.path.basename(shard_file(index)),
+                        "size": kept,
+                        "seed": shard_seed(index),
+                        "duplicates": size - kept,
+                    }
+                )
+                print(
+                    f"shard {index}: {kept} tasks ({size - kept} duplicates), {total}/{gen_dataset_size} in {c.elapsed_time():.1f}s",
+                    flush=True,
+                )
+        print("done in", c.elapsed_time(), "s")
+    Dataset.save_manifest(output_file, shards, metadata)
+    print_stats(types, lexicon)
+
 
 # ================================
 # Print some stats
 # ================================
-# Generate the CFG dictionnary
-all_type_requests = gen_dataset.type_requests()
-print(f"{len(all_type_requests)} type requests supported.")
-print(f"Lexicon: [{min(lexicon)};{max(lexicon)}]")
+def print_stats(all_type_requests: Set[Type], lexicon: List) -> None:
+    print(f"{len(all_type_requests)} type requests supported.")
+    print(f"Lexicon: [{min(lexicon)};{max(lexicon)}]")
+
+
+if __name__ == "__main__":
+    if workers > 1:
+        generate_sharded()
+    else:
+        generate()
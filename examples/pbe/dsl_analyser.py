@@ -207,7 +207,7 @@ def produce_all_variants(possibles: List[List[T]]) -> Generator[List[T], None, N
 
 def vars(program: Program) -> List[Variable]:
     variables = []
-    for p in program.depth_first_iter():
+    for p in program.post_order():
         if isinstance(p, Variable):
             variables.append(p)
     return variables
@@ -215,7 +215,7 @@ def vars(program: Program) -> List[Variable]:
 
 def constants(program: Program) -> List[Variable]:
     consts = []
-    for p in program.depth_first_iter():
+    for p in program.post_order():
         if isinstance(p, Primitive) and not isinstance(p.type, Arrow):
             consts.append(p)
     return consts
@@ -224,7 +224,7 @@ def constants(program: Program) -> List[Variable]:
 def dump_primitives(program: Program) -> List[str]:
     pattern = []
     # Find all variables
-    for p in program.depth_first_iter():
+    for p in program.post_order():
         if isinstance(p, Primitive):
             pattern.append(p.primitive)
     return pattern
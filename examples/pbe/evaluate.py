@@ -1,8 +1,8 @@
-import atexit
 from collections import defaultdict
+import multiprocessing as mp
 import os
 import sys
-from typing import Callable, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 import csv
 import pickle
 
@@ -29,18 +29,25 @@ from synth.nn import (
     free_pytorch_memory,
 )
 from synth.pbe import IOEncoder
+from synth.pruning import ObservationalEquivalencePruner
 from synth.semantic import DSLEvaluator
 from synth.semantic.evaluator import DSLEvaluatorWithConstant
+from synth.semantic.limits import EvaluationLimits
 from synth.specification import Example, PBEWithConstants
 from synth.syntax import (
     CFG,
     ProbDetGrammar,
     enumerate_prob_grammar,
+    enumerate_prob_grammar_array,
+    enumerate_prob_grammar_bounded,
     enumerate_bucket_prob_grammar,
+    enumerate_prob_grammar_bottom_up,
+    PCFGStore,
     DSL,
     Program,
 )
-from synth.syntax.grammars.heap_search import HSEnumerator
+from synth.syntax.grammars.bottom_up_search import BottomUpSearch
+from synth.syntax.grammars.heap_search import CostBandSearch, HSEnumerator
 from synth.syntax.program import Function, Primitive, Variable
 from synth.syntax.type_system import STRING, Arrow
 from synth.utils import chrono
@@ -61,12 +68,18 @@ parser.add_argument(
     "--search",
     type=str,
     default="heap_search",
-    help="enumeration algorithm (default: heap_search)",
+    help="enumeration algorithm: heap_search, array_heap_search, cost_band_search, bucket_search, bottom_up (default: heap_search)",
 )
 add_dsl_choice_arg(parser)
 parser.add_argument(
     "-o", "--output", type=str, default="./", help="output folder (default: './')"
 )
+parser.add_argument(
+    "--cfg-cache",
+    type=str,
+    default=None,
+    help="folder where built grammars are cached to be loaded by the next runs (default: none)",
+)
 gg = parser.add_argument_group("model parameters")
 gg.add_argument(
     "-v",
@@ -100,6 +113,70 @@ g.add_argument(
 parser.add_argument(
     "-t", "--timeout", type=float, default=300, help="task timeout in s (default: 300)"
 )
+parser.add_argument(
+    "--observational-equivalence",
+    action="store_true",
+    default=False,
+    help="do not build programs from sub-programs with the same outputs as more probable ones",
+)
+parser.add_argument(
+    "--eval-batch",
+    type=int,
+    default=1,
+    help="number of enumerated programs evaluated at once (default: 1)",
+)
+parser.add_argument(
+    "--cache-size",
+    type=int,
+    default=None,
+    help="bound the evaluation cache to this number of values, least recently used ones are evicted (default: unbounded)",
+)
+parser.add_argument(
+    "--cache-memory",
+    type=int,
+    default=None,
+    help="bound the memory used by the values of the evaluation cache to about this number of bytes, least recently used ones are evicted (default: unbounded)",
+)
+g = parser.add_argument_group(
+    "evaluation limits, an evaluation that exceeds them fails"
+)
+g.add_argument(
+    "--max-steps",
+    type=int,
+    default=None,
+    help="max semantic calls per evaluation, a call costs 1 plus the length of its list or string argument (default: unbounded)",
+)
+g.add_argument(
+    "--max-list-length",
+    type=int,
+    default=None,
+    help="max length of intermediate lists (default: unbounded)",
+)
+g.add_argument(
+    "--max-string-length",
+    type=int,
+    default=None,
+    help="max length of intermediate strings (default: unbounded)",
+)
+g.add_argument(
+    "--max-int",
+    type=int,
+    default=None,
+    help="max absolute value of intermediate integers (default: unbounded)",
+)
+parser.add_argument(
+    "--keep-cache",
+    action="store_true",
+    default=False,
+    help="keep the evaluation cache between tasks instead of clearing it",
+)
+parser.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    default=1,
+    help="number of processes solving tasks in parallel (default: 1)",
+)
 
 
 parameters = parser.parse_args()
@@ -113,6 +190,31 @@ encoding_dimension: int = parameters.encoding_dimension
 hidden_size: int = parameters.hidden_size
 task_timeout: float = parameters.timeout
 batch_size: int = parameters.batch_size
+workers: int = parameters.workers
+eval_batch: int = parameters.eval_batch
+observational_equivalence: bool = parameters.observational_equivalence
+cfg_cache: Optional[str] = parameters.cfg_cache
+cache_size: Optional[int] = parameters.cache_size
+keep_cache: bool = parameters.keep_cache
+cache_memory: Optional[int] = parameters.cache_memory
+limits = (
+    EvaluationLimits(
+        parameters.max_steps,
+        parameters.max_list_length,
+        parameters.max_string_length,
+        parameters.max_int,
+    )
+    if any(
+        limit is not None
+        for limit in [
+            parameters.max_steps,
+            parameters.max_list_length,
+            parameters.max_string_length,
+            parameters.max_int,
+        ]
+    )
+    else None
+)
 
 
 if not os.path.exists(model_file) or not os.path.isfile(model_file):
@@ -124,12 +226,28 @@ elif not os.path.exists(dataset_file) or not os.path.isfile(dataset_file):
 
 if search_algo == "heap_search":
     custom_enumerate = enumerate_prob_grammar
+elif search_algo == "array_heap_search":
+    custom_enumerate = enumerate_prob_grammar_array
+elif search_algo == "cost_band_search":
+    custom_enumerate = enumerate_prob_grammar_bounded
 elif search_algo == "bucket_search":
     custom_enumerate = lambda x: enumerate_bucket_prob_grammar(x, 3)
     # TODO: add parameter for bucket_search size
+elif search_algo == "bottom_up":
+    custom_enumerate = enumerate_prob_grammar_bottom_up
 else:
     print(
-        "search algorithm must be a valid name (heap_search / bucket_search)!",
+        "search algorithm must be a valid name (heap_search / array_heap_search / cost_band_search / bucket_search / bottom_up)!",
+        file=sys.stderr,
+    )
+    sys.exit(1)
+if observational_equivalence and search_algo not in [
+    "heap_search",
+    "bucket_search",
+    "bottom_up",
+]:
+    print(
+        "--observational-equivalence is only supported by heap_search, bucket_search and bottom_up!",
         file=sys.stderr,
     )
     sys.exit(1)
@@ -173,7 +291,7 @@ def load_dataset() -> Tuple[
 @torch.no_grad()
 def produce_pcfgs(
     full_dataset: Dataset[PBE], dsl: DSL, lexicon: List[int]
-) -> List[CFG]:
+) -> PCFGStore:
     # ================================
     # Load already done PCFGs
     # ================================
@@ -184,11 +302,12 @@ def produce_pcfgs(
         else (len(model_file) - model_file[::-1].index(os.path.sep))
     )
     model_name = model_file[start_index : model_file.index(".", start_index)]
-    file = os.path.join(dir, f"pcfgs_{dataset_name}_{model_name}.pickle")
-    pcfgs: List[ProbDetGrammar] = []
-    if os.path.exists(file):
-        with open(file, "rb") as fd:
-            pcfgs = pickle.load(fd)
+    file = os.path.join(dir, f"pcfgs_{dataset_name}_{model_name}")
+    pcfgs: PCFGStore = PCFGStore(file)
+    # Convert the PCFGs of a previous version saved as a single pickle
+    if len(pcfgs) == 0 and os.path.exists(file + ".pickle"):
+        with open(file + ".pickle", "rb") as fd:
+            pcfgs.extend(pickle.load(fd))
     tasks = full_dataset.tasks
     done = len(pcfgs)
     # ================================
@@ -209,7 +328,9 @@ def produce_pcfgs(
     else:
         max_depth = 10  # TODO: set as parameter
     cfgs = [
-        CFG.depth_constraint(dsl, t, max_depth, min_variable_depth=0)
+        CFG.depth_constraint(
+            dsl, t, max_depth, min_variable_depth=0, cache_folder=cfg_cache
+        )
         for t in all_type_requests
     ]
 
@@ -248,12 +369,6 @@ def produce_pcfgs(
     # ================================
     # Predict PCFG
     # ================================
-    def save_pcfgs() -> None:
-        with open(file, "wb") as fd:
-            pickle.dump(pcfgs, fd)
-
-    atexit.register(save_pcfgs)
-
     pbar = tqdm.tqdm(total=len(tasks) - done, desc="PCFG prediction")
     while done < len(tasks):
         end = min(len(tasks), done + batch_size)
@@ -261,17 +376,14 @@ def produce_pcfgs(
         pbar.update(end - done)
         done = end
         batch_outputs = predictor(batch)
-
-        for task, tensor in zip(batch, batch_outputs):
-            pcfgs.append(
-                predictor.bigram_layer.tensor2log_prob_grammar(
-                    tensor, task.type_request
-                ).to_prob_det_grammar()
-            )
+        # Each batch is appended to the store on disk
+        pcfgs.extend(
+            predictor.bigram_layer.tensor2log_prob_grammar(
+                tensor, task.type_request
+            ).to_prob_det_grammar()
+            for task, tensor in zip(batch, batch_outputs)
+        )
     pbar.close()
-    with open(file, "wb") as fd:
-        pickle.dump(pcfgs, fd)
-    atexit.unregister(save_pcfgs)
     del predictor
     free_pytorch_memory()
     return pcfgs
@@ -296,21 +408,26 @@ def save(trace: Iterable) -> None:
 def enumerative_search(
     dataset: Dataset[PBE],
     evaluator: DSLEvaluatorWithConstant,
-    pcfgs: List[ProbDetGrammar],
+    pcfgs: PCFGStore,
     trace: List[Tuple[bool, float]],
     method: Callable[
         [DSLEvaluatorWithConstant, Task[PBE], ProbDetGrammar],
         Tuple[bool, float, int, Optional[Program]],
     ],
     custom_enumerate: Callable[[ProbDetGrammar], HSEnumerator],
+    workers: int = 1,
 ) -> None:
-
+    if workers > 1:
+        parallel_enumerative_search(
+            dataset, evaluator, pcfgs, trace, method, custom_enumerate, workers
+        )
+        return
     start = len(trace)
     pbar = tqdm.tqdm(total=len(pcfgs) - start, desc="Tasks", smoothing=0)
     i = 0
     solved = 0
     total = 0
-    for task, pcfg in zip(dataset.tasks[start:], pcfgs[start:]):
+    for task, pcfg in zip(dataset.tasks[start:], pcfgs.iterate(start)):
         total += 1
         try:
             out = method(evaluator, task, pcfg, custom_enumerate)
@@ -331,26 +448,151 @@ def enumerative_search(
     pbar.close()
 
 
+# Each worker process owns its own copy of these objects
+__worker_context: Dict[str, Any] = {}
+
+
+def __init_worker__(
+    evaluator: DSLEvaluatorWithConstant,
+    method: Callable,
+    custom_enumerate: Callable[[ProbDetGrammar], HSEnumerator],
+) -> None:
+    __worker_context["evaluator"] = evaluator
+    __worker_context["method"] = method
+    __worker_context["custom_enumerate"] = custom_enumerate
+
+
+def __solve_task__(
+    args: Tuple[Task[PBE], ProbDetGrammar]
+) -> Tuple[bool, float, int, Optional[Program]]:
+    task, pcfg = args
+    evaluator = __worker_context["evaluator"]
+    try:
+        return __worker_context["method"](
+            evaluator, task, pcfg, __worker_context["custom_enumerate"]
+        )
+    finally:
+        evaluator.clear_cache()
+
+
+def parallel_enumerative_search(
+    dataset: Dataset[PBE],
+    evaluator: DSLEvaluatorWithConstant,
+    pcfgs: PCFGStore,
+    trace: List[Tuple[bool, float]],
+    method: Callable[
+        [DSLEvaluatorWithConstant, Task[PBE], ProbDetGrammar],
+        Tuple[bool, float, int, Optional[Program]],
+    ],
+    custom_enumerate: Callable[[ProbDetGrammar], HSEnumerator],
+    workers: int,
+) -> None:
+    """
+    Same as enumerative_search but tasks are dispatched to a pool of worker processes.
+    Each worker has its own evaluator and receives a pickled copy of the grammar of its task,
+    the task timeout is enforced independently in each worker.
+    Results are collected in task order so the trace is the same as a serial run.
+    """
+    start = len(trace)
+    pbar = tqdm.tqdm(total=len(pcfgs) - start, desc="Tasks", smoothing=0)
+    solved = 0
+    total = 0
+    # fork so that workers inherit the evaluator and the enumeration method as is
+    ctx = mp.get_context("fork")
+    with ctx.Pool(
+        workers,
+        initializer=__init_worker__,
+        initargs=(evaluator, method, custom_enumerate),
+    ) as pool:
+        try:
+            for out in pool.imap(
+                __solve_task__, zip(dataset.tasks[start:], pcfgs.iterate(start))
+            ):
+                total += 1
+                trace.append(out)
+                if out[0]:
+                    solved += 1
+                pbar.update(1)
+                if total % 10 == 0:
+                    pbar.set_postfix_str("Saving...")
+                    save(trace)
+                pbar.set_postfix_str(f"Solved {solved}/{total}")
+        except KeyboardInterrupt:
+            pool.terminate()
+
+    pbar.close()
+
+
+# Memory counters of cost_band_search over the tasks:
+# the max number of programs stored at once and the total number of band splits
+band_stats = {"peak_stored": 0, "splits": 0}
+# The cost band search of the last task, counted once it is done
+__last_band_search: List[CostBandSearch] = []
+
+
+def record_band_stats() -> None:
+    while __last_band_search:
+        enumerator = __last_band_search.pop()
+        band_stats["peak_stored"] = max(
+            band_stats["peak_stored"], enumerator.peak_stored
+        )
+        band_stats["splits"] += enumerator.splits
+
+
+def make_enumerator(
+    evaluator: DSLEvaluator,
+    inputs: List[List],
+    pcfg: ProbDetGrammar,
+    custom_enumerate: Callable[[ProbDetGrammar], HSEnumerator],
+) -> HSEnumerator:
+    record_band_stats()
+    enumerator = custom_enumerate(pcfg)
+    if isinstance(enumerator, CostBandSearch):
+        __last_band_search.append(enumerator)
+    if observational_equivalence and isinstance(enumerator, HSEnumerator):
+        enumerator.pruner = ObservationalEquivalencePruner(evaluator, inputs)
+    if isinstance(enumerator, BottomUpSearch) and isinstance(evaluator, DSLEvaluator):
+        # Programs are evaluated while being built and deduplicated by outputs
+        enumerator.evaluator = evaluator
+        enumerator.inputs = inputs
+    return enumerator
+
+
 def base(
     evaluator: DSLEvaluator,
     task: Task[PBE],
     pcfg: ProbDetGrammar,
     custom_enumerate: Callable[[ProbDetGrammar], HSEnumerator],
 ) -> Tuple[bool, float, int, Optional[Program]]:
+    if eval_batch > 1 and isinstance(evaluator, DSLEvaluator):
+        return batched_base(evaluator, task, pcfg, custom_enumerate)
     time = 0.0
     programs = 0
+    inputs = [ex.inputs for ex in task.specification.examples]
+    outputs = [ex.output for ex in task.specification.examples]
     with chrono.clock("search.base") as c:
-
-        for program in custom_enumerate(pcfg):
+        enumerator = make_enumerator(evaluator, inputs, pcfg, custom_enumerate)
+        # sub-programs are unique objects thus their outputs can be reused
+        incremental = isinstance(evaluator, DSLEvaluator) and isinstance(
+            enumerator, HSEnumerator
+        )
+        for program in enumerator:
             time = c.elapsed_time()
             if time >= task_timeout:
                 return (False, time, programs, None, None)
             programs += 1
             failed = False
-            for ex in task.specification.examples:
-                if evaluator.eval(program, ex.inputs) != ex.output:
-                    failed = True
-                    break
+            if (
+                isinstance(enumerator, BottomUpSearch)
+                and enumerator.current_outputs is not None
+            ):
+                failed = enumerator.current_outputs != outputs
+            elif incremental:
+                failed = not evaluator.check_incremental(
+                    program, task.specification.examples
+                )
+            else:
+                failed = not evaluator.check(program, task.specification.examples)
             if not failed:
                 return (
                     True,
@@ -362,6 +604,47 @@ def base(
     return (False, time, programs, None, None)
 
 
+def batched_base(
+    evaluator: DSLEvaluator,
+    task: Task[PBE],
+    pcfg: ProbDetGrammar,
+    custom_enumerate: Callable[[ProbDetGrammar], HSEnumerator],
+) -> Tuple[bool, float, int, Optional[Program]]:
+    time = 0.0
+    programs = 0
+    batch: List[Program] = []
+    with chrono.clock("search.base") as c:
+        enumerator = iter(
+            make_enumerator(
+                evaluator,
+                [ex.inputs for ex in task.specification.examples],
+                pcfg,
+                custom_enumerate,
+            )
+        )
+        while True:
+            batch.clear()
+            for program in enumerator:
+                batch.append(program)
+                if len(batch) >= eval_batch:
+                    break
+            time = c.elapsed_time()
+            if not batch or time >= task_timeout:
+                return (False, time, programs, None, None)
+            mask = evaluator.eval_batch(batch, task.specification.examples)
+            if mask.any():
+                index = int(mask.argmax())
+                program = batch[index]
+                return (
+                    True,
+                    c.elapsed_time(),
+                    programs + index + 1,
+                    program,
+                    pcfg.probability(program),
+                )
+            programs += len(batch)
+
+
 def constants_injector(
     evaluator: DSLEvaluatorWithConstant,
     task: Task[PBEWithConstants],
@@ -383,32 +666,21 @@ def constants_injector(
 
         # print("\n-----------------------")
         # print(name)
-        for program in custom_enumerate(pcfg):
+        for program in make_enumerator(
+            evaluator,
+            [ex.inputs for ex in task.specification.examples],
+            pcfg,
+            custom_enumerate,
+        ):
             time = c.elapsed_time()
             if time >= task_timeout:
                 # print("TIMEOUT\n\n")
                 return (False, time, programs, None, None)
             programs += 1
-            found = False
-            counter = 0
-            for ex in task.specification.examples:
-                found = False
-                for cons_in in constants_in:
-                    for cons_out in constants_out:
-                        if (
-                            evaluator.eval_with_constant(
-                                program, ex.inputs, cons_in, cons_out
-                            )
-                            == ex.output
-                        ):
-                            found = True
-                            counter += 1
-                            break
-                    if found:
-                        break
-                if not found:
-                    break
-            if found:
+            # stops at the first example that no pair of constants satisfies
+            if evaluator.check_with_constant(
+                program, task.specification.examples, constants_in, constants_out
+            ):
                 return (
                     True,
                     c.elapsed_time(),
@@ -600,6 +872,51 @@ def sketched_base(
 
 if __name__ == "__main__":
     full_dataset, dsl, evaluator, lexicon, model_name = load_dataset()
+    if eval_batch > 1 and not isinstance(evaluator, DSLEvaluator):
+        print(
+            "--eval-batch is not supported with constants, the DSL evaluator must be a DSLEvaluator!",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    if observational_equivalence and not isinstance(evaluator, DSLEvaluator):
+        print(
+            "--observational-equivalence is not supported with constants, the DSL evaluator must be a DSLEvaluator!",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    if keep_cache and not isinstance(evaluator, DSLEvaluator):
+        print(
+            "--keep-cache is not supported with constants, the DSL evaluator must be a DSLEvaluator!",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    if (
+        cache_size is not None
+        or cache_memory is not None
+        or keep_cache
+        or limits is not None
+    ):
+        if isinstance(evaluator, DSLEvaluator):
+            bounded = DSLEvaluator(
+                evaluator.semantics,
+                evaluator.use_cache,
+                evaluator.factory,
+                cache_size=cache_size,
+                keep_cache=keep_cache,
+                cache_memory=cache_memory,
+                limits=limits,
+            )
+        else:
+            bounded = DSLEvaluatorWithConstant(
+                evaluator.semantics,
+                evaluator.constant_types,
+                evaluator.use_cache,
+                cache_size=cache_size,
+                cache_memory=cache_memory,
+                limits=limits,
+            )
+        bounded.skip_exceptions.update(evaluator.skip_exceptions)
+        evaluator = bounded
     method = sketched_base
     name = "sketched_base"
     # if isinstance(evaluator, DSLEvaluatorWithConstant):
@@ -627,9 +944,16 @@ if __name__ == "__main__":
             )
     try:
         enumerative_search(
-            full_dataset, evaluator, pcfgs, trace, method, custom_enumerate
+            full_dataset, evaluator, pcfgs, trace, method, custom_enumerate, workers
         )
     except Exception as e:
         print(e)
     save(trace)
     print("csv file was saved as:", file)
+    if workers <= 1:
+        print("Evaluation cache:", evaluator.cache_stats)
+        if search_algo == "cost_band_search":
+            record_band_stats()
+            print("Cost band search:", band_stats)
+    if limits is not None:
+        print("Evaluations that exceeded the limits:", limits.violations)
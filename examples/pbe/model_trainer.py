@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 import atexit
 import sys
 import os
@@ -71,6 +71,12 @@ parser.add_argument(
     default=False,
     help="do not produce stats increasing speed",
 )
+parser.add_argument(
+    "--cfg-cache",
+    type=str,
+    default=None,
+    help="folder where built grammars are cached to be loaded by the next runs (default: none)",
+)
 gg = parser.add_argument_group("model parameters")
 gg.add_argument(
     "-v",
@@ -146,6 +152,7 @@ cpu_only: bool = parameters.cpu
 no_clean: bool = parameters.no_clean
 no_shuffle: bool = parameters.no_shuffle
 no_stats: bool = parameters.no_stats
+cfg_cache: Optional[str] = parameters.cfg_cache
 should_generate_dataset: bool = False
 
 random.seed(seed)
@@ -208,6 +215,7 @@ cfgs = [
         max_depth,
         upper_bound_type_size=upper_bound_type_size,
         constant_types=dsl_constant_types,
+        cache_folder=cfg_cache,
     )
     for t in all_type_requests
 ]
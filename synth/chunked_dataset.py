@@ -0,0 +1,210 @@
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from synth.specification import TaskSpecification
+from synth.syntax.type_system import Type
+from synth.task import Dataset, Task
+
+T = TypeVar("T", bound=TaskSpecification)
+
+MAGIC = b"SYNTHDS\x01"
+# Number of records, then the end of each record in the block
+__COUNT__ = struct.Struct("<I")
+# Offset of the footer, at the very end of the file
+__FOOTER__ = struct.Struct("<Q")
+
+
+class DatasetWriter(Generic[T]):
+    """
+    Write a dataset in the chunked format task by task, without holding the dataset in memory.
+
+    The file is made of blocks of chunk_size tasks, each pickled task is a length-prefixed record
+    and each block is compressed with zlib at the given level.
+    The footer, written by close, holds the offset of each block, the metadata and the type requests of the dataset.
+    The dataset is written in path + ".tmp" that close moves to path,
+    so that an existing file at path, possibly being read, is only replaced once the dataset is complete.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 256,
+        level: int = 1,
+    ) -> None:
+        assert chunk_size > 0
+        self.path = path
+        self.metadata: Dict[str, Any] = metadata or {}
+        self.chunk_size = chunk_size
+        self.level = level
+        self._tmp_path = path + ".tmp"
+        self._fd = open(self._tmp_path, "wb")
+        self._fd.write(MAGIC)
+        self._blocks: List[int] = []
+        self._records: List[bytes] = []
+        self._size = 0
+        self._type_requests: Set[Type] = set()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __flush__(self) -> None:
+        if not self._records:
+            return
+        header = [__COUNT__.pack(len(self._records))]
+        end = 0
+        for record in self._records:
+            end += len(record)
+            header.append(__COUNT__.pack(end))
+        self._blocks.append(self._fd.tell())
+        self._fd.write(zlib.compress(b"".join(header + self._records), self.level))
+        self._records = []
+
+    def append(self, task: Task[T]) -> None:
+        self._records.append(pickle.dumps(task, pickle.HIGHEST_PROTOCOL))
+        self._type_requests.add(task.type_request)
+        self._size += 1
+        if len(self._records) >= self.chunk_size:
+            self.__flush__()
+
+    def extend(self, tasks: Iterable[Task[T]]) -> None:
+        for task in tasks:
+            self.append(task)
+
+    def close(self) -> None:
+        if self._fd.closed:
+            return
+        self.__flush__()
+        footer_offset = self._fd.tell()
+        footer = {
+            "size": self._size,
+            "chunk_size": self.chunk_size,
+            "blocks": self._blocks + [footer_offset],
+            "metadata": self.metadata,
+            "type_requests": self._type_requests,
+        }
+        self._fd.write(zlib.compress(pickle.dumps(footer, pickle.HIGHEST_PROTOCOL)))
+        self._fd.write(__FOOTER__.pack(footer_offset))
+        self._fd.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self) -> "DatasetWriter[T]":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class ChunkedDataset(Dataset[T]):
+    """
+    Lazy read-only view of a dataset saved in the chunked format.
+
+    Opening the view only reads the footer of the file, which is memory-mapped.
+    A task is read by decompressing its block only, the last cached_blocks decompressed blocks are kept,
+    so iterating over the dataset holds at most one block of tasks in memory.
+    The tasks property builds the full list of tasks.
+    close unmaps the file, the view can be used as a context manager that closes it.
+    """
+
+    def __init__(self, path: str, cached_blocks: int = 4) -> None:
+        self.path = path
+        self.cached_blocks = cached_blocks
+        with open(path, "rb") as fd:
+            self._map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a chunked dataset file")
+        footer_offset = __FOOTER__.unpack_from(
+            self._map, len(self._map) - __FOOTER__.size
+        )[0]
+        footer = pickle.loads(
+            zlib.decompress(self._map[footer_offset : len(self._map) - __FOOTER__.size])
+        )
+        self.metadata: Dict[str, Any] = footer["metadata"]
+        self._size: int = footer["size"]
+        self._chunk_size: int = footer["chunk_size"]
+        self._blocks: List[int] = footer["blocks"]
+        self._type_requests: Set[Type] = footer["type_requests"]
+        self._cache: "OrderedDict[int, Tuple[bytes, List[int]]]" = OrderedDict()
+
+    def __reduce__(self) -> Tuple:
+        return (ChunkedDataset, (self.path, self.cached_blocks))
+
+    def close(self) -> None:
+        self._cache.clear()
+        self._map.close()
+
+    def __enter__(self) -> "ChunkedDataset[T]":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __block__(self, block: int) -> Tuple[bytes, List[int]]:
+        if block in self._cache:
+            self._cache.move_to_end(block)
+            return self._cache[block]
+        data = zlib.decompress(self._map[self._blocks[block] : self._blocks[block + 1]])
+        n = __COUNT__.unpack_from(data)[0]
+        start = (n + 1) * __COUNT__.size
+        ends = [
+            start + end for end in struct.unpack_from(f"<{n}I", data, __COUNT__.size)
+        ]
+        self._cache[block] = (data, [start] + ends)
+        if len(self._cache) > self.cached_blocks:
+            self._cache.popitem(last=False)
+        return self._cache[block]
+
+    def __task__(self, i: int) -> Task[T]:
+        data, offsets = self.__block__(i // self._chunk_size)
+        j = i % self._chunk_size
+        task: Task[T] = pickle.loads(data[offsets[j] : offsets[j + 1]])
+        return task
+
+    @property  # type: ignore
+    def tasks(self) -> List[Task[T]]:  # type: ignore
+        return list(self)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Task[T]]:
+        for i in range(self._size):
+            yield self.__task__(i)
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, slice):
+            return [self.__task__(i) for i in range(*key.indices(self._size))]
+        i = key.__index__()
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(f"ChunkedDataset index out of range: {key}")
+        return self.__task__(i)
+
+    def type_requests(self) -> Set[Type]:
+        return set(self._type_requests)
+
+
+def convert(path: str, output: str, chunk_size: int = 256) -> None:
+    """
+    Convert the dataset stored in the specified file, in any format Dataset.load reads, to the chunked format.
+    """
+    dataset: Dataset = Dataset.load(path)
+    with DatasetWriter(output, dataset.metadata, chunk_size) as writer:
+        writer.extend(dataset)
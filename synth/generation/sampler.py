@@ -27,6 +27,12 @@ class Sampler(ABC, Generic[T]):
     def sample(self, **kwargs: Any) -> T:
         pass
 
+    def sample_batch(self, n: int, **kwargs: Any) -> TList[T]:
+        """
+        Sample n independent elements, distributed like n calls to sample.
+        """
+        return [self.sample(**kwargs) for _ in range(n)]
+
     def compose(self, f: Callable[[T], T]) -> "Sampler[T]":
         return ComposedSampler(self, f)
 
@@ -39,6 +45,9 @@ class ComposedSampler(Sampler[T]):
     def sample(self, **kwargs: Any) -> T:
         return self.f(self.sampler.sample(**kwargs))
 
+    def sample_batch(self, n: int, **kwargs: Any) -> TList[T]:
+        return [self.f(x) for x in self.sampler.sample_batch(n, **kwargs)]
+
 
 class LexiconSampler(Sampler[U]):
     def __init__(
@@ -59,6 +68,11 @@ class LexiconSampler(Sampler[U]):
         index: int = self.sampler.sample()
         return self.lexicon[index]
 
+    def sample_batch(self, n: int, **kwargs: Any) -> TList[U]:
+        if n <= 1:
+            return [self.sample(**kwargs) for _ in range(n)]
+        return [self.lexicon[index] for index in self.sampler.sample(k=n).tolist()]
+
 
 class RequestSampler(Sampler[U], ABC):
     def sample(self, **kwargs: Any) -> U:
@@ -82,6 +96,10 @@ class TypeMappedRequestSampler(RequestSampler[U]):
     def sample_for(self, type: Type, **kwargs: Any) -> U:
         return self.sampler.sample_for(self.f(type), **kwargs)
 
+    def sample_batch(self, n: int, **kwargs: Any) -> TList[U]:
+        kwargs["type"] = self.f(kwargs["type"])
+        return self.sampler.sample_batch(n, **kwargs)
+
 
 class ListSampler(RequestSampler[Union[TList, U]]):
     def __init__(
@@ -115,6 +133,14 @@ class ListSampler(RequestSampler[Union[TList, U]]):
         else:
             return self.length_sampler.sample(type=type)
 
+    def __gen_lengths__(self, type: Type, n: int) -> TList[int]:
+        if self.sampler and n > 1:
+            return [self._length_mapping[i] for i in self.sampler.sample(k=n).tolist()]
+        elif self.sampler:
+            return [self.__gen_length__(type) for _ in range(n)]
+        else:
+            return self.length_sampler.sample_batch(n, type=type)
+
     def sample_for(self, type: Type, **kwargs: Any) -> Union[TList, U]:
         assert self.max_depth < 0 or type.depth() <= self.max_depth
         if isinstance(type, List):
@@ -128,6 +154,26 @@ class ListSampler(RequestSampler[Union[TList, U]]):
         else:
             return self.element_sampler.sample(type=type, **kwargs)
 
+    def sample_batch(self, n: int, **kwargs: Any) -> TList[Union[TList, U]]:
+        """
+        Sample the lengths of the n lists at once, then all their elements at once.
+        """
+        type: Type = kwargs.pop("type")
+        assert self.max_depth < 0 or type.depth() <= self.max_depth
+        if not isinstance(type, List):
+            return self.element_sampler.sample_batch(n, type=type, **kwargs)
+        sampler: Sampler = self
+        if not isinstance(type.element_type, List):
+            sampler = self.element_sampler
+        lengths = self.__gen_lengths__(type, n)
+        elements = sampler.sample_batch(sum(lengths), type=type.element_type, **kwargs)
+        out = []
+        start = 0
+        for length in lengths:
+            out.append(elements[start : start + length])
+            start += length
+        return out
+
 
 class UnionSampler(RequestSampler[Any]):
     def __init__(
@@ -144,6 +190,14 @@ class UnionSampler(RequestSampler[Any]):
         ), f"UnionSampler: No sampler found for type {type}({hash(type)}) in {self}"
         return sampler.sample(type=type, **kwargs)
 
+    def sample_batch(self, n: int, **kwargs: Any) -> TList[Any]:
+        type: Type = kwargs["type"]
+        sampler = self.samplers.get(type, self.fallback)
+        assert (
+            sampler
+        ), f"UnionSampler: No sampler found for type {type}({hash(type)}) in {self}"
+        return sampler.sample_batch(n, **kwargs)
+
     def __str__(self) -> str:
         s = (
             f"UnionSampler(fallback={self.fallback}, samplers="
@@ -101,7 +101,7 @@ def one_hot_encode_primitives(
     program: Program, map: Dict[Primitive, int], nprimitives: int
 ) -> Tensor:
     tensor = torch.zeros((nprimitives))
-    for P in program.depth_first_iter():
+    for P in program.post_order():
         if isinstance(P, Primitive):
             tensor[map[P]] = 1
     return tensor
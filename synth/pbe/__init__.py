@@ -1,6 +1,7 @@
 """
 Module that contains anything relevant to the Programming By Example (PBE) framework 
 """
+from synth.pbe.columnar_dataset import ColumnarDataset
 from synth.pbe.io_encoder import IOEncoder
 from synth.pbe.task_generator import (
     TaskGenerator,
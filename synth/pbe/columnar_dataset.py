@@ -0,0 +1,255 @@
+import os
+import pickle
+from typing import Any, Dict, Generator, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from synth.specification import PBE, Example
+from synth.syntax.program import Program
+from synth.syntax.type_system import Type
+from synth.task import Dataset, Task
+
+# Kinds of the stored values
+INT_KIND = 0
+BOOL_KIND = 1
+LIST_KIND = 2
+
+__VALUES__ = "values.bin"
+__VALUE_OFFSETS__ = "value_offsets.bin"
+__KINDS__ = "kinds.bin"
+__EXAMPLE_OFFSETS__ = "example_offsets.bin"
+__TASK_OFFSETS__ = "task_offsets.bin"
+__TASKS__ = "tasks.pickle"
+
+
+class ColumnarExample(Example):
+    """
+    Read-only view of the index-th example of a ColumnarDataset.
+
+    inputs and output are built from the stored arrays each time they are accessed,
+    arrays gives the stored values without any copy.
+    """
+
+    def __init__(self, dataset: "ColumnarDataset", index: int) -> None:
+        self._dataset = dataset
+        self._index = index
+
+    def arrays(self) -> List[Tuple[int, np.ndarray]]:
+        """
+        The (kind, values) of each input then of the output of this example,
+        values is a view of the memory-mapped values: a single element for an INT_KIND or a BOOL_KIND.
+        """
+        start, end = self._dataset._example_offsets[self._index : self._index + 2]
+        return [self._dataset.__value__(v) for v in range(start, end)]
+
+    @property  # type: ignore
+    def inputs(self) -> List[Any]:  # type: ignore
+        return [to_python(kind, values) for kind, values in self.arrays()[:-1]]
+
+    @property  # type: ignore
+    def output(self) -> Any:  # type: ignore
+        end = self._dataset._example_offsets[self._index + 1]
+        return to_python(*self._dataset.__value__(end - 1))
+
+    def __reduce__(self) -> Tuple:
+        return (Example, (self.inputs, self.output))
+
+
+class ColumnarPBE(PBE):
+    """
+    Read-only view of the PBE specification of the index-th task of a ColumnarDataset.
+    """
+
+    def __init__(self, dataset: "ColumnarDataset", index: int) -> None:
+        self._dataset = dataset
+        self._index = index
+
+    def example_range(self) -> Tuple[int, int]:
+        """
+        The indices of the first and after the last examples of this specification in the ColumnarDataset.
+        """
+        start, end = self._dataset._task_offsets[self._index : self._index + 2]
+        return int(start), int(end)
+
+    def columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (values, lengths, kinds) of the examples of this specification, see ColumnarDataset.columns.
+        """
+        return self._dataset.columns(self._index)
+
+    @property  # type: ignore
+    def examples(self) -> List[Example]:  # type: ignore
+        start, end = self.example_range()
+        return [ColumnarExample(self._dataset, i) for i in range(start, end)]
+
+    def __reduce__(self) -> Tuple:
+        return (PBE, (self.examples,))
+
+
+def to_python(kind: int, values: np.ndarray) -> Any:
+    if kind == LIST_KIND:
+        return values.tolist()
+    elif kind == BOOL_KIND:
+        return bool(values[0])
+    return int(values[0])
+
+
+def __encode_value__(value: Any) -> Tuple[int, List[int]]:
+    if isinstance(value, bool):
+        return BOOL_KIND, [value]
+    elif isinstance(value, int):
+        return INT_KIND, [value]
+    elif isinstance(value, list) and all(
+        isinstance(x, int) and not isinstance(x, bool) for x in value
+    ):
+        return LIST_KIND, value
+    raise ValueError(
+        f"ColumnarDataset only stores ints, bools and lists of ints, not: {value}"
+    )
+
+
+class ColumnarDataset(Dataset[PBE]):
+    """
+    Read-only dataset of PBE tasks whose examples are stored in columns in a folder.
+
+    Only tasks whose inputs and outputs are ints, bools or lists of ints can be stored.
+    All the values are stored in a single flat int64 array and offsets arrays give the values
+    of each value, example and task, these arrays are memory-mapped.
+    The type request, the solution and the metadata of the tasks are pickled together.
+    The specification of a task is a ColumnarPBE view: examples are read from the arrays when accessed
+    and IOEncoder and reproduce_dataset read the arrays directly.
+    """
+
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+        with open(self.__path__(__TASKS__), "rb") as fd:
+            content = pickle.load(fd)
+        self.metadata: Dict[str, Any] = content["metadata"]
+        self._tasks: List[Tuple[Type, Optional[Program], Dict[str, Any]]] = content[
+            "tasks"
+        ]
+        self._values = self.__map__(__VALUES__, np.int64)
+        self._value_offsets = self.__map__(__VALUE_OFFSETS__, np.int64)
+        self._kinds = self.__map__(__KINDS__, np.int8)
+        self._example_offsets = self.__map__(__EXAMPLE_OFFSETS__, np.int64)
+        self._task_offsets = self.__map__(__TASK_OFFSETS__, np.int64)
+
+    def __path__(self, name: str) -> str:
+        return os.path.join(self.folder, name)
+
+    def __map__(self, name: str, dtype: type) -> np.ndarray:
+        path = self.__path__(name)
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def __reduce__(self) -> Tuple:
+        return (ColumnarDataset, (self.folder,))
+
+    def __value__(self, v: int) -> Tuple[int, np.ndarray]:
+        start, end = self._value_offsets[v : v + 2]
+        return int(self._kinds[v]), self._values[start:end]
+
+    def columns(self, i: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (values, lengths, kinds) of the examples of the i-th task without any copy:
+        values is the flat array of all values of the task, lengths and kinds have one row per example
+        and one column per input then one for the output.
+        """
+        start, end = self._task_offsets[i : i + 2]
+        first, last = self._example_offsets[start], self._example_offsets[end]
+        examples = int(end - start)
+        shape = (examples, int(last - first) // max(1, examples))
+        lengths = np.diff(self._value_offsets[first : last + 1]).reshape(shape)
+        values = self._values[self._value_offsets[first] : self._value_offsets[last]]
+        return values, lengths, self._kinds[first:last].reshape(shape)
+
+    def __task__(self, i: int) -> Task[PBE]:
+        type_request, solution, metadata = self._tasks[i]
+        return Task(type_request, ColumnarPBE(self, i), solution, metadata)
+
+    @property  # type: ignore
+    def tasks(self) -> List[Task[PBE]]:  # type: ignore
+        return list(self)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __iter__(self) -> Generator[Task[PBE], None, None]:
+        for i in range(len(self)):
+            yield self.__task__(i)
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, slice):
+            return [self.__task__(i) for i in range(*key.indices(len(self)))]
+        i = key.__index__()
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"ColumnarDataset index out of range: {key}")
+        return self.__task__(i)
+
+    def type_requests(self) -> Set[Type]:
+        return set(type_request for type_request, _, _ in self._tasks)
+
+    @classmethod
+    def write(
+        cls,
+        folder: str,
+        tasks: Iterable[Task[PBE]],
+        metadata: Optional[Dict[str, Any]] = None,
+        batch_size: int = 1000,
+    ) -> "ColumnarDataset":
+        """
+        Store the given tasks in the specified folder and return the ColumnarDataset reading them.
+        The tasks are consumed lazily and their values are written by batches of batch_size tasks.
+        Raise a ValueError if a value is not an int, a bool or a list of ints.
+        """
+        os.makedirs(folder, exist_ok=True)
+        names = [
+            __VALUES__,
+            __VALUE_OFFSETS__,
+            __KINDS__,
+            __EXAMPLE_OFFSETS__,
+            __TASK_OFFSETS__,
+        ]
+        fds = {name: open(os.path.join(folder, name), "wb") for name in names}
+        columns: Dict[str, List[int]] = {name: [] for name in names}
+        dtypes = {name: np.int64 for name in names}
+        dtypes[__KINDS__] = np.int8
+        content: Dict[str, Any] = {"metadata": metadata or {}, "tasks": []}
+        # Offsets start with 0 and each next offset is the end of an element
+        counts = {__VALUES__: 0, __VALUE_OFFSETS__: 0, __EXAMPLE_OFFSETS__: 0}
+        for name in [__VALUE_OFFSETS__, __EXAMPLE_OFFSETS__, __TASK_OFFSETS__]:
+            columns[name].append(0)
+
+        def flush() -> None:
+            for name in names:
+                fds[name].write(np.array(columns[name], dtype=dtypes[name]).tobytes())
+                columns[name].clear()
+
+        try:
+            for task in tasks:
+                content["tasks"].append(
+                    (task.type_request, task.solution, task.metadata)
+                )
+                for example in task.specification.examples:
+                    for value in example.inputs + [example.output]:
+                        kind, values = __encode_value__(value)
+                        columns[__KINDS__].append(kind)
+                        columns[__VALUES__] += values
+                        counts[__VALUES__] += len(values)
+                        columns[__VALUE_OFFSETS__].append(counts[__VALUES__])
+                    counts[__VALUE_OFFSETS__] += len(example.inputs) + 1
+                    columns[__EXAMPLE_OFFSETS__].append(counts[__VALUE_OFFSETS__])
+                counts[__EXAMPLE_OFFSETS__] += len(task.specification.examples)
+                columns[__TASK_OFFSETS__].append(counts[__EXAMPLE_OFFSETS__])
+                if len(content["tasks"]) % batch_size == 0:
+                    flush()
+            flush()
+        finally:
+            for fd in fds.values():
+                fd.close()
+        with open(os.path.join(folder, __TASKS__), "wb") as fd:
+            pickle.dump(content, fd)
+        return ColumnarDataset(folder)
@@ -1,9 +1,11 @@
 from typing import Any, List, Optional, Tuple
 
+import numpy as np
 import torch
 from torch import Tensor
 
 from synth.nn.spec_encoder import SpecificationEncoder
+from synth.pbe.columnar_dataset import LIST_KIND, ColumnarPBE
 from synth.specification import PBE
 from synth.task import Task
 
@@ -36,6 +38,16 @@ class IOEncoder(SpecificationEncoder[PBE, Tensor]):
         self.start_list_index = self.symbol2index["STARTOFLIST"]
         self.end_list_index = self.symbol2index["ENDOFLIST"]
         self.pad_symbol = self.symbol2index["PADDING"]
+        # Lookup table of the indices of ints, and bools which are equal to ints as keys, for columnar tasks
+        ints = [x for x in lexicon if isinstance(x, int)]
+        self._int_min = min(ints, default=0)
+        self._int_table = np.array(
+            [
+                self.symbol2index.get(x, -1 if self._default is None else self._default)
+                for x in range(self._int_min, max(ints, default=-1) + 1)
+            ],
+            dtype=np.int64,
+        )
 
     def __encode_element__(self, x: Any, encoding: List[int]) -> None:
         if isinstance(x, List):
@@ -73,7 +85,53 @@ class IOEncoder(SpecificationEncoder[PBE, Tensor]):
         res = torch.LongTensor(e).to(device)
         return res
 
+    def __encode_columnar__(
+        self, specification: ColumnarPBE, device: Optional[str] = None
+    ) -> Tensor:
+        """
+        Encode the examples of a ColumnarPBE from its arrays, like encode_IO does for each example.
+        """
+        values, lengths, kinds = specification.columns()
+        # Map all the values of the task at once
+        relative = values - self._int_min
+        known = (relative >= 0) & (relative < self._int_table.shape[0])
+        indices = np.full(
+            values.shape[0], -1 if self._default is None else self._default
+        )
+        indices[known] = self._int_table[relative[known]]
+        assert (indices >= 0).all(), "IOEncoder: unknown value in {}".format(
+            specification
+        )
+        encoded = np.full(
+            (lengths.shape[0], self.output_dimension), self.ending_index, dtype=np.int64
+        )
+        offset = 0
+        for i in range(lengths.shape[0]):
+            e = [np.array([self.starting_index])]
+            for j in range(lengths.shape[1]):
+                if j == lengths.shape[1] - 1:
+                    e.append(np.array([self.start_of_output_index]))
+                if kinds[i, j] == LIST_KIND:
+                    e.append(np.array([self.start_list_index]))
+                e.append(indices[offset : offset + lengths[i, j]])
+                offset += lengths[i, j]
+                if kinds[i, j] == LIST_KIND:
+                    e.append(np.array([self.end_list_index]))
+                if j < lengths.shape[1] - 1:
+                    e.append(np.array([self.end_of_input_index]))
+            e.append(np.array([self.ending_index]))
+            row = np.concatenate(e)
+            assert (
+                row.shape[0] <= self.output_dimension
+            ), "IOEncoder: IO too large: {} > {} for {}".format(
+                row.shape[0], self.output_dimension, specification.examples[i]
+            )
+            encoded[i, : row.shape[0]] = row
+        return torch.from_numpy(encoded).to(device)
+
     def encode(self, task: Task[PBE], device: Optional[str] = None) -> Tensor:
+        if isinstance(task.specification, ColumnarPBE):
+            return self.__encode_columnar__(task.specification, device)
         return torch.stack(
             [
                 self.encode_IO((ex.inputs, ex.output), device)
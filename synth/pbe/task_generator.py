@@ -16,8 +16,10 @@ from collections.abc import Container
 import numpy as np
 
 from synth.task import Dataset, Task
+from synth.pbe.columnar_dataset import LIST_KIND, ColumnarDataset
 from synth.specification import PBE, Example
-from synth.semantic.evaluator import Evaluator
+from synth.semantic.compiler import compile_program
+from synth.semantic.evaluator import DSLEvaluator, Evaluator
 from synth.syntax.dsl import DSL
 from synth.syntax.program import Program
 from synth.syntax.type_system import BOOL, INT, List, Type
@@ -45,7 +47,17 @@ class TaskGenerator:
         uniques: bool = False,
         skip_exceptions: Optional[Set[PythonType]] = None,
         verbose: bool = False,
+        program_batch_size: int = 100,
+        batch_inputs: bool = True,
     ) -> None:
+        """
+        program_batch_size: the number of programs sampled at once with ProbDetGrammar.sample_programs
+        batch_inputs: if True, the inputs of a task are sampled by batches with Sampler.sample_batch,
+        the size of a batch is the expected number of inputs needed to reach the number of examples
+        given the acceptance rate of the inputs of the type request so far (see difficulty),
+        the inputs are then checked in order as if they were sampled one at a time so the tasks follow the same distribution,
+        subclasses that override __sample_input__ or __eval_input__ always get their inputs one at a time
+        """
         self.input_generator = input_generator
         self.evaluator = evaluator
         self.gen_random_type_request = gen_random_type_request
@@ -57,6 +69,11 @@ class TaskGenerator:
         self.uniques = uniques
         self.seen: Set[Program] = set()
         self.verbose = verbose
+        self.program_batch_size = program_batch_size
+        self.batch_inputs = batch_inputs
+        self._sampled_programs: Dict[Type, TList[Program]] = {
+            t: [] for t in self.type2pgrammar
+        }
 
         self._failed_types: Set[Type] = set()
         # For statistics
@@ -70,20 +87,20 @@ class TaskGenerator:
         (program, is_unique)
         """
         nargs: int = len(type_request.arguments())
-        solution: Program = self.type2pgrammar[type_request].sample_program()
+        solution: Program = self.__sample_program__(type_request)
         tries: int = 0
         unique_tries: int = 0
         while solution in self.seen and unique_tries < self.max_tries:
-            solution = self.type2pgrammar[type_request].sample_program()
+            solution = self.__sample_program__(type_request)
             unique_tries += 1
 
         var_used = len(solution.used_variables())
         best = solution
         tries = 0
         while var_used < nargs and tries < self.max_tries:
-            solution = self.type2pgrammar[type_request].sample_program()
+            solution = self.__sample_program__(type_request)
             while solution in self.seen and unique_tries < self.max_tries:
-                solution = self.type2pgrammar[type_request].sample_program()
+                solution = self.__sample_program__(type_request)
                 unique_tries += 1
             tries += 1
             n = len(solution.used_variables())
@@ -92,6 +109,14 @@ class TaskGenerator:
                 best = solution
         return best, unique_tries < self.max_tries
 
+    def __sample_program__(self, type_request: Type) -> Program:
+        programs = self._sampled_programs[type_request]
+        if not programs:
+            programs += self.type2pgrammar[type_request].sample_programs(
+                self.program_batch_size
+            )
+        return programs.pop()
+
     def __generate_type_request__(self) -> Type:
         type_request = self.gen_random_type_request.sample()
         i = 0
@@ -105,6 +130,13 @@ class TaskGenerator:
     def __sample_input__(self, arguments: TList[Type]) -> TList:
         return [self.input_generator.sample(type=arg_type) for arg_type in arguments]
 
+    def __sample_inputs__(self, arguments: TList[Type], n: int) -> TList[TList]:
+        columns = [
+            self.input_generator.sample_batch(n, type=arg_type)
+            for arg_type in arguments
+        ]
+        return [[column[i] for column in columns] for i in range(n)]
+
     def __eval_input__(self, solution: Program, input: TList) -> Any:
         try:
             return self.evaluator.eval(solution, input)
@@ -114,6 +146,91 @@ class TaskGenerator:
             else:
                 raise e
 
+    def __compile__(self, solution: Program) -> Callable[[TList], Any]:
+        """
+        Function that evaluates the solution on an input like __eval_input__.
+        """
+        if not isinstance(self.evaluator, DSLEvaluator):
+            return lambda input: self.__eval_input__(solution, input)
+        # Compiling once is cheaper than evaluating on each input,
+        # the compiled sub-programs are not kept by the evaluator since they are rarely shared by the next solutions
+        compiled = compile_program(
+            solution,
+            self.evaluator.semantics,
+            self.evaluator.skip_exceptions | self.skip_exceptions,
+        )
+        limits = self.evaluator.limits
+        if limits is None:
+            return compiled
+
+        def run(input: TList) -> Any:
+            limits.reset()  # type: ignore
+            return compiled(input)
+
+        return run
+
+    def __batchable__(self) -> bool:
+        """
+        Whether the inputs are sampled by batches, see batch_inputs.
+        """
+        return (
+            self.batch_inputs
+            and type(self).__sample_input__ is TaskGenerator.__sample_input__
+            and type(self).__eval_input__ is TaskGenerator.__eval_input__
+        )
+
+    def __batch_size__(self, type_request: Type, missing: int, budget: int) -> int:
+        """
+        Number of inputs expected to give the missing examples given the acceptance rate of type_request so far,
+        at most budget.
+        """
+        tries, rejected = self.difficulty[type_request]
+        accepted = max(1, tries - rejected)
+        if tries == 0:
+            return min(missing, budget)
+        return max(1, min(budget, -(-missing * tries // accepted)))
+
+    def __sample_examples__(
+        self, type_request: Type, solution: Program, samples: int
+    ) -> Tuple[TList, TList, int]:
+        """
+        Sample inputs until samples of them have a valid and new output or the tries are exhausted.
+        Return (inputs, outputs, tries).
+        """
+        arguments = type_request.arguments()
+        run = self.__compile__(solution) if self.__batchable__() else None
+        inputs: TList = []
+        outputs = __Outputs__()
+        batch: TList[TList] = []
+        tries = 0
+        # has_enough_tries_to_reach_desired_no_of_samples and has_remaining_tries
+        while (self.max_tries - tries) + len(
+            inputs
+        ) >= samples and tries < self.max_tries:
+            tries += 1
+            if run is None:
+                new_input = self.__sample_input__(arguments)
+                output = self.__eval_input__(solution, new_input)
+            else:
+                if not batch:
+                    batch = self.__sample_inputs__(
+                        arguments,
+                        self.__batch_size__(
+                            type_request,
+                            samples - len(inputs),
+                            self.max_tries - tries + 1,
+                        ),
+                    )
+                    batch.reverse()
+                new_input = batch.pop()
+                output = run(new_input)
+
+            if self.output_validator(output) and outputs.add(output):
+                inputs.append(new_input)
+                if len(inputs) >= samples:
+                    break
+        return inputs, outputs.outputs, tries
+
     def __make_task__(
         self,
         type_request: Type,
@@ -133,28 +250,14 @@ class TaskGenerator:
         self._failed_types.clear()
         while True:
             type_request = self.__generate_type_request__()
-            arguments = type_request.arguments()
 
             # Generate correct program that makes use of all variables
             solution, is_unique = self.__generate_program__(type_request)
             # Try to generate the required number of samples
             samples = self.gen_random_sample_number.sample(type=type_request)
-            inputs: TList = []
-            outputs = []
-            tries = 0
-            # has_enough_tries_to_reach_desired_no_of_samples and has_remaining_tries
-            while (self.max_tries - tries) + len(
-                inputs
-            ) >= samples and tries < self.max_tries:
-                tries += 1
-                new_input = self.__sample_input__(arguments)
-                output = self.__eval_input__(solution, new_input)
-
-                if self.output_validator(output) and output not in outputs:
-                    inputs.append(new_input)
-                    outputs.append(output)
-                    if len(inputs) >= samples:
-                        break
+            inputs, outputs, tries = self.__sample_examples__(
+                type_request, solution, samples
+            )
 
             self.difficulty[type_request][0] += tries
             self.difficulty[type_request][1] += tries - len(inputs)
@@ -188,6 +291,42 @@ class TaskGenerator:
             yield self.generate_task()
 
 
+class __Outputs__:
+    """
+    Distinct outputs of a task in the order they were added.
+    Hashable outputs, with lists as tuples, are also kept in a set so that checking that an output is new is O(1).
+    """
+
+    def __init__(self) -> None:
+        self.outputs: TList = []
+        self._keys: Set = set()
+
+    def add(self, output: Any) -> bool:
+        """
+        Add the output if it is new, return whether it was added.
+        """
+        key = __output_key__(output)
+        try:
+            if key in self._keys:
+                return False
+            hashable = True
+        except TypeError:
+            if output in self.outputs:
+                return False
+            hashable = False
+        if hashable:
+            self._keys.add(key)
+        self.outputs.append(output)
+        return True
+
+
+def __output_key__(output: Any) -> Any:
+    # Lists are tagged so that a list and a tuple with the same elements are different like with ==
+    if isinstance(output, list):
+        return (list, tuple(__output_key__(x) for x in output))
+    return output
+
+
 def basic_output_validator(
     dico: Dict[PythonType, Container], max_list_length: int
 ) -> Callable[[Any], bool]:
@@ -222,6 +361,11 @@ def reproduce_int_dataset(
         int_range[0] = min(int_range[0], max(-int_bound, element))
         int_range[1] = max(int_range[1], min(int_bound, element))
 
+    def elements_analyser(start: None, elements: np.ndarray) -> None:
+        if elements.shape[0] > 0:
+            analyser(start, int(elements.min()))
+            analyser(start, int(elements.max()))
+
     def get_element_sampler(start: None) -> UnionSampler:
         int_lexicon = list(range(int_range[0], int_range[1] + 1))
 
@@ -255,6 +399,7 @@ def reproduce_int_dataset(
         max_tries,
         default_max_depth,
         max_list_length,
+        elements_analyser,
     )
 
 
@@ -275,11 +420,15 @@ def reproduce_dataset(
     max_tries: int = 100,
     default_max_depth: int = 5,
     max_list_length: Optional[int] = None,
+    elements_analyser: Optional[Callable[[T, np.ndarray], T]] = None,
 ) -> Tuple[TaskGenerator, TList]:
     """
 
     start = element_analyser(start, element)
         called when encountering a base element (not a list)
+    start = elements_analyser(start, elements)
+        called instead of element_analyser on the array of all the base elements of a ColumnarDataset,
+        if it is None element_analyser is called on each of them
     get_element_sampler(start)
         produces the sampler used for base types (not list)
     get_validator(start, max_list_length)
@@ -311,7 +460,7 @@ def reproduce_dataset(
             out[0] = element_analyser(out[0], element)
 
     # Capture all information in one dataset pass
-    for task in dataset:
+    for task_index, task in enumerate(dataset):
         if task.solution:
             max_depth = max(max_depth, task.solution.depth())
         # Type distribution
@@ -322,21 +471,36 @@ def reproduce_dataset(
             index = allowed_types.index(task.type_request)
             types_probs_list[index] += 1.0
 
+        t = task.type_request
+        args = t.arguments()
+        r = t.returns()
+
+        if isinstance(dataset, ColumnarDataset):
+            __analyze_columns__(
+                dataset, task_index, t, no_samples, list_length, max_list_depth
+            )
+            continue
+
         # No samples distribution
         __multi_discrete_distribution__(
             no_samples, task.type_request, len(task.specification.examples)
         )
 
-        t = task.type_request
-        args = t.arguments()
-        r = t.returns()
-
         # Input data analysis
         for ex in task.specification.examples:
             for input, ti in zip(ex.inputs, args):
                 analyze(input, ti)
             analyze(ex.output, r)
 
+    if isinstance(dataset, ColumnarDataset):
+        # Base elements analysis in the order of the dataset
+        elements = dataset._values[dataset._values != 0]
+        if elements_analyser is not None:
+            out[0] = elements_analyser(out[0], elements)
+        else:
+            for element in elements.tolist():
+                out[0] = element_analyser(out[0], element)
+
     # Type generator
     types_probs = np.array(types_probs_list, dtype=float) / len(dataset)
     type_sampler = LexiconSampler(allowed_types, types_probs, seed)
@@ -401,13 +565,48 @@ def reproduce_dataset(
 
 
 def __multi_discrete_distribution__(
-    distr: Dict[Type, Dict[int, int]], key: Type, new_entry: int
+    distr: Dict[Type, Dict[int, int]], key: Type, new_entry: int, count: int = 1
 ) -> None:
     if key not in distr:
         distr[key] = {new_entry: 0}
     elif new_entry not in distr[key]:
         distr[key][new_entry] = 0
-    distr[key][new_entry] += 1
+    distr[key][new_entry] += count
+
+
+def __analyze_columns__(
+    dataset: ColumnarDataset,
+    index: int,
+    type_request: Type,
+    no_samples: Dict[Type, Dict[int, int]],
+    list_length: Dict[Type, Dict[int, int]],
+    max_list_depth: TList[int],
+) -> None:
+    """
+    Update the distributions like reproduce_dataset does with the examples of the index-th task of a ColumnarDataset,
+    from its arrays.
+    Lengths are added in the order they are encountered in the examples so that the distributions are identical.
+    """
+    types = type_request.arguments() + [type_request.returns()]
+    _, lengths, kinds = dataset.columns(index)
+    __multi_discrete_distribution__(no_samples, type_request, lengths.shape[0])
+    if lengths.size == 0:
+        return
+    is_list = kinds == LIST_KIND
+    max_list_depth[0] = max(max_list_depth[0], 2 if (lengths[is_list] > 0).any() else 1)
+    for t in dict.fromkeys(types):
+        if not isinstance(t, List):
+            continue
+        # Row-major order is the order of the examples then of the inputs and output
+        mask = is_list & np.array([ti == t for ti in types])[None, :]
+        seen = lengths[mask & (lengths > 0)]
+        if seen.shape[0] == 0:
+            continue
+        entries, first, counts = np.unique(seen, return_index=True, return_counts=True)
+        for i in np.argsort(first):
+            __multi_discrete_distribution__(
+                list_length, t, int(entries[i]), int(counts[i])
+            )
 
 
 def __multi_discrete_to_gen__(
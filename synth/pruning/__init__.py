@@ -8,6 +8,9 @@ from synth.pruning.syntactic_pruner import (
     SyntacticPruner,
     SetPruner,
 )
+from synth.pruning.observational_equivalence_pruner import (
+    ObservationalEquivalencePruner,
+)
 from synth.pruning.type_constraints import (
     export_syntax_to_python,
     produce_new_syntax_for_constraints,
@@ -0,0 +1,56 @@
+from typing import Any, Dict, List, Set, Tuple
+
+from synth.pruning.pruner import Pruner
+from synth.semantic.evaluator import DSLEvaluator, Evaluator, __tuplify__
+from synth.syntax.program import Program
+from synth.syntax.type_system import Type
+
+
+class ObservationalEquivalencePruner(Pruner[Tuple[Tuple[Type, Any], Program]]):
+    """
+    Rejects a program generated from a non-terminal when a program already accepted for this non-terminal
+    produces the same outputs on the given inputs.
+    Programs must be submitted by non-increasing probability so that the most probable program is kept.
+
+    At most max_signatures outputs are stored,
+    once the table is full new programs are still checked but no longer recorded.
+    Programs whose outputs are functions or cannot be hashed are always accepted.
+    """
+
+    def __init__(
+        self, evaluator: Evaluator, inputs: List[List], max_signatures: int = 1000000
+    ) -> None:
+        super().__init__()
+        self.evaluator = evaluator
+        self.inputs = inputs
+        self.max_signatures = max_signatures
+        self.signatures: Dict[Tuple[Type, Any], Set[Any]] = {}
+        self.stored = 0
+        # Statistics
+        self.pruned = 0
+
+    def accept(self, obj: Tuple[Tuple[Type, Any], Program]) -> bool:
+        S, program = obj
+        try:
+            if isinstance(self.evaluator, DSLEvaluator):
+                outputs = [
+                    self.evaluator.eval_incremental(program, self.inputs, i)
+                    for i in range(len(self.inputs))
+                ]
+            else:
+                outputs = [self.evaluator.eval(program, input) for input in self.inputs]
+            if any(callable(output) for output in outputs):
+                return True
+            signature = __tuplify__(outputs)
+            hash(signature)
+        except Exception:
+            return True
+        if S not in self.signatures:
+            self.signatures[S] = set()
+        if signature in self.signatures[S]:
+            self.pruned += 1
+            return False
+        if self.stored < self.max_signatures:
+            self.signatures[S].add(signature)
+            self.stored += 1
+        return True
@@ -37,7 +37,7 @@ class FunctionPruner(SyntacticPruner):
 
     def accept(self, obj: Tuple[Type, Program]) -> bool:
         _, prog = obj
-        for P in prog.depth_first_iter():
+        for P in prog.post_order():
             if not isinstance(P, Function):
                 continue
             f = P.function
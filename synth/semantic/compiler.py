@@ -0,0 +1,124 @@
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, Set, Tuple
+
+from synth.syntax.program import Function, Primitive, Program, Variable
+
+# A compiled program: a function of the input and of the tuple of values of the parameters
+Closure = Callable[[List, Tuple], Any]
+
+
+def __constant__(value: Any) -> Closure:
+    return lambda x, c: value
+
+
+def __compile__(
+    program: Program,
+    semantics: Dict[str, Any],
+    skip_exceptions: Set[Exception],
+    parameters: Tuple[str, ...],
+    cache: MutableMapping[Program, Tuple[bool, Any]],
+) -> Tuple[bool, Any]:
+    """
+    Return (True, value) if the program is invariant, that is if it depends neither on the input nor on the parameters,
+    and it could be evaluated, otherwise (False, closure).
+    """
+    if program in cache:
+        return cache[program]
+    out = __compile_node__(program, semantics, skip_exceptions, parameters, cache)
+    cache[program] = out
+    return out
+
+
+def __compile_node__(
+    program: Program,
+    semantics: Dict[str, Any],
+    skip_exceptions: Set[Exception],
+    parameters: Tuple[str, ...],
+    cache: MutableMapping[Program, Tuple[bool, Any]],
+) -> Tuple[bool, Any]:
+    if isinstance(program, Variable):
+        i = program.variable
+        return False, lambda x, c: x[i]
+    if isinstance(program, Primitive):
+        if program.primitive in parameters:
+            k = parameters.index(program.primitive)
+            return False, lambda x, c: c[k]
+        return True, semantics[program.primitive]
+    assert isinstance(program, Function), f"Cannot compile {program}!"
+    is_value, f = __compile__(
+        program.function, semantics, skip_exceptions, parameters, cache
+    )
+    args = [
+        __compile__(arg, semantics, skip_exceptions, parameters, cache)
+        for arg in program.arguments
+    ]
+    if is_value and all(is_arg_value for is_arg_value, _ in args):
+        try:
+            value = f
+            for _, arg in args:
+                value = value(arg)
+            return True, value
+        except Exception as e:
+            if type(e) not in skip_exceptions:
+                raise e
+            # fails at each call
+    if is_value and all(not is_arg_value for is_arg_value, _ in args):
+        # the most common case: a primitive applied to sub-programs that depend on the input
+        if len(args) == 1:
+            a = args[0][1]
+            return False, lambda x, c: f(a(x, c))
+        if len(args) == 2:
+            a, b = args[0][1], args[1][1]
+            return False, lambda x, c: f(a(x, c))(b(x, c))
+    function = __constant__(f) if is_value else f
+    arguments = [
+        __constant__(arg) if is_arg_value else arg for is_arg_value, arg in args
+    ]
+
+    def call(x: List, c: Tuple) -> Any:
+        value = function(x, c)
+        for arg in arguments:
+            value = value(arg(x, c))
+        return value
+
+    return False, call
+
+
+def compile_program(
+    program: Program,
+    semantics: Dict[str, Any],
+    skip_exceptions: Set[Exception],
+    parameters: Tuple[str, ...] = (),
+    cache: Optional[MutableMapping[Program, Tuple[bool, Any]]] = None,
+) -> Callable[..., Any]:
+    """
+    Compile the program into a Python function of the input and of one value per parameter.
+
+    The program is turned into nested closures where primitives are bound to their semantics,
+    the primitives named in parameters are bound to the extra arguments of the function in the same order
+    and the invariant sub-programs, which depend neither on the input nor on the parameters,
+    are evaluated once at compile time.
+    Calling the function costs the semantic calls and one call per node that depends on the input:
+    no walk over the program, no type dispatch and no dictionary lookup.
+
+    A skipped exception raised during a call makes the function return None like DSLEvaluator.eval.
+    skip_exceptions is not copied so exceptions added later are also skipped.
+
+    cache: if given, stores the compiled sub-programs, so that compiling a program
+    whose sub-programs were already compiled with the same semantics and parameters costs one closure
+    """
+    is_value, compiled = __compile__(
+        program, semantics, skip_exceptions, parameters, {} if cache is None else cache
+    )
+    if is_value:
+        value = compiled
+        return lambda x, *c: value
+
+    def run(x: List, *c: Any) -> Any:
+        try:
+            return compiled(x, c)
+        except Exception as e:
+            if type(e) in skip_exceptions:
+                return None
+            raise e
+
+    return run
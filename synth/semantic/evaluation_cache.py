@@ -0,0 +1,156 @@
+from collections import OrderedDict
+import sys
+from typing import Any, Dict, Iterator, MutableMapping, Optional, Tuple
+
+from synth.syntax.program import Program
+
+
+class EvaluationCache(MutableMapping[Any, MutableMapping[Program, Any]]):
+    """
+    Bounded cache of the values of programs on inputs, that evicts the least recently used entries.
+
+    It is used like the Dict[inputs, Dict[Program, value]] of DSLEvaluator:
+    cache[inputs] is a view of the values on these inputs.
+    The inputs are interned to integers so that an entry is keyed by (input id, program)
+    whose hash only combines the cached hash of the program with a small integer.
+    Ids are never reused and the inputs are forgotten with their last entry.
+
+    max_entries: the maximum number of (inputs, program) entries
+    max_memory: the maximum approximate number of bytes used by the stored values
+    memory: the approximate number of bytes used by the stored values, as given by sys.getsizeof,
+    which does not count the objects referenced by a value such as the elements of a list
+
+    Storing a value never evicts an entry, so that the values of the sub-programs of a program
+    are available until the program is evaluated: the bounds are enforced by trim,
+    which the evaluator calls once it is done with an evaluation.
+    """
+
+    def __init__(
+        self, max_entries: Optional[int] = None, max_memory: Optional[int] = None
+    ) -> None:
+        assert (
+            max_entries is not None or max_memory is not None
+        ), "The cache must be bounded!"
+        assert (
+            max_entries is None or max_entries > 0
+        ), "The cache must hold at least one entry!"
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+        self._entries: "OrderedDict[Tuple[int, Program], Any]" = OrderedDict()
+        self._inputs: Dict[Any, int] = {}
+        # the inputs of each input id and its number of entries
+        self._keys: Dict[int, Any] = {}
+        self._counts: Dict[int, int] = {}
+        self._next_id = 0
+        self.memory = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._inputs)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._inputs)
+
+    def __contains__(self, inputs: Any) -> bool:
+        return inputs in self._inputs
+
+    def __setitem__(self, inputs: Any, values: MutableMapping[Program, Any]) -> None:
+        if inputs not in self._inputs:
+            self._inputs[inputs] = self._next_id
+            self._keys[self._next_id] = inputs
+            self._next_id += 1
+        view = self[inputs]
+        for program, value in values.items():
+            view[program] = value
+
+    def __getitem__(self, inputs: Any) -> "EvaluationCacheView":
+        return EvaluationCacheView(self, self._inputs[inputs])
+
+    def __delitem__(self, inputs: Any) -> None:
+        view = self[inputs]
+        for program in list(view):
+            del view[program]
+        # inputs without entries are still there
+        if inputs in self._inputs:
+            del self._keys[self._inputs.pop(inputs)]
+
+    @property
+    def entries(self) -> int:
+        return len(self._entries)
+
+    def __store__(self, key: Tuple[int, Program], value: Any) -> None:
+        if key in self._entries:
+            self.memory -= sys.getsizeof(self._entries[key])
+            self._entries.move_to_end(key)
+        else:
+            self._counts[key[0]] = self._counts.get(key[0], 0) + 1
+        self._entries[key] = value
+        self.memory += sys.getsizeof(value)
+
+    def __remove__(self, key: Tuple[int, Program]) -> None:
+        self.memory -= sys.getsizeof(self._entries.pop(key))
+        input_id = key[0]
+        self._counts[input_id] -= 1
+        if self._counts[input_id] == 0:
+            del self._counts[input_id]
+            # the inputs of a view kept after they were forgotten are not there
+            if input_id in self._keys:
+                del self._inputs[self._keys.pop(input_id)]
+
+    def trim(self) -> None:
+        """
+        Evict the least recently used entries until the cache is within its bounds.
+        """
+        max_entries = self.max_entries or len(self._entries)
+        max_memory = self.max_memory if self.max_memory is not None else self.memory
+        while len(self._entries) > max_entries or self.memory > max_memory:
+            self.__remove__(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._inputs.clear()
+        self._keys.clear()
+        self._counts.clear()
+        self.memory = 0
+
+
+class EvaluationCacheView(MutableMapping[Program, Any]):
+    """
+    The values of an EvaluationCache on some inputs.
+    Looking up a program marks its entry as recently used.
+    """
+
+    __slots__ = ("_cache", "_entries", "_input")
+
+    def __init__(self, cache: EvaluationCache, input_id: int) -> None:
+        self._cache = cache
+        self._entries = cache._entries
+        self._input = input_id
+
+    def __contains__(self, program: object) -> bool:
+        try:
+            self._entries.move_to_end((self._input, program))  # type: ignore
+            return True
+        except KeyError:
+            return False
+
+    def __len__(self) -> int:
+        return self._cache._counts.get(self._input, 0)
+
+    def __iter__(self) -> Iterator[Program]:
+        return (
+            program for input_id, program in self._entries if input_id == self._input
+        )
+
+    def __delitem__(self, program: Program) -> None:
+        self._cache.__remove__((self._input, program))
+
+    def __getitem__(self, program: Program) -> Any:
+        key = (self._input, program)
+        value = self._entries[key]
+        self._entries.move_to_end(key)
+        return value
+
+    def __setitem__(self, program: Program, value: Any) -> None:
+        self._cache.__store__((self._input, program), value)
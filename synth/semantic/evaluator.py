@@ -1,15 +1,90 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Iterable, List, Set
+from collections import OrderedDict
+import sys
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
-from synth.syntax.program import Function, Primitive, Program, Variable
+import numpy as np
+
+from synth.semantic.compiler import compile_program
+from synth.semantic.evaluation_cache import EvaluationCache
+from synth.semantic.limits import EvaluationLimitExceeded, EvaluationLimits
+from synth.specification import Example
+from synth.syntax.program import (
+    Function,
+    Primitive,
+    Program,
+    ProgramFactory,
+    Variable,
+)
 from synth.syntax.type_system import PrimitiveType
 
 
 class Evaluator(ABC):
+    def __init__(self) -> None:
+        # the examples of the last call to check, the order in which they are tried
+        # and the number of programs each of them rejected
+        self._check_examples: Optional[List[Example]] = None
+        self._check_order: List[int] = []
+        self._check_rejections: List[int] = []
+
     @abstractmethod
     def eval(self, program: Program, input: Any) -> Any:
         pass
 
+    def check(self, program: Program, examples: List[Example]) -> bool:
+        """
+        Return True iff the program is correct on all examples.
+
+        Evaluation stops at the first wrong output and the examples that reject the most programs are tried first:
+        the number of programs rejected by each example is counted over the calls with the same list of examples object,
+        typically the examples of the task being solved, see check_rejections.
+        """
+        order = self.__check_order__(examples)
+        for position, i in enumerate(order):
+            example = examples[i]
+            if self.eval(program, example.inputs) != example.output:
+                self.__rejected_at__(position)
+                return False
+        return True
+
+    def __check_order__(self, examples: List[Example]) -> List[int]:
+        if examples is not self._check_examples:
+            self._check_examples = examples
+            self._check_order = list(range(len(examples)))
+            self._check_rejections = [0] * len(examples)
+        return self._check_order
+
+    def __rejected_at__(self, position: int) -> None:
+        """
+        Count a rejection by the example at this position of the order,
+        it moves one position ahead when it has rejected more programs than the example before it.
+        """
+        order = self._check_order
+        i = order[position]
+        self._check_rejections[i] += 1
+        if (
+            position > 0
+            and self._check_rejections[i] > self._check_rejections[order[position - 1]]
+        ):
+            order[position - 1], order[position] = i, order[position - 1]
+
+    @property
+    def check_rejections(self) -> List[int]:
+        """
+        The number of programs rejected by each example of the last list of examples given to check.
+        """
+        return self._check_rejections
+
     @abstractmethod
     def clear_cache(self) -> None:
         """
@@ -19,12 +94,22 @@ class Evaluator(ABC):
 
 
 def __tuplify__(element: Any) -> Any:
-    if isinstance(element, List):
-        return tuple(__tuplify__(x) for x in element)
+    if isinstance(element, list):
+        return tuple([__tuplify__(x) if isinstance(x, list) else x for x in element])
     else:
         return element
 
 
+def __reset_limits__(
+    compiled: Callable[..., Any], limits: EvaluationLimits
+) -> Callable[..., Any]:
+    def run(x: List, *c: Any) -> Any:
+        limits.reset()
+        return compiled(x, *c)
+
+    return run
+
+
 def auto_complete_semantics(
     primitives: Iterable[str], semantics: Dict[str, Any]
 ) -> None:
@@ -43,27 +128,112 @@ def auto_complete_semantics(
                 semantics[prim] = semantics[prefix]
 
 
+def __out_of_steps__(e: Exception) -> bool:
+    """
+    Whether e is the step budget being exceeded, a failure that is not memoised
+    since it depends on all the evaluations made since the last reset.
+    """
+    return isinstance(e, EvaluationLimitExceeded) and e.steps
+
+
+# Marks the sub-programs whose evaluation raised a skipped exception
+__FAILED__ = object()
+# Mark the keys of the cache of DSLEvaluatorWithConstant
+# that hold the values with constants and the values of invariant programs
+__CONSTANTS__ = object()
+__INVARIANTS__ = object()
+# Marks the key of a bounded cache that holds the compiled sub-programs
+__COMPILED__ = object()
+
+
 class DSLEvaluator(Evaluator):
-    def __init__(self, semantics: Dict[str, Any], use_cache: bool = True) -> None:
+    def __init__(
+        self,
+        semantics: Dict[str, Any],
+        use_cache: bool = True,
+        factory: Optional[ProgramFactory] = None,
+        cache_size: Optional[int] = None,
+        keep_cache: bool = False,
+        cache_memory: Optional[int] = None,
+        limits: Optional[EvaluationLimits] = None,
+    ) -> None:
+        """
+        factory: if given, programs are interned in it before being evaluated
+        so that the cache only holds programs of the factory and finding a program in the cache is an identity check,
+        pass the factory that built the programs, e.g. the one of the enumerator, to make interning free
+        cache_size: if given, the cache of eval and eval_batch holds at most this number of (inputs, program) values
+        and evicts the least recently used ones, see synth.semantic.evaluation_cache.EvaluationCache
+        cache_memory: if given, the values in the cache of eval and eval_batch use at most about this number of bytes,
+        the least recently used ones are evicted
+        the outputs stored by eval_incremental are bounded separately by the same cache_size and cache_memory,
+        the outputs on the least recently used input are evicted together
+        keep_cache: if True, clear_cache does not clear the caches of eval, eval_batch and eval_incremental,
+        so that the values computed for a task are reused for the next tasks that share inputs,
+        it is best used with a cache_size to bound the memory used
+        limits: if given, an evaluation that exceeds these limits fails, see synth.semantic.limits.EvaluationLimits,
+        the steps of the sub-programs found in the cache are not counted
+        """
         super().__init__()
-        self.semantics = semantics
+        self.limits = limits
+        self.semantics = semantics if limits is None else limits.guard(semantics)
         self.use_cache = use_cache
-        self._cache: Dict[Any, Dict[Program, Any]] = {}
+        self.factory = factory
+        self.cache_size = cache_size
+        self.cache_memory = cache_memory
+        self.keep_cache = keep_cache
+        self._cache: MutableMapping[Any, MutableMapping[Program, Any]] = (
+            {}
+            if cache_size is None and cache_memory is None
+            else EvaluationCache(cache_size, cache_memory)
+        )
         self._cons_cache: Dict[Any, Dict[Program, Any]] = {}
+        self.__init_incremental__()
+        self.__init_compiled__()
+        # the inputs of the examples of the last call to check_incremental
+        self._check_inputs: List[List] = []
         self.skip_exceptions: Set[Exception] = set()
+        if limits is not None:
+            self.skip_exceptions.add(EvaluationLimitExceeded)  # type: ignore
         # Statistics
         self._total_requests = 0
         self._cache_hits = 0
 
+    def __init_incremental__(self) -> None:
+        # self._incremental[input][program] = output on input, least recently used inputs first
+        self._incremental: "OrderedDict[Any, Dict[Program, Any]]" = OrderedDict()
+        # the number of stored outputs, their approximate bytes, only counted with a cache_memory, and evicted outputs
+        self._incremental_entries = 0
+        self._incremental_memory = 0
+        self._incremental_evictions = 0
+        # the inputs of the last call to eval_incremental and the table of each input
+        self._incremental_inputs: Optional[List[List]] = None
+        self._incremental_tables: List[Optional[Dict[Program, Any]]] = []
+
+    def __init_compiled__(self) -> None:
+        # compiled sub-programs, they share the budget of a bounded cache
+        self._compiled: MutableMapping[Program, Tuple[bool, Any]] = {}
+        if isinstance(self._cache, EvaluationCache):
+            self._cache[__COMPILED__] = {}
+            self._compiled = self._cache[__COMPILED__]
+
     def eval(self, program: Program, input: List) -> Any:
+        if self.factory is not None:
+            program = self.factory.intern(program)
+        if self.limits is not None:
+            self.limits.reset()
         key = __tuplify__(input)
         if key not in self._cache and self.use_cache:
             self._cache[key] = {}
-        evaluations: Dict[Program, Any] = self._cache[key] if self.use_cache else {}
+        evaluations: MutableMapping[Program, Any] = (
+            self._cache[key] if self.use_cache else {}
+        )
         if program in evaluations:
-            return evaluations[program]
+            self._total_requests += 1
+            self._cache_hits += 1
+            value = evaluations[program]
+            return None if value is __FAILED__ else value
         try:
-            for sub_prog in program.depth_first_iter():
+            for sub_prog in program.post_order():
                 self._total_requests += 1
                 if sub_prog in evaluations:
                     self._cache_hits += 1
@@ -75,24 +245,262 @@ class DSLEvaluator(Evaluator):
                 elif isinstance(sub_prog, Function):
                     fun = evaluations[sub_prog.function]
                     for arg in sub_prog.arguments:
-                        fun = fun(evaluations[arg])
+                        arg_value = evaluations[arg]
+                        if arg_value is __FAILED__:
+                            fun = __FAILED__
+                            break
+                        fun = fun(arg_value)
                     evaluations[sub_prog] = fun
         except Exception as e:
             if type(e) in self.skip_exceptions:
-                evaluations[program] = None
+                if not __out_of_steps__(e):
+                    evaluations[program] = __FAILED__
+                self.__trim__()
                 return None
             else:
                 raise e
 
-        return evaluations[program]
+        value = evaluations[program]
+        self.__trim__()
+        return None if value is __FAILED__ else value
+
+    def eval_batch(
+        self, programs: List[Program], examples: List[Example]
+    ) -> np.ndarray:
+        """
+        Evaluate a batch of programs on all examples of a task at once.
+        Examples are processed one after the other and a program is only evaluated
+        on the next example if it is correct on the previous ones.
+        Each sub-program shared across the batch, and across calls to eval or eval_batch if the cache is used,
+        is evaluated once per example.
+
+        Return the mask of the programs that are correct on all examples.
+        """
+        if self.factory is not None:
+            programs = [self.factory.intern(program) for program in programs]
+        alive = list(range(len(programs)))
+        for example in examples:
+            if not alive:
+                break
+            key = __tuplify__(example.inputs)
+            if key not in self._cache and self.use_cache:
+                self._cache[key] = {}
+            evaluations: MutableMapping[Program, Any] = (
+                self._cache[key] if self.use_cache else {}
+            )
+            output = example.output
+            next_alive = []
+            for i in alive:
+                if self.limits is not None:
+                    self.limits.reset()
+                try:
+                    value = self.__eval_memo__(programs[i], example.inputs, evaluations)
+                except EvaluationLimitExceeded:
+                    # out of steps, see __eval_memo__
+                    value = __FAILED__
+                # a failed evaluation evaluates to None like in eval
+                if value == output or (value is __FAILED__ and output is None):
+                    next_alive.append(i)
+            alive = next_alive
+            self.__trim__()
+        mask = np.zeros(len(programs), dtype=bool)
+        mask[alive] = True
+        return mask
+
+    def __eval_memo__(
+        self, program: Program, input: List, evaluations: MutableMapping[Program, Any]
+    ) -> Any:
+        """
+        Same as eval but only the sub-programs that are not in evaluations are visited
+        and a failed evaluation evaluates to __FAILED__.
+        """
+        self._total_requests += 1
+        if program in evaluations:
+            self._cache_hits += 1
+            value = evaluations[program]
+        elif isinstance(program, Function):
+            value = self.__eval_memo__(program.function, input, evaluations)
+            try:
+                for arg in program.arguments:
+                    arg_value = self.__eval_memo__(arg, input, evaluations)
+                    if arg_value is __FAILED__:
+                        value = __FAILED__
+                        break
+                    value = value(arg_value)
+            except Exception as e:
+                # running out of steps is raised up to the evaluated program so that no sub-program is marked as failed
+                if type(e) not in self.skip_exceptions or __out_of_steps__(e):
+                    raise e
+                value = __FAILED__
+            evaluations[program] = value
+        elif isinstance(program, Primitive):
+            value = evaluations[program] = self.semantics[program.primitive]
+        elif isinstance(program, Variable):
+            value = evaluations[program] = input[program.variable]
+        return value
+
+    def __trim__(self) -> None:
+        if isinstance(self._cache, EvaluationCache):
+            self._cache.trim()
+
+    def eval_incremental(self, program: Program, inputs: List[List], index: int) -> Any:
+        """
+        Evaluate the program on inputs[index].
+
+        The outputs of each evaluated sub-program are stored by input and by sub-program,
+        thus evaluating a Function whose function and arguments were already evaluated,
+        such as the programs built by HSEnumerator from its interned sub-programs,
+        costs one semantic call and the lookups of the sub-programs, which are identity checks.
+        Programs of another enumerator, e.g. of the next task with keep_cache, find the outputs of equal programs.
+        Passing the same list of inputs object as in the previous call saves looking up the outputs of these inputs.
+
+        A failed evaluation evaluates to None like in eval.
+        """
+        if self.factory is not None:
+            program = self.factory.intern(program)
+        if inputs is not self._incremental_inputs:
+            self._incremental_inputs = inputs
+            self._incremental_tables = [None] * len(inputs)
+        table = self._incremental_tables[index]
+        if table is None:
+            key = __tuplify__(inputs[index])
+            if key not in self._incremental:
+                self._incremental[key] = {}
+            self._incremental.move_to_end(key)
+            table = self._incremental_tables[index] = self._incremental[key]
+        if self.limits is not None:
+            self.limits.reset()
+        try:
+            value = self.__eval_incremental__(program, inputs[index], table)
+        except EvaluationLimitExceeded:
+            value = __FAILED__
+        self.__trim_incremental__()
+        return None if value is __FAILED__ else value
+
+    def check_incremental(self, program: Program, examples: List[Example]) -> bool:
+        """
+        Same as check, with the examples ordered as in check, but the program is evaluated with eval_incremental.
+        """
+        if examples is not self._check_examples:
+            self._check_inputs = [example.inputs for example in examples]
+        order = self.__check_order__(examples)
+        for position, i in enumerate(order):
+            if (
+                self.eval_incremental(program, self._check_inputs, i)
+                != examples[i].output
+            ):
+                self.__rejected_at__(position)
+                return False
+        return True
+
+    def __trim_incremental__(self) -> None:
+        """
+        Evict the outputs on the least recently used inputs until the tables of eval_incremental are within the bounds of the cache.
+        """
+        max_entries = self.cache_size or self._incremental_entries
+        max_memory = (
+            self.cache_memory
+            if self.cache_memory is not None
+            else self._incremental_memory
+        )
+        while self._incremental_entries > max_entries or (
+            self._incremental_memory > max_memory
+        ):
+            _, table = self._incremental.popitem(last=False)
+            self._incremental_entries -= len(table)
+            self._incremental_evictions += len(table)
+            if self.cache_memory is not None:
+                self._incremental_memory -= sum(map(sys.getsizeof, table.values()))
+            if any(table is t for t in self._incremental_tables):
+                self._incremental_inputs = None
+                self._incremental_tables = []
+
+    def __eval_incremental__(
+        self, program: Program, input: List, table: Dict[Program, Any]
+    ) -> Any:
+        self._total_requests += 1
+        if program in table:
+            self._cache_hits += 1
+            return table[program]
+        if isinstance(program, Function):
+            value = self.__eval_incremental__(program.function, input, table)
+            try:
+                for arg in program.arguments:
+                    arg_value = self.__eval_incremental__(arg, input, table)
+                    if value is __FAILED__ or arg_value is __FAILED__:
+                        value = __FAILED__
+                        break
+                    value = value(arg_value)
+            except Exception as e:
+                # running out of steps is raised up to eval_incremental, see __eval_memo__
+                if type(e) not in self.skip_exceptions or __out_of_steps__(e):
+                    raise e
+                value = __FAILED__
+        elif isinstance(program, Primitive):
+            value = self.semantics[program.primitive]
+        elif isinstance(program, Variable):
+            value = input[program.variable]
+        else:
+            value = self.eval(program, input)
+        table[program] = value
+        self._incremental_entries += 1
+        if self.cache_memory is not None:
+            self._incremental_memory += sys.getsizeof(value)
+        return value
+
+    def compile(self, program: Program) -> Callable[[List], Any]:
+        """
+        Compile the program, see synth.semantic.compiler.compile_program.
+        Calling compile(program)(input) is the same as calling eval(program, input),
+        it is worth it when the program is evaluated many times.
+        Compiled sub-programs are cached so compiling a program whose sub-programs were already compiled is cheap.
+        """
+        if self.factory is not None:
+            program = self.factory.intern(program)
+        compiled = compile_program(
+            program, self.semantics, self.skip_exceptions, cache=self._compiled
+        )
+        self.__trim__()
+        return (
+            compiled if self.limits is None else __reset_limits__(compiled, self.limits)
+        )
 
     def clear_cache(self) -> None:
-        self._cache = {}
+        if not self.keep_cache:
+            self._cache.clear()
+            self.__init_incremental__()
+        if not self.keep_cache or not isinstance(self._cache, EvaluationCache):
+            self.__init_compiled__()
         self._cons_cache = {}
+        # the inputs object may be reused by the next task with other values
+        self._incremental_inputs = None
+        self._incremental_tables = []
 
     @property
     def cache_hit_rate(self) -> float:
-        return self._cache_hits / self._total_requests
+        return self._cache_hits / max(1, self._total_requests)
+
+    @property
+    def cache_stats(self) -> Dict[str, float]:
+        """
+        Statistics of the cache of eval and eval_batch:
+        requests and hits count the sub-programs looked up and found in the cache,
+        compiled counts the compiled sub-programs, which are stored in the cache when it is bounded,
+        incremental counts the outputs stored by eval_incremental, whose evictions are also counted,
+        entries, evictions and memory (approximate bytes of the stored values) are only given for a bounded cache.
+        """
+        stats: Dict[str, float] = {
+            "requests": self._total_requests,
+            "hits": self._cache_hits,
+            "hit_rate": self.cache_hit_rate,
+        }
+        stats["compiled"] = len(self._compiled)
+        stats["incremental"] = self._incremental_entries
+        if isinstance(self._cache, EvaluationCache):
+            stats["entries"] = self._cache.entries
+            stats["evictions"] = self._cache.evictions + self._incremental_evictions
+            stats["memory"] = self._cache.memory
+        return stats
 
 
 class DSLEvaluatorWithConstant(Evaluator):
@@ -101,26 +509,56 @@ class DSLEvaluatorWithConstant(Evaluator):
         semantics: Dict[str, Any],
         constant_types: Set[PrimitiveType],
         use_cache: bool = True,
+        cache_size: Optional[int] = None,
+        cache_memory: Optional[int] = None,
+        limits: Optional[EvaluationLimits] = None,
     ) -> None:
+        """
+        cache_size: if given, the caches hold at most this number of values in total
+        cache_memory: if given, the values in the caches use at most about this number of bytes
+        when the caches are bounded, they share a single EvaluationCache that evicts the least recently used values,
+        see synth.semantic.evaluation_cache.EvaluationCache
+        limits: if given, an evaluation that exceeds these limits fails, see synth.semantic.limits.EvaluationLimits
+        """
         super().__init__()
-        self.semantics = semantics
+        self.limits = limits
+        self.semantics = semantics if limits is None else limits.guard(semantics)
         self.constant_types = constant_types
         self.use_cache = use_cache
-        self._cache: Dict[Any, Dict[Program, Any]] = {}
-        self._cons_cache: Dict[Any, Dict[Program, Any]] = {}
-        self._invariant_cache: Dict[Program, Any] = {}
+        self.cache_size = cache_size
+        self.cache_memory = cache_memory
+        self.__init_caches__()
         self.skip_exceptions: Set[Exception] = set()
+        if limits is not None:
+            self.skip_exceptions.add(EvaluationLimitExceeded)  # type: ignore
         # Statistics
         self._total_requests = 0
         self._cache_hits = 0
 
+    def __init_caches__(self) -> None:
+        self._cache: MutableMapping[Any, MutableMapping[Program, Any]] = {}
+        self._cons_cache: MutableMapping[Any, MutableMapping[Program, Any]] = {}
+        self._invariant_cache: MutableMapping[Program, Any] = {}
+        # compiled sub-programs
+        self._compiled: MutableMapping[Program, Tuple[bool, Any]] = {}
+        if self.cache_size is not None or self.cache_memory is not None:
+            bounded = EvaluationCache(self.cache_size, self.cache_memory)
+            # the keys of _cons_cache, of the invariants and of the compiled sub-programs differ from the inputs keys of _cache
+            self._cache = self._cons_cache = bounded
+            bounded[__INVARIANTS__] = {}
+            self._invariant_cache = bounded[__INVARIANTS__]
+            bounded[__COMPILED__] = {}
+            self._compiled = bounded[__COMPILED__]
+
     def eval_with_constant(
         self, program: Program, input: List, constant_in: str, constant_out: str
     ) -> Any:
-        evaluations: Dict[Program, Any] = {}
+        if self.limits is not None:
+            self.limits.reset()
+        evaluations: MutableMapping[Program, Any] = {}
         if self.use_cache:
             used_cons = False
-            for sub_prog in program.depth_first_iter():
+            for sub_prog in program.post_order():
                 if (
                     isinstance(sub_prog, Primitive)
                     and sub_prog.type in self.constant_types
@@ -128,19 +566,22 @@ class DSLEvaluatorWithConstant(Evaluator):
                     used_cons = True
                     break
             if used_cons:
-                key = input.copy()
-                key.append(constant_in)
-                key.append(constant_out)
-                key = __tuplify__(key)
-                evaluations = self._cons_cache[key] if key in self._cons_cache else {}
+                key = (__CONSTANTS__, __tuplify__(input), constant_in, constant_out)
+                cache = self._cons_cache
             else:
                 key = __tuplify__(input)
-                evaluations = self._cache[key] if key in self._cache else {}
+                cache = self._cache
+            if key not in cache:
+                cache[key] = {}
+            evaluations = cache[key]
 
         if program in evaluations:
-            return evaluations[program]
+            self._total_requests += 1
+            self._cache_hits += 1
+            value = evaluations[program]
+            return None if value is __FAILED__ else value
         try:
-            for sub_prog in program.depth_first_iter():
+            for sub_prog in program.post_order():
                 self._total_requests += 1
                 if sub_prog in evaluations:
                     self._cache_hits += 1
@@ -150,8 +591,6 @@ class DSLEvaluatorWithConstant(Evaluator):
                         self._cache_hits += 1
                         evaluations[sub_prog] = self._invariant_cache[sub_prog]
                         continue
-                    else:
-                        self._invariant_cache[sub_prog] = None
                 if isinstance(sub_prog, Primitive):
                     if sub_prog.primitive == "cste_in":
                         evaluations[sub_prog] = constant_in
@@ -164,31 +603,105 @@ class DSLEvaluatorWithConstant(Evaluator):
                 elif isinstance(sub_prog, Function):
                     fun = evaluations[sub_prog.function]
                     for arg in sub_prog.arguments:
-                        fun = fun(evaluations[arg])
+                        arg_value = evaluations[arg]
+                        if arg_value is __FAILED__:
+                            fun = __FAILED__
+                            break
+                        fun = fun(arg_value)
                     evaluations[sub_prog] = fun
                 if sub_prog.is_invariant(self.constant_types):
                     self._invariant_cache[sub_prog] = evaluations[sub_prog]
 
         except Exception as e:
             if type(e) in self.skip_exceptions:
-                evaluations[program] = None
+                if not __out_of_steps__(e):
+                    evaluations[program] = __FAILED__
+                self.__trim__()
                 return None
             else:
                 print(e)
                 raise e
 
-        return evaluations[program]
+        value = evaluations[program]
+        self.__trim__()
+        return None if value is __FAILED__ else value
+
+    def __trim__(self) -> None:
+        if isinstance(self._cache, EvaluationCache):
+            self._cache.trim()
+
+    def check_with_constant(
+        self,
+        program: Program,
+        examples: List[Example],
+        constants_in: List[str],
+        constants_out: List[str],
+    ) -> bool:
+        """
+        Return True iff on each example the program is correct for at least one pair of constants,
+        the examples are ordered as in check.
+        """
+        compiled = self.compile(program)
+        order = self.__check_order__(examples)
+        for position, i in enumerate(order):
+            example = examples[i]
+            if all(
+                compiled(example.inputs, constant_in, constant_out) != example.output
+                for constant_in in constants_in
+                for constant_out in constants_out
+            ):
+                self.__rejected_at__(position)
+                return False
+        return True
 
     def eval(self, program: Program, input: List) -> Any:
         if len(input) >= 3:
             return self.eval_with_constant(program, input[2:], input[0], input[1])
         return self.eval_with_constant(program, input, "", "")
 
+    def compile(self, program: Program) -> Callable[[List, Any, Any], Any]:
+        """
+        Compile the program, see synth.semantic.compiler.compile_program.
+        Calling compile(program)(input, constant_in, constant_out) is the same as
+        calling eval_with_constant(program, input, constant_in, constant_out),
+        it is worth it when the program is evaluated many times.
+        Compiled sub-programs are cached so compiling a program whose sub-programs were already compiled is cheap.
+        """
+        compiled = compile_program(
+            program,
+            self.semantics,
+            self.skip_exceptions,
+            ("cste_in", "cste_out"),
+            self._compiled,
+        )
+        self.__trim__()
+        return (
+            compiled if self.limits is None else __reset_limits__(compiled, self.limits)
+        )
+
     def clear_cache(self) -> None:
-        self._cache = {}
-        self._cons_cache = {}
-        self._invariant_cache = {}
+        self.__init_caches__()
 
     @property
     def cache_hit_rate(self) -> float:
-        return self._cache_hits / self._total_requests
+        return self._cache_hits / max(1, self._total_requests)
+
+    @property
+    def cache_stats(self) -> Dict[str, float]:
+        """
+        Statistics of the caches:
+        requests and hits count the sub-programs looked up and found in the caches,
+        compiled counts the compiled sub-programs, which share the bounded caches,
+        entries, evictions and memory (approximate bytes of the stored values) are only given for bounded caches.
+        """
+        stats: Dict[str, float] = {
+            "requests": self._total_requests,
+            "hits": self._cache_hits,
+            "hit_rate": self.cache_hit_rate,
+        }
+        stats["compiled"] = len(self._compiled)
+        if isinstance(self._cache, EvaluationCache):
+            stats["entries"] = self._cache.entries
+            stats["evictions"] = self._cache.evictions
+            stats["memory"] = self._cache.memory
+        return stats
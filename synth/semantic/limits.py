@@ -0,0 +1,92 @@
+from typing import Any, Callable, Dict, Optional
+
+
+class EvaluationLimitExceeded(Exception):
+    """
+    Raised when an evaluation exceeds its EvaluationLimits.
+    steps is True when the step budget is exceeded: unlike a value that is too large,
+    this failure depends on everything evaluated since the last reset, so evaluators do not memoise it.
+    """
+
+    def __init__(self, steps: bool = False) -> None:
+        super().__init__()
+        self.steps = steps
+
+
+class EvaluationLimits:
+    """
+    Step budget and caps on the size of intermediate values for the evaluation of a program.
+
+    The semantics given to guard are wrapped so that each call to a semantic function, including the calls
+    made by higher-order primitives to their function arguments, costs 1 step plus the length
+    of its argument if it is a list, a tuple or a string, and so that each value it returns is checked:
+    lists and tuples can have at most max_list_length elements, strings at most max_string_length characters
+    and integers, alone or in a list or a tuple, at most max_int in absolute value.
+    A violation raises EvaluationLimitExceeded, which evaluators skip so that the evaluation fails.
+    The steps are counted from the last call to reset, that evaluators make before each evaluation,
+    so running out of steps is a failure of the evaluated program, not of its sub-programs.
+
+    The limits are checked between semantic calls: they do not interrupt a single call,
+    such as a catastrophic regular expression, but they stop the chains of calls that grow values.
+    """
+
+    def __init__(
+        self,
+        max_steps: Optional[int] = None,
+        max_list_length: Optional[int] = None,
+        max_string_length: Optional[int] = None,
+        max_int: Optional[int] = None,
+    ) -> None:
+        self.max_steps = max_steps
+        self.max_list_length = max_list_length
+        self.max_string_length = max_string_length
+        self.max_int = max_int
+        self.steps = 0
+        self.violations = 0
+
+    def reset(self) -> None:
+        self.steps = 0
+
+    def guard(self, semantics: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return a copy of the semantics where each function is guarded by these limits.
+        """
+        return {
+            name: self.__guard__(value) if callable(value) else value
+            for name, value in semantics.items()
+        }
+
+    def __guard__(self, f: Callable) -> Callable:
+        def guarded(x: Any) -> Any:
+            self.steps += 1 + len(x) if isinstance(x, (list, tuple, str)) else 1
+            if self.max_steps is not None and self.steps > self.max_steps:
+                self.__violation__(steps=True)
+            out = f(x)
+            if callable(out):
+                return self.__guard__(out)
+            self.__check__(out)
+            return out
+
+        return guarded
+
+    def __check__(self, value: Any) -> None:
+        if isinstance(value, (list, tuple)):
+            if self.max_list_length is not None and len(value) > self.max_list_length:
+                self.__violation__()
+            if self.max_int is not None and any(
+                type(x) is int and abs(x) > self.max_int for x in value
+            ):
+                self.__violation__()
+        elif isinstance(value, str):
+            if (
+                self.max_string_length is not None
+                and len(value) > self.max_string_length
+            ):
+                self.__violation__()
+        elif type(value) is int:
+            if self.max_int is not None and abs(value) > self.max_int:
+                self.__violation__()
+
+    def __violation__(self, steps: bool = False) -> None:
+        self.violations += 1
+        raise EvaluationLimitExceeded(steps)
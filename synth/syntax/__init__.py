@@ -2,7 +2,14 @@
 Module that contains anything relevant to the syntax
 """
 from synth.syntax.dsl import DSL
-from synth.syntax.program import Primitive, Variable, Function, Lambda, Program
+from synth.syntax.program import (
+    Primitive,
+    Variable,
+    Function,
+    Lambda,
+    Program,
+    ProgramFactory,
+)
 from synth.syntax.type_system import (
     Type,
     FunctionType,
@@ -25,6 +32,10 @@ from synth.syntax.grammars import (
     ProbDetGrammar,
     TaggedDetGrammar,
     enumerate_prob_grammar,
+    enumerate_prob_grammar_array,
+    enumerate_prob_grammar_bounded,
     enumerate_bucket_prob_grammar,
-    # split,
+    enumerate_prob_grammar_bottom_up,
+    split,
+    PCFGStore,
 )
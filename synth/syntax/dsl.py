@@ -1,8 +1,7 @@
-import copy
 from typing import Dict, Mapping, Optional, List as TList, Set, Tuple, Union
 
 from synth.syntax.type_system import Type, Arrow, List
-from synth.syntax.program import Function, Primitive, Program, Variable
+from synth.syntax.program import Function, Primitive, Program, ProgramFactory, Variable
 
 
 class DSL:
@@ -27,6 +26,7 @@ class DSL:
         ]
         self.forbidden_patterns = forbidden_patterns or {}
         self._forbidden_computed = False
+        self._polymorphic_instantiated = False
 
     def __str__(self) -> str:
         s = "Print a DSL\n"
@@ -35,6 +35,14 @@ class DSL:
         return s
 
     def instantiate_polymorphic_types(self, upper_bound_type_size: int = 10) -> None:
+        """
+        Replace each polymorphic primitive by its instantiations whose type size is at most upper_bound_type_size.
+        Only the first call does something: once instantiated, no polymorphic primitive remains
+        so grammars built from the same DSL share its instantiation.
+        """
+        if self._polymorphic_instantiated:
+            return
+        self._polymorphic_instantiated = True
 
         # Generate all basic types
         set_basic_types: Set[Type] = set()
@@ -65,8 +73,8 @@ class DSL:
                     for type_ in set_types:
                         for instantiated_type in set_instantiated_types:
                             unifier = {str(poly_type): type_}
-                            intermediate_type = copy.deepcopy(instantiated_type)
-                            new_type = intermediate_type.unify(unifier)
+                            # types are immutable, no copy is needed
+                            new_type = instantiated_type.unify(unifier)
                             if new_type.size() <= upper_bound_type_size:
                                 new_set_instantiated_types.add(new_type)
                     set_instantiated_types = new_set_instantiated_types
@@ -80,13 +88,23 @@ class DSL:
             o.list_primitives
         )
 
-    def parse_program(self, program: str, type_request: Type) -> Program:
+    def parse_program(
+        self,
+        program: str,
+        type_request: Type,
+        factory: Optional[ProgramFactory] = None,
+    ) -> Program:
         """
         Parse a program from its string representation given the type request.
+
+        factory: if given, the program is built by the factory
         """
         if " " in program:
             parts = list(
-                map(lambda p: self.parse_program(p, type_request), program.split(" "))
+                map(
+                    lambda p: self.parse_program(p, type_request, factory),
+                    program.split(" "),
+                )
             )
             function_calls: TList[int] = []
             level = 0
@@ -115,6 +133,8 @@ class DSL:
                         parse_stack(l, function_calls)
                         for _ in current.type.arguments()[:f_call]
                     ]
+                    if factory is not None:
+                        return factory.function(current, args)
                     return Function(current, args)
                 return current
 
@@ -127,12 +147,14 @@ class DSL:
             program = program.strip("()")
             for P in self.list_primitives:
                 if P.primitive == program:
-                    return P
+                    return P if factory is None else factory.intern(P)
             if program.startswith("var"):
                 varno = int(program[3:])
                 vart = type_request
                 if isinstance(type_request, Arrow):
                     vart = type_request.arguments()[varno]
+                if factory is not None:
+                    return factory.variable(varno, vart)
                 return Variable(varno, vart)
             assert False, f"can't parse: {program}"
 
@@ -6,7 +6,11 @@ from synth.syntax.grammars.det_grammar import DetGrammar
 from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar, TaggedDetGrammar
 from synth.syntax.grammars.heap_search import (
     enumerate_prob_grammar,
+    enumerate_prob_grammar_array,
+    enumerate_prob_grammar_bounded,
     enumerate_bucket_prob_grammar,
 )
+from synth.syntax.grammars.bottom_up_search import enumerate_prob_grammar_bottom_up
 
-# from synth.syntax.grammars.pcfg_splitter import split
+from synth.syntax.grammars.pcfg_splitter import split
+from synth.syntax.grammars.pcfg_store import PCFGStore
@@ -0,0 +1,225 @@
+from math import log2
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    TYPE_CHECKING,
+)
+
+from synth.syntax.program import Function, Primitive, Program, Variable
+from synth.syntax.grammars.heap_search import IntEncodedEnumerator
+from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
+
+if TYPE_CHECKING:
+    from synth.semantic.evaluator import DSLEvaluator
+
+U = TypeVar("U")
+V = TypeVar("V")
+W = TypeVar("W")
+
+# A program with its outputs on the inputs, None if there are no inputs
+BankEntry = Tuple[Program, Optional[List[Any]]]
+
+
+class BottomUpSearch(IntEncodedEnumerator[U, V, W]):
+    """
+    Bottom-up enumeration by increasing discretized cost.
+
+    The cost of a derivation of probability p is max(1, round(-log2(p) * precision)),
+    the cost of a program is the sum of the costs of its derivations,
+    programs are generated by non-decreasing cost.
+    For each non-terminal, a bank stores per cost the programs already generated
+    which are combined to build the programs of higher costs.
+
+    If an evaluator and inputs are given, each program is stored with its outputs on the inputs,
+    computed from the outputs of its arguments with one semantic call per input,
+    the outputs of the last generated program are available in current_outputs
+    where as with DSLEvaluator.eval a failed evaluation gives None.
+    Then a program with the same outputs as a program of lower or equal cost from the same non-terminal
+    is dropped, the number of dropped programs is kept in pruned.
+    The underlying grammar must be a CFG.
+    """
+
+    def __init__(
+        self,
+        G: ProbDetGrammar[U, V, W],
+        evaluator: "Optional[DSLEvaluator]" = None,
+        inputs: Optional[List[List]] = None,
+        precision: float = 1,
+    ) -> None:
+        super().__init__(G)
+        # Imported here since synth.semantic depends on synth.syntax
+        from synth.semantic.evaluator import __FAILED__, __tuplify__
+
+        # Marks the inputs on which the evaluation of a program failed
+        self._failed = __FAILED__
+        self._tuplify = __tuplify__
+        self.evaluator = evaluator
+        self.inputs = inputs
+        n = len(self.ids)
+        # self.costs[s][d] is the cost of the d-th derivation from s, None if it has probability 0
+        self.costs: List[List[Optional[int]]] = [
+            [
+                max(1, int(round(-log2(p) * precision))) if p > 0 else None
+                for p in probabilities
+            ]
+            for probabilities in self.derivation_probabilities
+        ]
+        # self.max_cost[s] is the max cost of a program generated from s
+        self.max_cost: List[int] = [-1 for _ in range(n)]
+        for s in range(n):
+            self.__init_max_cost__(s)
+        # self.banks[s][c] is the list of programs of cost c generated from s
+        self.banks: List[Dict[int, List[BankEntry]]] = [{} for _ in range(n)]
+        self.signatures: List[Set[Any]] = [set() for _ in range(n)]
+        # programs of the start non-terminal are only stored if they are used as arguments
+        self._store_start = any(
+            self.start in args
+            for derivations in self.derivation_arguments
+            for args in derivations
+        )
+        # outputs of the last generated program on the inputs, None if there are no inputs
+        self.current_outputs: Optional[List[Any]] = None
+        # Statistics
+        self.pruned = 0
+
+    def __init_max_cost__(self, s: int) -> None:
+        if self.max_cost[s] >= 0:
+            return
+        best = 0
+        for cost, args in zip(self.costs[s], self.derivation_arguments[s]):
+            if cost is None:
+                continue
+            for arg in args:
+                self.__init_max_cost__(arg)
+                cost += self.max_cost[arg]
+            best = max(best, cost)
+        self.max_cost[s] = best
+
+    def generator(self) -> Generator[Program, None, None]:
+        for cost in range(1, self.max_cost[self.start] + 1):
+            for s in range(len(self.ids)):
+                if s != self.start and cost <= self.max_cost[s]:
+                    self.__fill__(s, cost)
+            for program, outputs in self.__fill__(self.start, cost):
+                self.current = program
+                self.current_outputs = (
+                    None
+                    if outputs is None
+                    else [None if o is self._failed else o for o in outputs]
+                )
+                yield program
+
+    def __fill__(self, s: int, cost: int) -> List[BankEntry]:
+        """
+        Generate the programs of the specified cost from s.
+        """
+        bank: List[BankEntry] = []
+        for P, derivation_cost, args in zip(
+            self.derivations[s], self.costs[s], self.derivation_arguments[s]
+        ):
+            if derivation_cost is None or derivation_cost > cost:
+                continue
+            if not args:
+                if derivation_cost == cost:
+                    self.__store__(s, bank, P, self.__leaf_outputs__(P))
+                continue
+            for children in self.__combinations__(args, cost - derivation_cost):
+                self.__store__(
+                    s,
+                    bank,
+                    Function(P, [child[0] for child in children]),
+                    self.__apply__(P, children),
+                )
+        if s != self.start or self._store_start:
+            self.banks[s][cost] = bank
+        return bank
+
+    def __combinations__(
+        self, args: Tuple[int, ...], cost: int
+    ) -> Generator[List[BankEntry], None, None]:
+        """
+        Generate all lists of programs generated from args whose costs sum to the specified cost.
+        """
+        if len(args) == 1:
+            for entry in self.banks[args[0]].get(cost, []):
+                yield [entry]
+            return
+        for arg_cost, entries in self.banks[args[0]].items():
+            # each of the remaining arguments costs at least 1
+            if arg_cost > cost - len(args) + 1 or not entries:
+                continue
+            for tail in self.__combinations__(args[1:], cost - arg_cost):
+                for entry in entries:
+                    yield [entry] + tail
+
+    def __store__(
+        self,
+        s: int,
+        bank: List[BankEntry],
+        program: Program,
+        outputs: Optional[List[Any]],
+    ) -> None:
+        if outputs is not None:
+            try:
+                if not any(callable(output) for output in outputs):
+                    signature = self._tuplify(outputs)
+                    if signature in self.signatures[s]:
+                        self.pruned += 1
+                        return
+                    self.signatures[s].add(signature)
+            except TypeError:
+                # unhashable outputs are not deduplicated
+                pass
+        bank.append((program, outputs))
+
+    def __leaf_outputs__(self, P: Program) -> Optional[List[Any]]:
+        if self.evaluator is None or self.inputs is None:
+            return None
+        if isinstance(P, Variable):
+            return [input[P.variable] for input in self.inputs]
+        if isinstance(P, Primitive):
+            return [self.evaluator.semantics[P.primitive]] * len(self.inputs)
+        return None
+
+    def __apply__(self, P: Program, children: List[BankEntry]) -> Optional[List[Any]]:
+        if self.evaluator is None or self.inputs is None:
+            return None
+        if not isinstance(P, Primitive) or any(child[1] is None for child in children):
+            return None
+        semantic = self.evaluator.semantics[P.primitive]
+        skip_exceptions = self.evaluator.skip_exceptions
+        limits = self.evaluator.limits
+        failed = self._failed
+        outputs = []
+        for j in range(len(self.inputs)):
+            # the outputs of the children are reused so the step budget covers a single application
+            if limits is not None:
+                limits.reset()
+            fun = semantic
+            try:
+                for child in children:
+                    arg = child[1][j]  # type: ignore
+                    if arg is failed:
+                        fun = failed
+                        break
+                    fun = fun(arg)
+            except Exception as e:
+                if type(e) not in skip_exceptions:
+                    raise e
+                fun = failed
+            outputs.append(fun)
+        return outputs
+
+
+def enumerate_prob_grammar_bottom_up(
+    G: ProbDetGrammar[U, V, W],
+    evaluator: "Optional[DSLEvaluator]" = None,
+    inputs: Optional[List[List]] = None,
+) -> BottomUpSearch[U, V, W]:
+    return BottomUpSearch(G, evaluator, inputs)
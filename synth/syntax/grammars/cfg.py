@@ -1,6 +1,9 @@
 from collections import deque
+import hashlib
 from math import prod
-from typing import Deque, Dict, Literal, Set, Tuple, List
+import os
+import pickle
+from typing import Deque, Dict, Literal, Optional, Set, Tuple, List
 
 from synth.syntax.dsl import DSL
 from synth.syntax.grammars.det_grammar import DerivableProgram
@@ -13,6 +16,38 @@ NoneType = Literal[None]
 CFGState = Tuple[NGram, int]
 CFGNonTerminal = Tuple[Type, Tuple[CFGState, NoneType]]
 
+# Version of the CFGs pickled by depth_constraint in its cache_folder,
+# to increase whenever depth_constraint or the attributes of CFG change so that older files are not loaded
+__CACHE_VERSION__ = 1
+
+
+def __queue_key__(non_terminal: CFGNonTerminal) -> Tuple:
+    """
+    Key of a non-terminal such that two non-terminals have the same key iff they are equal.
+
+    Primitives are equal when they have the same name, and variables when they have the same index,
+    whatever their types, while their hashes depend on their types:
+    the key only keeps what equality compares so that it can be looked up in a set.
+    """
+    ngram, depth = non_terminal[1][0]
+    return (
+        non_terminal[0],
+        depth,
+        ngram.n,
+        tuple(
+            (
+                P.primitive
+                if isinstance(P, Primitive)
+                else P.variable
+                if isinstance(P, Variable)
+                else P,
+                type(P),
+                i,
+            )
+            for P, i in ngram.predecessors
+        ),
+    )
+
 
 class CFG(TTCFG[CFGState, NoneType]):
     """
@@ -41,6 +76,28 @@ class CFG(TTCFG[CFGState, NoneType]):
     def clean(self) -> None:
         self._remove_non_productive_()
         self._remove_non_reachable_()
+        self._arguments_table: Optional[
+            Dict[CFGNonTerminal, Dict[DerivableProgram, Tuple[CFGNonTerminal, ...]]]
+        ] = None
+
+    def arguments_table(
+        self,
+    ) -> Dict[CFGNonTerminal, Dict[DerivableProgram, Tuple[CFGNonTerminal, ...]]]:
+        """
+        In a CFG the non-terminals of the arguments of a derivation only depend on the derivation,
+        the table is computed the first time it is needed.
+        """
+        table = getattr(self, "_arguments_table", None)
+        if table is None:
+            table = {
+                S: {
+                    P: tuple((arg[0], (arg[1], None)) for arg in self.rules[S][P][0])
+                    for P in self.rules[S]
+                }
+                for S in self.rules
+            }
+            self._arguments_table = table
+        return table
 
     def _remove_non_reachable_(self) -> None:
         """
@@ -111,6 +168,7 @@ class CFG(TTCFG[CFGState, NoneType]):
         n_gram: int = 2,
         recursive: bool = False,
         constant_types: Set[Type] = set(),
+        cache_folder: Optional[str] = None,
     ) -> "CFG":
         """
         Constructs a CFG from a DSL imposing bounds on size of the types
@@ -122,12 +180,58 @@ class CFG(TTCFG[CFGState, NoneType]):
         n_gram: int - the context, a bigram depends only in the parent node
         recursvie: bool - allows the generated programs to call themselves
         constant_types: Set[Type] - the set of of types allowed for constant objects
+        cache_folder: Optional[str] - if given, the built CFG is pickled in this folder
+            and loaded instead of being built again by the next calls with the same DSL syntax and the same parameters
         """
         dsl.instantiate_polymorphic_types(upper_bound_type_size)
 
         dsl.instantiate_forbidden()
         forbidden_sets = dsl.forbidden_patterns
 
+        if cache_folder is not None:
+            key = repr(
+                (
+                    __CACHE_VERSION__,
+                    [(P.primitive, str(P.type)) for P in dsl.list_primitives],
+                    sorted(
+                        (str(source), sorted(forbidden))
+                        for source, forbidden in forbidden_sets.items()
+                    ),
+                    str(type_request),
+                    max_depth,
+                    upper_bound_type_size,
+                    min_variable_depth,
+                    n_gram,
+                    recursive,
+                    sorted(str(t) for t in constant_types),
+                )
+            )
+            path = os.path.join(
+                cache_folder,
+                f"cfg_{hashlib.sha256(key.encode()).hexdigest()[:32]}.pickle",
+            )
+            if os.path.exists(path):
+                with open(path, "rb") as fd:
+                    cfg: CFG = pickle.load(fd)
+                return cfg
+            cfg = CFG.depth_constraint(
+                dsl,
+                type_request,
+                max_depth,
+                upper_bound_type_size,
+                min_variable_depth,
+                n_gram,
+                recursive,
+                constant_types,
+            )
+            os.makedirs(cache_folder, exist_ok=True)
+            # Write then rename so that a concurrent run never reads a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as fd:
+                pickle.dump(cfg, fd)
+            os.replace(tmp_path, path)
+            return cfg
+
         if isinstance(type_request, Arrow):
             return_type = type_request.returns()
             args = type_request.arguments()
@@ -143,9 +247,12 @@ class CFG(TTCFG[CFGState, NoneType]):
         list_to_be_treated: Deque[CFGNonTerminal] = deque()
         initital_ctx = (return_type, ((NGram(n_gram), 0), None))
         list_to_be_treated.append(initital_ctx)
+        # the keys of the non-terminals in list_to_be_treated
+        queued: Set[Tuple] = {__queue_key__(initital_ctx)}
 
         while len(list_to_be_treated) > 0:
             non_terminal = list_to_be_treated.pop()
+            queued.remove(__queue_key__(non_terminal))
             depth = non_terminal[1][0][1]
             current_type = non_terminal[0]
             # Create rule if non existent
@@ -194,7 +301,9 @@ class CFG(TTCFG[CFGState, NoneType]):
                                 decorated_arguments_P.append(
                                     (arg, (new_predecessors, depth + 1))
                                 )
-                                if new_context not in list_to_be_treated:
+                                queue_key = __queue_key__(new_context)
+                                if queue_key not in queued:
+                                    queued.add(queue_key)
                                     list_to_be_treated.appendleft(new_context)
 
                             rules[non_terminal][P] = (decorated_arguments_P, None)
@@ -215,7 +324,9 @@ class CFG(TTCFG[CFGState, NoneType]):
                                     decorated_arguments_V.append(
                                         (arg, (new_predecessors, depth + 1))
                                     )
-                                    if new_context not in list_to_be_treated:
+                                    queue_key = __queue_key__(new_context)
+                                    if queue_key not in queued:
+                                        queued.add(queue_key)
                                         list_to_be_treated.appendleft(new_context)
 
                                 rules[non_terminal][V] = (decorated_arguments_V, None)
@@ -234,7 +345,9 @@ class CFG(TTCFG[CFGState, NoneType]):
                                 decorated_arguments_self.append(
                                     (arg, (new_predecessors, depth + 1))
                                 )
-                                if new_context not in list_to_be_treated:
+                                queue_key = __queue_key__(new_context)
+                                if queue_key not in queued:
+                                    queued.add(queue_key)
                                     list_to_be_treated.appendleft(new_context)
 
                             rules[non_terminal][P] = (decorated_arguments_self, None)
@@ -30,10 +30,11 @@ class DetGrammar(Grammar, ABC, Generic[U, V, W]):
         start: Tuple[Type, U],
         rules: Dict[Tuple[Type, U], Dict[DerivableProgram, V]],
         clean: bool = True,
+        type_request: Optional[Type] = None,
     ):
         self.start = start
         self.rules = rules
-        self.type_request = self._guess_type_request_()
+        self.type_request = type_request or self._guess_type_request_()
         if clean:
             self.clean()
 
@@ -150,6 +151,18 @@ class DetGrammar(Grammar, ABC, Generic[U, V, W]):
     def arguments_length_for(self, S: Tuple[Type, U], P: DerivableProgram) -> int:
         pass
 
+    def arguments_table(
+        self,
+    ) -> Optional[
+        Dict[Tuple[Type, U], Dict[DerivableProgram, Tuple[Tuple[Type, U], ...]]]
+    ]:
+        """
+        Table such that table[S][P] is the tuple of the non-terminals from which the arguments of the derivation S -> P are derived.
+        Returns None if this grammar has no such table, that is when these non-terminals depend on the programs derived for the previous arguments:
+        they must then be obtained through derive and derive_all.
+        """
+        return None
+
     @abstractmethod
     def start_information(self) -> W:
         pass
@@ -166,7 +179,11 @@ class DetGrammar(Grammar, ABC, Generic[U, V, W]):
 
         reduce is called after derivation.
         """
-
+        table = self.arguments_table()
+        if table is not None:
+            return self.__reduce_derivations_table__(
+                reduce, init, program, start or self.start, table
+            )
         return self.__reduce_derivations_rec__(
             reduce, init, program, start or self.start, self.start_information()
         )[0]
@@ -196,6 +213,23 @@ class DetGrammar(Grammar, ABC, Generic[U, V, W]):
             return value, information, next
         return value, information, start
 
+    def __reduce_derivations_table__(
+        self,
+        reduce: Callable[[T, Tuple[Type, U], DerivableProgram, V], T],
+        value: T,
+        program: Program,
+        start: Tuple[Type, U],
+        table: Dict[Tuple[Type, U], Dict[DerivableProgram, Tuple[Tuple[Type, U], ...]]],
+    ) -> T:
+        if isinstance(program, Function):
+            function: DerivableProgram = program.function  # type: ignore
+            value = reduce(value, start, function, self.rules[start][function])
+            for arg, S in zip(program.arguments, table[start][function]):
+                value = self.__reduce_derivations_table__(reduce, value, arg, S, table)
+        elif isinstance(program, (Primitive, Variable, Constant)):
+            value = reduce(value, start, program, self.rules[start][program])
+        return value
+
     def embed(self, program: Program) -> Optional[Program]:
         """
         If the DSL has equivalent primitives, try to embed a program without equivalent primtives into this grammar.
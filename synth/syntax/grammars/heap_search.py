@@ -1,3 +1,4 @@
+from array import array
 from collections import defaultdict
 from heapq import heappush, heappop
 from typing import (
@@ -7,19 +8,26 @@ from typing import (
     Generic,
     List,
     Optional,
+    Sequence,
     Set,
     Tuple,
     TypeVar,
     Union,
+    TYPE_CHECKING,
 )
 from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
 
-from synth.syntax.program import Program, Function, Variable
+from synth.syntax.program import Program, Function, ProgramFactory, Variable
+from synth.syntax.grammars.cfg import CFG
+from synth.syntax.grammars.det_grammar import DerivableProgram
 from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
 from synth.syntax.type_system import Type
 from synth.utils.ordered import Ordered
 
+if TYPE_CHECKING:
+    from synth.pruning.pruner import Pruner
+
 U = TypeVar("U")
 V = TypeVar("V")
 W = TypeVar("W")
@@ -35,12 +43,28 @@ class HeapElement:
 
 
 class HSEnumerator(ABC, Generic[U, V, W]):
-    def __init__(self, G: ProbDetGrammar[U, V, W]) -> None:
+    def __init__(
+        self,
+        G: ProbDetGrammar[U, V, W],
+        pruner: "Optional[Pruner[Tuple[Tuple[Type, U], Program]]]" = None,
+        factory: Optional[ProgramFactory] = None,
+    ) -> None:
+        """
+        pruner: optional hook, a program rejected by the pruner is neither generated
+        from its non-terminal nor used to build larger programs
+
+        factory: if given, programs are built by the factory instead of being interned in this enumerator,
+        so that programs are shared with anything else using the same factory such as an evaluator
+        """
         self.current: Optional[Program] = None
+        self.pruner = pruner
+        self.factory = factory
 
         self.G = G
         self.start = G.start
         self.rules = G.rules
+        # None when the non-terminals of the arguments must be derived
+        self._arguments_table = G.arguments_table()
         symbols = [S for S in self.rules]
 
         # self.heaps[S] is a heap containing programs generated from the non-terminal S
@@ -76,11 +100,36 @@ class HSEnumerator(ABC, Generic[U, V, W]):
         """
         hash_P = hash(P)
         if hash_P in self.hash_table_global:
-            return self.hash_table_global[hash_P]
+            unique = self.hash_table_global[hash_P]
+            # the arguments are unique thus this comparison does not go down the tree
+            if unique == P:
+                return unique
+            return P
         else:
             self.hash_table_global[hash_P] = P
             return P
 
+    def __make_function__(self, function: Program, arguments: List[Program]) -> Program:
+        if self.factory is not None:
+            return self.factory.function(function, arguments)
+        return self.__return_unique__(Function(function, arguments))
+
+    def __arguments_non_terminals__(
+        self, S: Tuple[Type, U], F: DerivableProgram, arguments: List[Program]
+    ) -> Sequence[Tuple[Type, U]]:
+        """
+        The non-terminals from which the given arguments of the derivation S -> F are derived.
+        """
+        if self._arguments_table is not None:
+            return self._arguments_table[S][F]
+        information, current = self.G.derive(self.G.start_information(), S, F)
+        non_terminals = [current]
+        for arg in arguments[:-1]:
+            information, lst = self.G.derive_all(information, current, arg)
+            current = lst[-1]
+            non_terminals.append(current)
+        return non_terminals
+
     def generator(self) -> Generator[Program, None, None]:
         """
         A generator which outputs the next most probable program
@@ -102,36 +151,57 @@ class HSEnumerator(ABC, Generic[U, V, W]):
         # 1) Compute max probablities
         best_program = None
         best_priority: Optional[Ordered] = None
+        # derivations for which every argument has an accepted program
+        derivations = []
         for P in self.rules[S]:
             nargs = self.G.arguments_length_for(S, P)
-            P_unique: Program = P
+            P_unique: Program = P if self.factory is None else self.factory.intern(P)
             if nargs > 0:
                 arguments = []
-                information, current = self.G.derive(self.G.start_information(), S, P)
-                for _ in range(nargs):
+                if self._arguments_table is None:
+                    information, current = self.G.derive(
+                        self.G.start_information(), S, P
+                    )
+                for i in range(nargs):
+                    if self._arguments_table is not None:
+                        current = self._arguments_table[S][P][i]
                     self.__init_non_terminal__(current)
                     # Try to init sub Tuple[Type, U] in case they were not initialised
-                    arguments.append(self.max_priority[current])
-                    information, lst = self.G.derive_all(
-                        information, current, arguments[-1]
-                    )
-                    current = lst[-1]
-
-                new_program = Function(
-                    function=P_unique,
-                    arguments=arguments,
+                    if self.pruner is None:
+                        argument = self.max_priority.get(current)
+                    else:
+                        # the most probable program accepted by the pruner
+                        argument = self.query(current, None)
+                    if argument is None:
+                        break
+                    arguments.append(argument)
+                    if self._arguments_table is None:
+                        information, lst = self.G.derive_all(
+                            information, current, argument
+                        )
+                        current = lst[-1]
+                if len(arguments) < nargs:
+                    continue
+
+                P_unique = (
+                    Function(P_unique, arguments)
+                    if self.factory is None
+                    else self.factory.function(P_unique, arguments)
                 )
-                P_unique = new_program
             priority = self.compute_priority(S, P_unique)
             self.max_priority[(S, P)] = P_unique
+            derivations.append(P)
             if not best_priority or priority < best_priority:
                 best_program = P_unique
                 best_priority = priority
-        assert best_program
+        if best_program is None:
+            # every program from S is rejected by the pruner
+            assert self.pruner is not None
+            return
         self.max_priority[S] = best_program
 
         # 2) add P(max(S1),max(S2), ...) to self.heaps[S]
-        for P in self.rules[S]:
+        for P in derivations:
             program = self.max_priority[(S, P)]
             hash_program = hash(program)
             # Remark: the program cannot already be in self.heaps[S]
@@ -165,27 +235,38 @@ class HSEnumerator(ABC, Generic[U, V, W]):
             return self.succ[S][hash_program]
 
         # otherwise the successor is the next element in the heap
-        try:
-            element = heappop(self.heaps[S])
-            succ = element.program
-        except:
-            return None  # the heap is empty: there are no successors from S
+        while True:
+            try:
+                element = heappop(self.heaps[S])
+                succ = element.program
+            except:
+                return None  # the heap is empty: there are no successors from S
+
+            if self.pruner is None or self.pruner.accept((S, succ)):
+                break
+            # succ is skipped but its potential successors are not
+            self.__add_successors__(S, succ)
 
         self.succ[S][hash_program] = succ  # we store the successor
 
-        # now we need to add all potential successors of succ in heaps[S]
+        self.__add_successors__(S, succ)
+        return succ
+
+    def __add_successors__(self, S: Tuple[Type, U], succ: Program) -> None:
+        """
+        add all potential successors of succ in heaps[S]
+        """
         if isinstance(succ, Function):
-            F = succ.function
-            information, lst = self.G.derive_all(self.G.start_information(), S, F)
-            S2 = lst[-1]
-            for i in range(self.G.arguments_length_for(S, F)):  # type: ignore
+            F: DerivableProgram = succ.function  # type: ignore
+            non_terminals = self.__arguments_non_terminals__(S, F, succ.arguments)
+            for i, S2 in enumerate(non_terminals):
                 # S2 is non-terminal symbol used to derive the i-th argument
                 succ_sub_program = self.query(S2, succ.arguments[i])
                 if succ_sub_program:
                     new_arguments = succ.arguments[:]
                     new_arguments[i] = succ_sub_program
 
-                    new_program = self.__return_unique__(Function(F, new_arguments))
+                    new_program = self.__make_function__(F, new_arguments)
                     hash_new_program = hash(new_program)
 
                     if hash_new_program not in self.hash_table_program[S]:
@@ -193,13 +274,6 @@ class HSEnumerator(ABC, Generic[U, V, W]):
 
                         priority: Ordered = self.compute_priority(S, new_program)
                         heappush(self.heaps[S], HeapElement(priority, new_program))
-                information, lst = self.G.derive_all(information, S2, succ.arguments[i])
-                S2 = lst[-1]
-
-        if isinstance(succ, Variable):
-            return succ  # if succ is a variable, there is no successor so we stop here
-
-        return succ
 
     @abstractmethod
     def compute_priority(self, S: Tuple[Type, U], new_program: Program) -> Ordered:
@@ -207,8 +281,13 @@ class HSEnumerator(ABC, Generic[U, V, W]):
 
 
 class HeapSearch(HSEnumerator[U, V, W]):
-    def __init__(self, G: ProbDetGrammar[U, V, W]) -> None:
-        super().__init__(G)
+    def __init__(
+        self,
+        G: ProbDetGrammar[U, V, W],
+        pruner: "Optional[Pruner[Tuple[Tuple[Type, U], Program]]]" = None,
+        factory: Optional[ProgramFactory] = None,
+    ) -> None:
+        super().__init__(G, pruner, factory)
         self.probabilities: Dict[Program, Dict[Tuple[Type, U], float]] = defaultdict(
             lambda: {}
         )
@@ -219,21 +298,315 @@ class HeapSearch(HSEnumerator[U, V, W]):
             # We guarantee that F is a Primitive
             new_arguments = new_program.arguments
             probability = self.G.probabilities[S][F]  # type: ignore
-            information, lst = self.G.derive_all(self.G.start_information(), S, F)
-            S2 = lst[-1]
-            for i in range(self.G.arguments_length_for(S, F)):  # type: ignore
-                arg = new_arguments[i]
+            for arg, S2 in zip(
+                new_arguments,
+                self.__arguments_non_terminals__(S, F, new_arguments),  # type: ignore
+            ):
                 probability *= self.probabilities[arg][S2]
-                information, lst = self.G.derive_all(information, S2, arg)
-                S2 = lst[-1]
         else:
             probability = self.G.probabilities[S][new_program]  # type: ignore
         self.probabilities[new_program][S] = probability
         return -probability
 
 
-def enumerate_prob_grammar(G: ProbDetGrammar[U, V, W]) -> HeapSearch[U, V, W]:
-    return HeapSearch(G)
+def enumerate_prob_grammar(
+    G: ProbDetGrammar[U, V, W], factory: Optional[ProgramFactory] = None
+) -> HeapSearch[U, V, W]:
+    return HeapSearch(G, factory=factory)
+
+
+class IntEncodedEnumerator(ABC, Generic[U, V, W]):
+    """
+    Base class of enumerators where non-terminals and derivations are interned to integer ids.
+    The underlying grammar must be a CFG.
+    """
+
+    def __init__(self, G: ProbDetGrammar[U, V, W]) -> None:
+        assert isinstance(G.grammar, CFG), "Only CFGs are supported!"
+        self.G = G
+        self.current: Optional[Program] = None
+        symbols = list(G.rules.keys())
+        self.ids: Dict[Tuple[Type, U], int] = {S: i for i, S in enumerate(symbols)}
+        self.start = self.ids[G.start]
+        # self.derivations[s][d] is the d-th derivation from s
+        self.derivations: List[List[DerivableProgram]] = []
+        # self.derivation_probabilities[s][d] is its probability
+        self.derivation_probabilities: List[List[float]] = []
+        # self.derivation_arguments[s][d] are the ids of the non-terminals of its arguments
+        self.derivation_arguments: List[List[Tuple[int, ...]]] = []
+        table = G.arguments_table()
+        assert table is not None
+        for S in symbols:
+            self.derivations.append(list(G.rules[S].keys()))
+            self.derivation_probabilities.append(
+                [G.probabilities[S][P] for P in self.derivations[-1]]
+            )
+            self.derivation_arguments.append(
+                [
+                    tuple(self.ids[S2] for S2 in table[S][P])
+                    for P in self.derivations[-1]
+                ]
+            )
+
+    @abstractmethod
+    def generator(self) -> Generator[Program, None, None]:
+        """
+        A generator which outputs the next most probable program
+        """
+        pass
+
+    def __iter__(self) -> Generator[Program, None, None]:
+        return self.generator()
+
+
+class ArrayHeapSearch(IntEncodedEnumerator[U, V, W]):
+    """
+    Heap search where non-terminals and derivations are interned to integer ids.
+
+    The k-th program generated from a non-terminal is represented by the tuple (d, r1, ..., rn)
+    meaning derivation d applied to the ri-th programs generated from the non-terminals of its arguments.
+    Probabilities are stored in flat arrays indexed by rank and Program objects are only built
+    for the programs that are yielded.
+    Programs are enumerated in the same order as HeapSearch, up to programs of equal probability.
+    The underlying grammar must be a CFG.
+    """
+
+    def __init__(self, G: ProbDetGrammar[U, V, W]) -> None:
+        super().__init__(G)
+        n = len(self.ids)
+        # self.heaps[s] is a heap of (-probability, program) of candidates from s
+        self.heaps: List[List[Tuple[float, Tuple[int, ...]]]] = [[] for _ in range(n)]
+        # self.seen[s] is the set of programs ever pushed in self.heaps[s]
+        self.seen: List[Set[Tuple[int, ...]]] = [set() for _ in range(n)]
+        # self.generated[s][k] is the k-th program generated from s
+        self.generated: List[List[Tuple[int, ...]]] = [[] for _ in range(n)]
+        # self.probabilities[s][k] is the probability of the k-th program generated from s
+        self.probabilities: List[array] = [array("d") for _ in range(n)]
+        self._init: List[bool] = [False for _ in range(n)]
+
+    def generator(self) -> Generator[Program, None, None]:
+        """
+        A generator which outputs the next most probable program
+        """
+        rank = 0
+        while self.__query__(self.start, rank):
+            self.current = self.__build__(self.start, rank)
+            yield self.current
+            rank += 1
+
+    def __init_non_terminal__(self, s: int) -> None:
+        self._init[s] = True
+        heap = self.heaps[s]
+        for d, (p, args) in enumerate(
+            zip(self.derivation_probabilities[s], self.derivation_arguments[s])
+        ):
+            for arg in args:
+                self.__query__(arg, 0)
+                p *= self.probabilities[arg][0]
+            program = (d,) + (0,) * len(args)
+            self.seen[s].add(program)
+            heappush(heap, (-p, program))
+
+    def __query__(self, s: int, rank: int) -> bool:
+        """
+        Generate programs from s until the one of the specified rank, return False if there are not enough programs.
+        """
+        if not self._init[s]:
+            self.__init_non_terminal__(s)
+        generated = self.generated[s]
+        while len(generated) <= rank:
+            heap = self.heaps[s]
+            if not heap:
+                return False
+            priority, program = heappop(heap)
+            generated.append(program)
+            self.probabilities[s].append(-priority)
+            # push the successors of program: one argument is replaced by its successor
+            d = program[0]
+            args = self.derivation_arguments[s][d]
+            for i, arg in enumerate(args):
+                if not self.__query__(arg, program[i + 1] + 1):
+                    continue
+                new_program = (
+                    program[: i + 1] + (program[i + 1] + 1,) + program[i + 2 :]
+                )
+                if new_program in self.seen[s]:
+                    continue
+                self.seen[s].add(new_program)
+                p = self.derivation_probabilities[s][d]
+                for arg_j, rank_j in zip(args, new_program[1:]):
+                    p *= self.probabilities[arg_j][rank_j]
+                heappush(heap, (-p, new_program))
+        return True
+
+    def __build__(self, s: int, rank: int) -> Program:
+        program = self.generated[s][rank]
+        P = self.derivations[s][program[0]]
+        args = self.derivation_arguments[s][program[0]]
+        if not args:
+            return P
+        return Function(
+            P, [self.__build__(arg, r) for arg, r in zip(args, program[1:])]
+        )
+
+
+def enumerate_prob_grammar_array(
+    G: ProbDetGrammar[U, V, W]
+) -> ArrayHeapSearch[U, V, W]:
+    return ArrayHeapSearch(G)
+
+
+class CostBandSearch(IntEncodedEnumerator[U, V, W]):
+    """
+    Memory-bounded enumeration by iterative deepening over bands of probability.
+
+    The programs with probability in (hi / band_ratio, hi] are found by a depth first search
+    pruned with the max probability of each non-terminal, sorted then yielded.
+    Whenever a band holds more than max_programs programs it is split in two bands,
+    therefore at most max_programs programs are stored at any time and nothing else grows with time.
+    The price is that each band enumerates again the more probable programs.
+
+    Programs are enumerated in the same order as HeapSearch, up to programs of equal probability,
+    except when a band too large cannot be split anymore: then its programs,
+    whose probabilities are within a factor 1 + 1e-9 of each other, are yielded unsorted.
+    Programs of probability 0 are yielded last, unsorted, by a final depth first search.
+
+    The max number of programs stored at once is kept in peak_stored
+    and the number of band splits in splits.
+    """
+
+    def __init__(
+        self,
+        G: ProbDetGrammar[U, V, W],
+        max_programs: int = 100000,
+        band_ratio: float = 4,
+    ) -> None:
+        super().__init__(G)
+        assert max_programs > 0, "max_programs must be > 0!"
+        assert band_ratio > 1, "band_ratio must be > 1!"
+        self.max_programs = max_programs
+        self.band_ratio = band_ratio
+        n = len(self.ids)
+        # probability of the most and least probable programs generated from each non-terminal
+        # the least probable program is the least probable one with a non zero probability, if any
+        self.max_probability: List[float] = [-1 for _ in range(n)]
+        self.min_probability: List[float] = [-1 for _ in range(n)]
+        for s in range(n):
+            self.__init_non_terminal__(s)
+        # Statistics
+        self.peak_stored = 0
+        self.splits = 0
+
+    def __init_non_terminal__(self, s: int) -> None:
+        if self.max_probability[s] >= 0:
+            return
+        best, worst = 0.0, 1.0
+        for p, args in zip(
+            self.derivation_probabilities[s], self.derivation_arguments[s]
+        ):
+            low = p
+            for arg in args:
+                self.__init_non_terminal__(arg)
+                p *= self.max_probability[arg]
+                low *= self.min_probability[arg]
+            best = max(best, p)
+            if low > 0:
+                worst = min(worst, low)
+        self.max_probability[s] = best
+        self.min_probability[s] = worst if best > 0 else 0
+
+    def generator(self) -> Generator[Program, None, None]:
+        hi = self.max_probability[self.start]
+        while hi > 0 and hi >= self.min_probability[self.start] * (1 - 1e-9):
+            lo = hi / self.band_ratio
+            for program in self.__band__(lo, hi):
+                self.current = self.__build__(program)
+                yield self.current
+            hi = lo
+        for _, program in self.__search__(-1, 0):
+            self.current = self.__build__(program)
+            yield self.current
+
+    def __band__(self, lo: float, hi: float) -> Generator[Tuple[int, ...], None, None]:
+        """
+        Yield the programs with probability in (lo, hi] by non-increasing probability.
+        """
+        band: List[Tuple[float, Tuple[int, ...]]] = []
+        for p, program in self.__search__(lo, hi):
+            band.append((-p, program))
+            if len(band) > self.max_programs:
+                if hi <= lo * (1 + 1e-9):
+                    break
+                self.splits += 1
+                del band
+                mid = (lo * hi) ** 0.5
+                yield from self.__band__(mid, hi)
+                yield from self.__band__(lo, mid)
+                return
+        else:
+            self.peak_stored = max(self.peak_stored, len(band))
+            band.sort()
+            for _, program in band:
+                yield program
+            return
+        # the band cannot be split: stream its programs
+        del band
+        self.peak_stored = max(self.peak_stored, self.max_programs + 1)
+        for _, program in self.__search__(lo, hi):
+            yield program
+
+    def __search__(
+        self, lo: float, hi: float
+    ) -> Generator[Tuple[float, Tuple[int, ...]], None, None]:
+        """
+        Depth first search of the programs with probability in (lo, hi].
+        A program is the tuple of its derivations in pre-order.
+        """
+        max_probability = self.max_probability
+        threshold = lo * (1 - 1e-9)
+        # (probability, holes left, derivations)
+        stack: List[Tuple[float, Tuple[int, ...], Tuple[int, ...]]] = [
+            (1.0, (self.start,), ())
+        ]
+        while stack:
+            p, holes, derivations = stack.pop()
+            if not holes:
+                if lo < p <= hi:
+                    yield p, derivations
+                continue
+            s = holes[0]
+            rest = 1.0
+            for hole in holes[1:]:
+                rest *= max_probability[hole]
+            for d in range(len(self.derivations[s]) - 1, -1, -1):
+                args = self.derivation_arguments[s][d]
+                new_p = p * self.derivation_probabilities[s][d]
+                bound = new_p * rest
+                for arg in args:
+                    bound *= max_probability[arg]
+                if bound > threshold:
+                    stack.append((new_p, args + holes[1:], derivations + (d,)))
+
+    def __build__(self, program: Tuple[int, ...]) -> Program:
+        index = 0
+
+        def build(s: int) -> Program:
+            nonlocal index
+            d = program[index]
+            index += 1
+            P = self.derivations[s][d]
+            args = self.derivation_arguments[s][d]
+            if not args:
+                return P
+            return Function(P, [build(arg) for arg in args])
+
+        return build(self.start)
+
+
+def enumerate_prob_grammar_bounded(
+    G: ProbDetGrammar[U, V, W], max_programs: int = 100000
+) -> CostBandSearch[U, V, W]:
+    return CostBandSearch(G, max_programs)
 
 
 class Bucket(Ordered):
@@ -297,8 +670,14 @@ class Bucket(Ordered):
 
 
 class BucketSearch(HSEnumerator[U, V, W]):
-    def __init__(self, G: ProbDetGrammar[U, V, W], bucket_size: int) -> None:
-        super().__init__(G)
+    def __init__(
+        self,
+        G: ProbDetGrammar[U, V, W],
+        bucket_size: int,
+        pruner: "Optional[Pruner[Tuple[Tuple[Type, U], Program]]]" = None,
+        factory: Optional[ProgramFactory] = None,
+    ) -> None:
+        super().__init__(G, pruner, factory)
         self.bucket_tuples: Dict[Program, Dict[Tuple[Type, U], Bucket]] = defaultdict(
             lambda: {}
         )
@@ -311,13 +690,11 @@ class BucketSearch(HSEnumerator[U, V, W]):
             new_arguments = new_program.arguments
             new_bucket.add_prob_uniform(self.G.probabilities[S][F])  # type: ignore
 
-            information, lst = self.G.derive_all(self.G.start_information(), S, F)
-            S2 = lst[-1]
-            for i in range(self.G.arguments_length_for(S, F)):  # type: ignore
-                arg = new_arguments[i]
+            for arg, S2 in zip(
+                new_arguments,
+                self.__arguments_non_terminals__(S, F, new_arguments),  # type: ignore
+            ):
                 new_bucket += self.bucket_tuples[arg][S2]
-                information, lst = self.G.derive_all(information, S2, arg)
-                S2 = lst[-1]
         else:
             probability = self.G.probabilities[S][new_program]  # type: ignore
             new_bucket.add_prob_uniform(probability)
@@ -326,6 +703,8 @@ class BucketSearch(HSEnumerator[U, V, W]):
 
 
 def enumerate_bucket_prob_grammar(
-    G: ProbDetGrammar[U, V, W], bucket_size: int
+    G: ProbDetGrammar[U, V, W],
+    bucket_size: int,
+    factory: Optional[ProgramFactory] = None,
 ) -> BucketSearch[U, V, W]:
-    return BucketSearch(G, bucket_size)
+    return BucketSearch(G, bucket_size, factory=factory)
@@ -1,464 +1,325 @@
-# from typing import Dict, List, Optional, Tuple
-# import bisect
-# from dataclasses import dataclass, field
-# import copy
-
-# import numpy as np
-
-# from synth.syntax.grammars.concrete_pcfg import ConcretePCFG, NonTerminal, PRules
-# from synth.syntax.program import Program
-
-
-# @dataclass(order=True, frozen=True)
-# class Node:
-#     probability: float
-#     next_contexts: List[NonTerminal] = field(compare=False)
-#     program: List[Program] = field(compare=False)
-#     derivation_history: List[NonTerminal] = field(compare=False)
-
-
-# def __common_prefix__(a: List[NonTerminal], b: List[NonTerminal]) -> List[NonTerminal]:
-#     if a == b:
-#         return a
-#     candidates = []
-#     if len(a) > 1:
-#         candidates.append(__common_prefix__(a[1:], b))
-#         if len(b) >= 1 and a[0] == b[0]:
-#             candidates.append([a[0]] + __common_prefix__(a[1:], b[1:]))
-#     if len(b) > 1:
-#         candidates.append(__common_prefix__(a, b[1:]))
-#     # Take longest common prefix
-#     lentghs = [len(x) for x in candidates]
-#     if len(lentghs) == 0:
-#         return []
-#     if max(lentghs) == lentghs[0]:
-#         return candidates[0]
-#     return candidates[1]
-
-
-# def __adapt_ctx__(S: NonTerminal, i: int) -> NonTerminal:
-#     pred = S.predecessors[0]
-#     return NonTerminal(S.type, [(pred[0], i)] + S.predecessors[1:], S.depth)
-
-
-# def __create_path__(
-#     rules: PRules,
-#     original_pcfg: ConcretePCFG,
-#     rule_no: int,
-#     Slist: List[NonTerminal],
-#     Plist: List[Program],
-#     mapping: Dict[NonTerminal, NonTerminal],
-#     original_start: NonTerminal,
-# ) -> int:
-#     for i, (S, P) in enumerate(zip(Slist, Plist)):
-#         if i == 0:
-#             S = original_start
-#         derivations = original_pcfg.rules[S][P][0]
-#         # Update derivations
-#         new_derivations = []
-#         for nS in derivations:
-#             if nS not in Slist:
-#                 new_derivations.append(nS)
-#             else:
-#                 if nS in mapping:
-#                     new_derivations.append(mapping[nS])
-#                 else:
-#                     mS = __adapt_ctx__(nS, rule_no)
-#                     mapping[nS] = mS
-#                     new_derivations.append(mS)
-#                     rule_no += 1
-#         derivations = new_derivations
-#         # Update current S
-#         if i > 0:
-#             S = mapping[S]
-#         else:
-#             S = Slist[0]
-#         # Add rule
-#         rules[S] = {}
-#         rules[S][P] = derivations, 1
-#     return rule_no
-
-
-# def __pcfg_from__(original_pcfg: ConcretePCFG, group: List[Node]) -> ConcretePCFG:
-#     # Find the common prefix to all
-#     min_prefix = copy.deepcopy(group[0].derivation_history)
-#     for node in group[1:]:
-#         min_prefix = __common_prefix__(min_prefix, node.derivation_history)
-
-#     # Extract the start symbol
-#     start = min_prefix.pop()
-
-#     rules: Dict[NonTerminal, Dict[Program, Tuple[List[NonTerminal], float]]] = {}
-#     rule_no: int = (
-#         max(
-#             max(x[1] for x in key.predecessors) if key.predecessors else 0
-#             for key in original_pcfg.rules
-#         )
-#         + 1
-#     )
-#     mapping: Dict[NonTerminal, NonTerminal] = {}
-#     # Our min_prefix may be something like (int, 1, (+, 1))
-#     # which means we already chose +
-#     # But it is not in the PCFG
-#     # Thus we need to add it
-#     # In the general case we may as well have + -> + -> + as prefix this whole prefix needs to be added
-#     original_start = start
-#     if len(min_prefix) > 0:
-#         Slist = group[0].derivation_history[: len(min_prefix) + 1]
-#         Plist = group[0].program[: len(min_prefix) + 1]
-#         rule_no = __create_path__(
-#             rules, original_pcfg, rule_no, Slist, Plist, mapping, Slist[0]
-#         )
-#         original_start = Slist[-1]
-#         start = mapping[original_start]
-
-#     # Now we need to make a path from the common prefix to each node's prefix
-#     # We also need to mark all contexts that should be filled
-#     to_fill: List[NonTerminal] = []
-#     for node in group:
-#         args, program, prefix = (
-#             node.next_contexts,
-#             node.program,
-#             node.derivation_history,
-#         )
-#         # Create rules to follow the path
-#         i = prefix.index(original_start)
-#         ctx_path = prefix[i:]
-#         program_path = program[i:]
-#         if len(ctx_path) > 0:
-#             ctx_path[0] = start
-#             rule_no = __create_path__(
-#                 rules,
-#                 original_pcfg,
-#                 rule_no,
-#                 ctx_path,
-#                 program_path,
-#                 mapping,
-#                 original_start,
-#             )
-#         # If there is no further derivation
-#         if not args:
-#             continue
-#         # Next derivation should be filled
-#         for arg in args:
-#             to_fill.append(arg)
-
-#     # At this point rules can generate all partial programs
-#     # Get the S to normalize by descending depth order
-#     to_normalise = sorted(list(rules.keys()), key=lambda x: -x.depth)
-
-#     # Build rules from to_fill
-#     while to_fill:
-#         S = to_fill.pop()
-#         rules[S] = {}
-#         for P in original_pcfg.rules[S]:
-#             args, w = original_pcfg.rules[S][P]
-#             rules[S][P] = (args[:], w)  # copy list
-#             for arg in args:
-#                 if arg not in rules:
-#                     to_fill.append(arg)
-#     # At this point we have all the needed rules
-#     # However, the probabilites are incorrect
-#     while to_normalise:
-#         S = to_normalise.pop()
-#         if S not in original_pcfg.rules:
-#             continue
-#         # Compute the updated probabilities
-#         for P in list(rules[S]):
-#             args, _ = rules[S][P]
-#             # We have the following equation:
-#             # (1) w = old_w * remaining_fraction
-#             old_w = original_pcfg.rules[S][P][1]
-#             remaining_fraction: float = 1
-#             # If there is a next derivation use it to compute the remaining_fraction
-#             if args:
-#                 N = args[-1]
-#                 remaining_fraction = sum(rules[N][K][1] for K in rules[N])
-#             # Update according to Equation (1)
-#             rules[S][P] = args, old_w * remaining_fraction
-
-#         # The updated probabilities may not sum to 1 so we need to normalise them
-#         # But let ConcretePCFG do it with clean=True
-
-#     start = original_pcfg.start
-
-#     # Ensure rules are depth ordered
-#     rules = {
-#         key: rules[key] for key in sorted(list(rules.keys()), key=lambda x: x.depth)
-#     }
-
-#     return ConcretePCFG(start, rules, original_pcfg.max_program_depth, clean=True)
-
-
-# def __node_split__(pcfg: ConcretePCFG, node: Node) -> Tuple[bool, List[Node]]:
-#     """
-#     Split the specified node accordingly.
-
-#     Return: success, nodes:
-#     - True, list of children nodes
-#     - False, [node]
-#     """
-#     output: List[Node] = []
-#     next_contexts = node.next_contexts
-#     # If there is no next then it means this node can't be split
-#     if len(next_contexts) == 0:
-#         return False, [node]
-#     new_context: NonTerminal = next_contexts.pop()
-#     for P in pcfg.rules[new_context]:
-#         args, p_prob = pcfg.rules[new_context][P]
-#         new_root = Node(
-#             node.probability * p_prob,
-#             next_contexts + args,
-#             node.program + [P],
-#             node.derivation_history + [new_context],
-#         )
-#         output.append(new_root)
-#     return True, output
-
-
-# def __split_nodes_until_quantity_reached__(
-#     pcfg: ConcretePCFG, quantity: int
-# ) -> List[Node]:
-#     """
-#     Start from the root node and split most probable node until the threshold number of nodes is reached.
-#     """
-#     nodes: List[Node] = [Node(1.0, [pcfg.start], [], [])]
-#     while len(nodes) < quantity:
-#         i = 1
-#         success, new_nodes = __node_split__(pcfg, nodes.pop())
-#         while not success:
-#             i += 1
-#             nodes.append(new_nodes[0])
-#             success, new_nodes = __node_split__(pcfg, nodes.pop(-i))
-#         for new_node in new_nodes:
-#             insertion_index: int = bisect.bisect(nodes, new_node)
-#             nodes.insert(insertion_index, new_node)
-
-#     return nodes
-
-
-# def __holes_of__(pcfg: ConcretePCFG, node: Node) -> List[NonTerminal]:
-#     stack = [pcfg.start]
-#     current = node.program[:]
-#     while current:
-#         S = stack.pop()
-#         P = current.pop(0)
-#         args = pcfg.rules[S][P][0]
-#         for arg in args:
-#             stack.append(arg)
-#     return stack
-
-
-# def __is_fixing_any_hole__(
-#     pcfg: ConcretePCFG, node: Node, holes: List[NonTerminal]
-# ) -> bool:
-#     current = node.program[:]
-#     stack = [pcfg.start]
-#     while current:
-#         S = stack.pop()
-#         if S in holes:
-#             return True
-#         P = current.pop(0)
-#         args = pcfg.rules[S][P][0]
-#         for arg in args:
-#             stack.append(arg)
-#     return False
-
-
-# def __are_compatible__(pcfg: ConcretePCFG, node1: Node, node2: Node) -> bool:
-#     """
-#     Two nodes prefix are compatible if one does not fix a context for the other.
-#     e.g. a -> b -> map -> *  and c -> b -> map -> +1 -> * are incompatible.
-
-#     In both cases map have the same context (bigram context) which is ((predecessor=b, argument=0), depth=2) thus are indistinguishables.
-#     However in the former all derivations are allowed in this context whereas in the latter +1 must be derived.
-#     Thus we cannot create a CFG that enables both.
-#     """
-#     holes1 = __holes_of__(pcfg, node1)
-#     if __is_fixing_any_hole__(pcfg, node2, holes1):
-#         return False
-#     holes2 = __holes_of__(pcfg, node2)
-#     return not __is_fixing_any_hole__(pcfg, node1, holes2)
-
-
-# def __all_compatible__(pcfg: ConcretePCFG, node: Node, group: List[Node]) -> bool:
-#     return all(__are_compatible__(pcfg, node, node2) for node2 in group)
-
-
-# def __try_split_node_in_group__(
-#     pcfg: ConcretePCFG, prob_groups: List[List], group_index: int
-# ) -> bool:
-#     group_a: List[Node] = prob_groups[group_index][1]
-#     # Sort group by ascending probability
-#     group_a_bis = sorted(group_a, key=lambda x: x.probability)
-#     # Try splitting a node until success
-#     i = 1
-#     success, new_nodes = __node_split__(pcfg, group_a_bis[-i])
-#     while not success and i < len(group_a):
-#         i += 1
-#         success, new_nodes = __node_split__(pcfg, group_a_bis[-i])
-#     if i >= len(group_a):
-#         return False
-#     # Success, remove old node
-#     group_a.pop(-i)
-#     # Add new nodes
-#     for new_node in new_nodes:
-#         group_a.append(new_node)
-#     return True
-
-
-# def __find_swap_for_group__(
-#     pcfg: ConcretePCFG, prob_groups: List[List], group_index: int
-# ) -> Optional[Tuple[int, Optional[int], int]]:
-#     max_prob: float = prob_groups[-1][1]
-#     min_prob: float = prob_groups[0][1]
-#     group_a, prob = prob_groups[group_index]
-#     best_swap: Optional[Tuple[int, Optional[int], int]] = None
-#     current_score: float = max_prob / prob
-
-#     candidates = (
-#         list(range(len(prob_groups) - 1, group_index, -1))
-#         if group_index == 0
-#         else [len(prob_groups) - 1]
-#     )
-
-#     for i in candidates:
-#         group_b, prob_b = prob_groups[i]
-#         for j, node_a in enumerate(group_a):
-#             pa: float = node_a.probability
-#             reduced_prob: float = prob - pa
-#             # Try all swaps
-#             for k, node_b in enumerate(group_b):
-#                 pb: float = node_b.probability
-#                 if (
-#                     pb < pa
-#                     or not __all_compatible__(pcfg, node_a, group_b)
-#                     or not __all_compatible__(pcfg, node_b, group_a)
-#                 ):
-#                     continue
-#                 new_mass_b: float = prob_b - pb + pa
-#                 mini = min_prob if group_index > 0 else reduced_prob + pb
-#                 maxi = (
-#                     max(new_mass_b, prob_groups[-2][1])
-#                     if j == len(prob_groups) - 1
-#                     else max_prob
-#                 )
-#                 new_score = maxi / mini
-#                 if new_score < current_score:
-#                     best_swap = (i, j, k)
-#                     current_score = new_score
-#         # Consider taking something from b
-#         for k, node_b in enumerate(group_b):
-#             if not __all_compatible__(pcfg, node_b, group_a):
-#                 continue
-#             pb = node_b.probability
-#             if prob + pb > max_prob:
-#                 new_score = (prob + pb) / min_prob
-#             else:
-#                 new_score = max_prob / (prob + pb)
-#             if new_score < current_score:
-#                 best_swap = (i, None, k)
-#                 current_score = new_score
-#     return best_swap
-
-
-# def __percolate_down__(prob_groups: List[List], group_index: int) -> None:
-#     index = group_index
-#     p = prob_groups[group_index][1]
-#     while index > 0 and prob_groups[index - 1][1] > p:
-#         prob_groups[index - 1], prob_groups[index] = (
-#             prob_groups[index],
-#             prob_groups[index - 1],
-#         )
-#         index -= 1
-
-
-# def __percolate_up__(prob_groups: List[List], group_index: int) -> None:
-#     index = group_index
-#     p = prob_groups[group_index][1]
-#     while index < len(prob_groups) - 2 and prob_groups[index + 1][1] < p:
-#         prob_groups[index + 1], prob_groups[index] = (
-#             prob_groups[index],
-#             prob_groups[index + 1],
-#         )
-#         index += 1
-
-
-# def __apply_swap__(
-#     prob_groups: List[List], group_index: int, swap: Tuple[int, Optional[int], int]
-# ) -> None:
-#     j, k, l = swap
-#     # App
-#     if k:
-#         node_a = prob_groups[group_index][0].pop(k)
-#         prob_groups[group_index][1] -= node_a.probability
-#         prob_groups[j][0].append(node_a)
-#         prob_groups[j][1] += node_a.probability
-
-#     node_b = prob_groups[j][0].pop(l)
-#     prob_groups[j][1] -= node_b.probability
-#     prob_groups[group_index][0].append(node_b)
-#     prob_groups[group_index][1] += node_b.probability
-
-#     __percolate_down__(prob_groups, -1)
-#     __percolate_up__(prob_groups, group_index)
-
-
-# def __split_into_nodes__(
-#     pcfg: ConcretePCFG, splits: int, desired_ratio: float = 2
-# ) -> Tuple[List[List[Node]], float]:
-#     nodes = __split_nodes_until_quantity_reached__(pcfg, splits)
-
-#     # Create groups
-#     groups: List[List[Node]] = []
-#     for node in nodes[:splits]:
-#         groups.append([node])
-#     for node in nodes[splits:]:
-#         # Add to first compatible group
-#         added = False
-#         for group in groups:
-#             if __all_compatible__(pcfg, node, group):
-#                 group.append(node)
-#                 added = True
-#                 break
-#         assert added
-
-#     # Improve
-#     improved = True
-#     masses: List[float] = [np.sum([x.probability for x in group]) for group in groups]
-#     prob_groups = sorted([[g, p] for g, p in zip(groups, masses)], key=lambda x: x[1])  # type: ignore
-#     ratio: float = prob_groups[-1][1] / prob_groups[0][1]  # type: ignore
-#     while improved and ratio > desired_ratio:
-#         improved = False
-#         for i in range(splits - 1):
-#             swap = __find_swap_for_group__(pcfg, prob_groups, i)
-#             if swap:
-#                 improved = True
-#                 __apply_swap__(prob_groups, i, swap)
-#                 break
-#         if not improved:
-#             for i in range(splits - 1, 0, -1):
-#                 improved = __try_split_node_in_group__(pcfg, prob_groups, i)
-#                 if improved:
-#                     break
-#         ratio = prob_groups[-1][1] / prob_groups[0][1]  # type: ignore
-#     return [g for g, _ in prob_groups], ratio  # type: ignore
-
-
-# def split(
-#     pcfg: ConcretePCFG, splits: int, desired_ratio: float = 1.1
-# ) -> Tuple[List[ConcretePCFG], float]:
-#     """
-#     Currently use exchange split.
-#     Parameters:
-#     desired_ratio: the max ratio authorized between the most probable group and the least probable pcfg
-
-#     Return:
-#     a list of ConcretePCFG
-#     the reached threshold
-#     """
-#     if splits == 1:
-#         return [pcfg], 1
-#     assert desired_ratio > 1, "The desired ratio must be > 1!"
-#     groups, ratio = __split_into_nodes__(pcfg, splits, desired_ratio)
-#     return [__pcfg_from__(pcfg, group) for group in groups if len(group) > 0], ratio
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from typing import Any, Dict, List, Optional, Set, Tuple, TypeVar
+
+from synth.syntax.grammars.cfg import CFG, CFGNonTerminal
+from synth.syntax.grammars.det_grammar import DerivableProgram
+from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
+from synth.syntax.grammars.ttcfg import TTCFG
+from synth.syntax.type_system import Type
+
+U = TypeVar("U")
+V = TypeVar("V")
+W = TypeVar("W")
+
+# A partial program: (derivation, arguments) where None is a hole
+PartialProgram = Optional[Tuple[DerivableProgram, List[Any]]]
+
+
+@dataclass(frozen=True)
+class SplitTag:
+    """
+    Marks the non-terminals of a split grammar that are restricted to some derivations.
+    """
+
+    node: int
+
+
+@dataclass(order=True)
+class Node:
+    """
+    A partial program: the derivations made in pre-order and the non-terminals of its holes.
+    Once split, children contains one node per derivation of its first hole.
+    """
+
+    # negative probability so that the most probable node is at the top of a heap
+    priority: float
+    derivations: List[Tuple[DerivableProgram, int]] = field(compare=False)
+    holes: List[CFGNonTerminal] = field(compare=False)
+    children: List["Node"] = field(compare=False, default_factory=lambda: [])
+
+    @property
+    def probability(self) -> float:
+        return -self.priority
+
+    def can_split(self) -> bool:
+        return len(self.holes) > 0 and len(self.children) == 0
+
+    def partial_program(self) -> PartialProgram:
+        index = [0]
+
+        def build() -> PartialProgram:
+            if index[0] >= len(self.derivations):
+                return None
+            P, nargs = self.derivations[index[0]]
+            index[0] += 1
+            return (P, [build() for _ in range(nargs)])
+
+        return build()
+
+
+def __node_split__(pgrammar: ProbDetGrammar, node: Node) -> List[Node]:
+    """
+    Split the specified node into one node per derivation of its first hole.
+    """
+    S = node.holes[0]
+    for P, p in pgrammar.probabilities[S].items():
+        args = pgrammar.grammar.rules[S][P][0]
+        node.children.append(
+            Node(
+                node.priority * p,
+                node.derivations + [(P, len(args))],
+                [(arg[0], (arg[1], None)) for arg in args] + node.holes[1:],
+            )
+        )
+    return node.children
+
+
+def __pack__(nodes: List[Node], k: int) -> List[List[Node]]:
+    """
+    Greedily assign nodes, most probable first, to the group with the least mass.
+    """
+    groups: List[Tuple[float, int, List[Node]]] = [(0, i, []) for i in range(k)]
+    for node in sorted(nodes):
+        mass, i, group = heappop(groups)
+        group.append(node)
+        heappush(groups, (mass + node.probability, i, group))
+    return [group for _, _, group in groups]
+
+
+def __pack_components__(
+    components: List[Tuple[int, List[Node]]], k: int
+) -> List[List[Node]]:
+    """
+    Greedily merge components, most probable first, into the group with the least mass
+    that does not already contain a component of the same child.
+    """
+    groups: List[List[Node]] = [[] for _ in range(k)]
+    masses: List[float] = [0 for _ in range(k)]
+    owners: List[Set[int]] = [set() for _ in range(k)]
+    for i, component in sorted(
+        components, key=lambda x: -sum(node.probability for node in x[1])
+    ):
+        if not component:
+            continue
+        j = min((j for j in range(k) if i not in owners[j]), key=lambda j: masses[j])
+        groups[j] += component
+        masses[j] += sum(node.probability for node in component)
+        owners[j].add(i)
+    return groups
+
+
+def __partition__(node: Node, k: int, granularity: int = 1) -> List[List[Node]]:
+    """
+    Partition the programs of the specified node into k groups of partial programs.
+
+    The heavy children of the node are partitioned recursively.
+    If the node has only one hole, the groups of different children can be merged freely,
+    the higher the granularity the finer the pieces to merge.
+    Otherwise each heavy child gets groups of its own and the other children are put whole into the remaining groups.
+    Thus two partial programs of a group either are in the same group of a child
+    or only differ by the derivation of the first hole of the node and in its subtree,
+    which means that a CFG can generate exactly their completions.
+    """
+    if k == 1 or not node.children:
+        return [[node]] + [[] for _ in range(k - 1)]
+    target = node.probability / k
+    if len(node.holes) == 1:
+        shares = [
+            max(1, min(k, int(granularity * child.probability / target + 0.5)))
+            if child.children
+            else 1
+            for child in node.children
+        ]
+        # Do not leave groups empty
+        while sum(shares) < k:
+            candidates = [
+                i
+                for i, child in enumerate(node.children)
+                if child.children and shares[i] < k
+            ]
+            if not candidates:
+                break
+            i = max(candidates, key=lambda i: node.children[i].probability / shares[i])
+            shares[i] += 1
+        components: List[Tuple[int, List[Node]]] = []
+        for i, (child, share) in enumerate(zip(node.children, shares)):
+            components += [
+                (i, group) for group in __partition__(child, share, granularity)
+            ]
+        return __pack_components__(components, k)
+    # dedicated[i] = [child, number of groups]
+    dedicated: List[List[Any]] = []
+    remaining: List[Node] = []
+    for child in node.children:
+        share = int(child.probability / target + 0.5)
+        if share >= 2 and child.children:
+            dedicated.append([child, share])
+        else:
+            remaining.append(child)
+    left = k - sum(share for _, share in dedicated)
+    # Make room for the children without groups
+    while dedicated and (left < min(1, len(remaining)) or left < 0):
+        i = min(
+            range(len(dedicated)),
+            key=lambda i: dedicated[i][0].probability / dedicated[i][1],
+        )
+        dedicated[i][1] -= 1
+        left += 1
+        if dedicated[i][1] == 1:
+            remaining.append(dedicated.pop(i)[0])
+            left += 1
+    # Do not leave groups empty
+    while left > len(remaining):
+        candidates = [i for i in range(len(dedicated))] + [
+            -1 - i for i, child in enumerate(remaining) if child.children
+        ]
+        if not candidates:
+            break
+
+        def mass_per_group(i: int) -> float:
+            if i >= 0:
+                return float(dedicated[i][0].probability / dedicated[i][1])
+            return float(remaining[-1 - i].probability)
+
+        i = max(candidates, key=mass_per_group)
+        if i >= 0:
+            dedicated[i][1] += 1
+        else:
+            dedicated.append([remaining.pop(-1 - i), 2])
+            left -= 1
+        left -= 1
+    groups = __pack__(remaining, left) if left > 0 else []
+    for child, share in dedicated:
+        groups += __partition__(child, share, granularity)
+    return groups
+
+
+def __ratio__(groups: List[List[Node]]) -> float:
+    masses = [sum(node.probability for node in group) for group in groups]
+    return max(masses) / min(masses) if min(masses) > 0 else float("inf")
+
+
+def __split_into_nodes__(
+    pgrammar: ProbDetGrammar, splits: int, desired_ratio: float, max_nodes: int
+) -> Tuple[List[List[Node]], float]:
+    """
+    Split the most probable partial program until there are enough of them to form groups
+    whose masses are within the desired ratio.
+    """
+    root = Node(-1.0, [], [pgrammar.start])
+    leaves: List[Node] = [root]
+    best: Tuple[List[List[Node]], float] = ([[root]], float("inf"))
+    nodes = 1
+    next_partition = splits
+    while leaves:
+        for new_node in __node_split__(pgrammar, heappop(leaves)):
+            nodes += 1
+            if new_node.can_split():
+                heappush(leaves, new_node)
+        if nodes < next_partition and leaves:
+            continue
+        next_partition = max(splits, int(nodes * 1.2))
+        for granularity in range(1, 4):
+            groups = __partition__(root, splits, granularity)
+            ratio = __ratio__(groups)
+            if ratio < best[1]:
+                best = (groups, ratio)
+        if best[1] <= desired_ratio or nodes >= max_nodes:
+            break
+    return best
+
+
+def __pgrammar_from__(pgrammar: ProbDetGrammar, group: List[Node]) -> ProbDetGrammar:
+    """
+    Build the grammar generating exactly the programs that complete one of the partial programs of the group.
+
+    Each derived position of the partial programs is mapped to a copy of the non-terminal of
+    the original grammar restricted to the derivations used at this position.
+    Holes are mapped to the original non-terminals.
+    The original probabilities are kept thus a program has the same probability in the original grammar
+    and in the split grammar.
+    """
+    grammar: CFG = pgrammar.grammar  # type: ignore
+    rules: Dict[Tuple[Type, Any], Dict[DerivableProgram, Any]] = dict(grammar.rules)
+    probabilities: Dict[Tuple[Type, Any], Dict[DerivableProgram, float]] = dict(
+        pgrammar.probabilities
+    )
+    # restricted[i] is the non-terminal of position i and its derivations
+    # with for each argument the restricted position if any
+    restricted: List[
+        Tuple[Tuple[Type, Any], Dict[DerivableProgram, List[Optional[int]]]]
+    ] = [(grammar.start, {})]
+
+    def add(position: int, program: PartialProgram) -> None:
+        assert program is not None
+        S, derivations = restricted[position]
+        P, args = program
+        if P not in derivations:
+            derivations[P] = []
+            for arg, subprogram in zip(grammar.rules[S][P][0], args):
+                if subprogram is None:
+                    derivations[P].append(None)
+                else:
+                    derivations[P].append(len(restricted))
+                    restricted.append(((arg[0], (arg[1], None)), {}))
+        for child, subprogram in zip(derivations[P], args):
+            assert (child is None) == (
+                subprogram is None
+            ), "Incompatible partial programs in the same group!"
+            if child is not None:
+                add(child, subprogram)
+
+    for node in group:
+        program = node.partial_program()
+        if program is None:
+            return pgrammar
+        add(0, program)
+
+    def tag(position: int) -> Tuple[Type, Any]:
+        S = restricted[position][0]
+        return (S[0], ((S[1][0], SplitTag(position)), S[1][1]))
+
+    for position, (S, derivations) in enumerate(restricted):
+        tagged_S = tag(position)
+        rules[tagged_S] = {}
+        probabilities[tagged_S] = {}
+        for P, children in derivations.items():
+            args, state = grammar.rules[S][P]
+            new_args = [
+                arg if child is None else (tag(child)[0], tag(child)[1][0])
+                for arg, child in zip(args, children)
+            ]
+            rules[tagged_S][P] = (new_args, state)
+            probabilities[tagged_S][P] = pgrammar.probabilities[S][P]
+
+    split_grammar: TTCFG = TTCFG(tag(0), rules, clean=False)
+    return ProbDetGrammar(split_grammar, probabilities)
+
+
+def split(
+    pgrammar: ProbDetGrammar,
+    splits: int,
+    desired_ratio: float = 1.1,
+    max_nodes: int = 500,
+) -> Tuple[List[ProbDetGrammar], float]:
+    """
+    Split the given probabilistic grammar into disjoint grammars whose union generates the same programs.
+    Each program keeps its probability so each grammar can be enumerated independently, in parallel for example.
+    The underlying grammar must be a CFG.
+
+    Parameters:
+    splits: the number of grammars to produce
+    desired_ratio: the max ratio authorized between the most probable and the least probable grammar
+    max_nodes: the max number of partial programs considered before giving up on reaching the desired ratio
+
+    Return:
+    a list of at most splits ProbDetGrammar
+    the reached ratio
+    """
+    if splits == 1:
+        return [pgrammar], 1
+    assert isinstance(pgrammar.grammar, CFG), "Only CFGs can be split!"
+    assert desired_ratio > 1, "The desired ratio must be > 1!"
+    groups, ratio = __split_into_nodes__(pgrammar, splits, desired_ratio, max_nodes)
+    return [__pgrammar_from__(pgrammar, group) for group in groups if group], ratio
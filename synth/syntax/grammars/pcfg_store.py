@@ -0,0 +1,165 @@
+import os
+import pickle
+from typing import Dict, Generator, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from synth.syntax.grammars.det_grammar import DerivableProgram, DetGrammar
+from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
+from synth.syntax.type_system import Type
+
+U = TypeVar("U")
+V = TypeVar("V")
+W = TypeVar("W")
+
+# The derivations in the order of the probability vectors of a structure, grouped by non-terminal
+Layout = List[Tuple[Tuple[Type, U], List[DerivableProgram]]]
+
+__INDEX__ = "index.bin"
+__PROBABILITIES__ = "probabilities.bin"
+__STRUCTURE__ = "structure_{}.pickle"
+
+
+class PCFGStore(Generic[U, V, W]):
+    """
+    Append-only on-disk list of ProbDetGrammar stored in a folder.
+
+    The underlying grammar of the stored ProbDetGrammar, its structure, is pickled once in its own file
+    along with the order of its derivations.
+    The probabilities of each ProbDetGrammar are stored as a dense float32 vector aligned on its structure
+    in a single raw file, and the index file gives for each ProbDetGrammar its structure and the offset of its vector.
+    Both files are memory-mapped: opening a store reads nothing,
+    a ProbDetGrammar is rebuilt on access and a structure is unpickled the first time it is needed.
+    Appending writes the new vector and its index entry at the end of the files and flushes them,
+    so that the store is up to date even if the process is interrupted.
+
+    Probabilities are stored as float32 so they are read back with about 7 significant digits,
+    a derivation missing from the probabilities of a ProbDetGrammar is also missing when it is read back.
+    """
+
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self._structures: Dict[int, Tuple[DetGrammar[U, V, W], Layout]] = {}
+        self._structure_ids: Optional[Dict[DetGrammar[U, V, W], int]] = None
+        # Hashing a grammar is costly, the grammar objects already seen are kept by id
+        self._known: Dict[int, Tuple[DetGrammar[U, V, W], int]] = {}
+        # self._index[i] = (structure id, offset) of the i-th ProbDetGrammar
+        self._index: np.ndarray = np.zeros((0, 2), dtype=np.int64)
+        self._probabilities: np.ndarray = np.zeros(0, dtype=np.float32)
+        self.__map__()
+
+    def __path__(self, name: str) -> str:
+        return os.path.join(self.folder, name)
+
+    def __map__(self) -> None:
+        index = self.__path__(__INDEX__)
+        if os.path.exists(index) and os.path.getsize(index) > 0:
+            # Ignore a partially written entry
+            entries = os.path.getsize(index) // 16
+            self._index = np.memmap(index, dtype=np.int64, mode="r", shape=(entries, 2))
+        probabilities = self.__path__(__PROBABILITIES__)
+        if os.path.exists(probabilities) and os.path.getsize(probabilities) >= 4:
+            self._probabilities = np.memmap(
+                probabilities,
+                dtype=np.float32,
+                mode="r",
+                shape=(os.path.getsize(probabilities) // 4,),
+            )
+
+    def __len__(self) -> int:
+        return int(self._index.shape[0])
+
+    def __structure__(self, structure_id: int) -> Tuple[DetGrammar[U, V, W], Layout]:
+        if structure_id not in self._structures:
+            with open(self.__path__(__STRUCTURE__.format(structure_id)), "rb") as fd:
+                self._structures[structure_id] = pickle.load(fd)
+        return self._structures[structure_id]
+
+    def __getitem__(self, i: int) -> ProbDetGrammar[U, V, W]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"PCFGStore index out of range: {i}")
+        structure_id, offset = self._index[i]
+        grammar, layout = self.__structure__(int(structure_id))
+        probabilities: Dict[Tuple[Type, U], Dict[DerivableProgram, float]] = {}
+        for S, derivations in layout:
+            end = offset + len(derivations)
+            vector = self._probabilities[offset:end].tolist()
+            probabilities[S] = dict(zip(derivations, vector))
+            # NaN marks a missing derivation
+            if any(p != p for p in vector):
+                probabilities[S] = {P: p for P, p in probabilities[S].items() if p == p}
+            offset = end
+        return ProbDetGrammar(grammar, probabilities)
+
+    def __iter__(self) -> Generator[ProbDetGrammar[U, V, W], None, None]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def iterate(self, start: int = 0) -> Generator[ProbDetGrammar[U, V, W], None, None]:
+        """
+        Lazily iterate over the stored ProbDetGrammar from the start-th one.
+        """
+        for i in range(start, len(self)):
+            yield self[i]
+
+    def __structure_id__(self, grammar: DetGrammar[U, V, W]) -> int:
+        if id(grammar) in self._known:
+            return self._known[id(grammar)][1]
+        if self._structure_ids is None:
+            self._structure_ids = {}
+            structure_id = 0
+            while os.path.exists(self.__path__(__STRUCTURE__.format(structure_id))):
+                self._structure_ids[self.__structure__(structure_id)[0]] = structure_id
+                structure_id += 1
+        if grammar not in self._structure_ids:
+            structure_id = len(self._structure_ids)
+            layout = [(S, list(grammar.rules[S])) for S in grammar.rules]
+            with open(self.__path__(__STRUCTURE__.format(structure_id)), "wb") as fd:
+                pickle.dump((grammar, layout), fd)
+            self._structures[structure_id] = (grammar, layout)
+            self._structure_ids[grammar] = structure_id
+        self._known[id(grammar)] = (grammar, self._structure_ids[grammar])
+        return self._known[id(grammar)][1]
+
+    def extend(self, pgrammars: Iterable[ProbDetGrammar[U, V, W]]) -> None:
+        """
+        Append the given ProbDetGrammar at the end of the store.
+        """
+        probabilities = self.__path__(__PROBABILITIES__)
+        offset = (
+            os.path.getsize(probabilities) // 4 if os.path.exists(probabilities) else 0
+        )
+        vectors = []
+        entries = []
+        for pgrammar in pgrammars:
+            structure_id = self.__structure_id__(pgrammar.grammar)
+            layout = self.__structure__(structure_id)[1]
+            vector = np.array(
+                [
+                    pgrammar.probabilities.get(S, {}).get(P, np.nan)
+                    for S, derivations in layout
+                    for P in derivations
+                ],
+                dtype=np.float32,
+            )
+            vectors.append(vector)
+            entries.append((structure_id, offset))
+            offset += vector.shape[0]
+        if not entries:
+            return
+        # Write the vectors before their index entries so that an interrupted append leaves a consistent store
+        with open(probabilities, "ab") as fd:
+            fd.truncate(entries[0][1] * 4)
+            for vector in vectors:
+                fd.write(vector.tobytes())
+        with open(self.__path__(__INDEX__), "ab") as fd:
+            # Drop a partially written entry
+            fd.truncate(len(self) * 16)
+            fd.write(np.array(entries, dtype=np.int64).tobytes())
+        self.__map__()
+
+    def append(self, pgrammar: ProbDetGrammar[U, V, W]) -> None:
+        self.extend([pgrammar])
@@ -14,7 +14,7 @@ import vose
 from synth.syntax.grammars.cfg import CFG, CFGNonTerminal, CFGState, NoneType
 
 from synth.syntax.grammars.det_grammar import DerivableProgram, DetGrammar
-from synth.syntax.program import Function, Program
+from synth.syntax.program import Function, Program, ProgramFactory
 from synth.syntax.type_system import Type
 
 T = TypeVar("T")
@@ -22,6 +22,36 @@ U = TypeVar("U")
 V = TypeVar("V")
 W = TypeVar("W")
 
+# Bounds of the number of derivations drawn at once from a non-terminal by sample_programs
+__MIN_BATCH__ = 64
+__MAX_BATCH__ = 65536
+
+
+def __alias_table__(weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vose's alias table of the given weights: an outcome is drawn by picking j uniformly,
+    then keeping j with probability threshold[j] or taking alias[j] otherwise.
+    """
+    n = weights.shape[0]
+    total = weights.sum()
+    if total == 0:
+        # the non-terminal is never reached, any table will do
+        return np.ones(n), np.arange(n)
+    threshold = weights * n / total
+    alias = np.arange(n)
+    small = [j for j in range(n) if threshold[j] < 1]
+    large = [j for j in range(n) if threshold[j] >= 1]
+    while small and large:
+        j = small.pop()
+        k = large.pop()
+        alias[j] = k
+        threshold[k] -= 1 - threshold[j]
+        (small if threshold[k] < 1 else large).append(k)
+    # Only rounding errors remain
+    for j in small + large:
+        threshold[j] = 1
+    return threshold, alias
+
 
 class TaggedDetGrammar(DetGrammar[U, V, W], Generic[T, U, V, W]):
     def __init__(
@@ -29,7 +59,9 @@ class TaggedDetGrammar(DetGrammar[U, V, W], Generic[T, U, V, W]):
         grammar: DetGrammar[U, V, W],
         tags: Dict[Tuple[Type, U], Dict[DerivableProgram, T]],
     ):
-        super().__init__(grammar.start, grammar.rules, clean=False)
+        super().__init__(
+            grammar.start, grammar.rules, clean=False, type_request=grammar.type_request
+        )
         self.grammar = grammar
         self.tags = tags
 
@@ -61,6 +93,13 @@ class TaggedDetGrammar(DetGrammar[U, V, W], Generic[T, U, V, W]):
     def arguments_length_for(self, S: Tuple[Type, U], P: DerivableProgram) -> int:
         return self.grammar.arguments_length_for(S, P)
 
+    def arguments_table(
+        self,
+    ) -> Optional[
+        Dict[Tuple[Type, U], Dict[DerivableProgram, Tuple[Tuple[Type, U], ...]]]
+    ]:
+        return self.grammar.arguments_table()
+
     def derive(
         self, information: W, S: Tuple[Type, U], P: DerivableProgram
     ) -> Tuple[W, Tuple[Type, U]]:
@@ -142,6 +181,11 @@ class ProbDetGrammar(TaggedDetGrammar[float, U, V, W]):
                 seed=seed + i if seed else None,
             )
             self.sampling_map[S] = P_list
+        self._rng = np.random.default_rng(seed if seed else None)
+        # built on the first call to sample_programs
+        self._batch_tables: Optional[
+            List[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+        ] = None
 
     def normalise(self) -> None:
         for S in self.tags:
@@ -159,25 +203,131 @@ class ProbDetGrammar(TaggedDetGrammar[float, U, V, W]):
             yield self.sample_program(self.start)
 
     def sample_program(
-        self, S: Optional[Tuple[Type, U]] = None, information: Optional[W] = None
+        self,
+        S: Optional[Tuple[Type, U]] = None,
+        information: Optional[W] = None,
+        factory: Optional[ProgramFactory] = None,
     ) -> Program:
+        """
+        factory: if given, the program is built by the factory
+        """
         assert self.ready_for_sampling
         S = S or self.start
         i: int = self.vose_samplers[S].sample()
         P = self.sampling_map[S][i]
         nargs = self.arguments_length_for(S, P)
         if nargs == 0:
-            return P
-        arguments = []
-        information = information or self.grammar.start_information()
-        information, current = self.grammar.derive(information, S, P)
-        for _ in range(nargs):
-            arg = self.sample_program(current, information)
-            arguments.append(arg)
-            information, lst = self.grammar.derive_all(information, current, arg)
-            current = lst[-1]
+            return P if factory is None else factory.intern(P)
+        table = self.grammar.arguments_table()
+        if table is not None:
+            arguments = [
+                self.sample_program(current, information, factory)
+                for current in table[S][P]
+            ]
+        else:
+            arguments = []
+            information = information or self.grammar.start_information()
+            information, current = self.grammar.derive(information, S, P)
+            for _ in range(nargs):
+                arg = self.sample_program(current, information, factory)
+                arguments.append(arg)
+                information, lst = self.grammar.derive_all(information, current, arg)
+                current = lst[-1]
+        if factory is not None:
+            return factory.function(P, arguments)
         return Function(P, arguments)
 
+    def sample_programs(
+        self, n: int, factory: Optional[ProgramFactory] = None
+    ) -> List[Program]:
+        """
+        Sample n programs from the start non-terminal.
+
+        The derivations are drawn in bulk from an alias table per non-terminal
+        and each program is assembled without recursion, which is much faster than n calls to sample_program.
+        The random stream is seeded by init_sampling but is not the one of sample_program.
+        The grammar must have an arguments_table, otherwise this falls back to sample_program.
+
+        factory: if given, the programs are built by the factory
+
+        Programs are acyclic, so a caller that samples large batches can disable the garbage collector meanwhile:
+        the collections triggered by their allocations only slow down the sampling.
+        """
+        assert self.ready_for_sampling
+        if self._batch_tables is None:
+            if self.grammar.arguments_table() is None:
+                return [self.sample_program(factory=factory) for _ in range(n)]
+            self.__init_batch_sampling__()
+        buffers = self._batch_buffers
+        start = self._batch_start
+        programs: List[Program] = []
+        for _ in range(n):
+            # The derivations of the program in pre-order
+            derivations: List[Tuple[DerivableProgram, Tuple[int, ...]]] = []
+            todo = [start]
+            while todo:
+                s = todo.pop()
+                buffer = buffers[s]
+                if not buffer:
+                    self.__draw_derivations__(s)
+                derivation = buffer.pop()
+                derivations.append(derivation)
+                todo += derivation[1]
+            # Build the program bottom-up, the first argument is on top of the stack
+            stack: List[Program] = []
+            for P, children in reversed(derivations):
+                k = len(children)
+                if k == 0:
+                    stack.append(P if factory is None else factory.intern(P))
+                    continue
+                arguments = stack[: -k - 1 : -1]
+                del stack[-k:]
+                stack.append(
+                    Function(P, arguments)
+                    if factory is None
+                    else factory.function(P, arguments)
+                )
+            programs.append(stack[0])
+        return programs
+
+    def __init_batch_sampling__(self) -> None:
+        table = self.grammar.arguments_table()
+        assert table is not None
+        ids = {S: s for s, S in enumerate(self.sampling_map)}
+        self._batch_start = ids[self.start]
+        self._batch_tables = []
+        for S, P_list in self.sampling_map.items():
+            # The ids of the non-terminals of the arguments are reversed to be pushed on a stack
+            derivations = np.empty(len(P_list), dtype=object)
+            for d, P in enumerate(P_list):
+                # Non-terminals without probabilities are only reached by derivations of probability 0,
+                # which are never drawn and are left to None
+                if all(S2 in ids for S2 in table[S][P]):
+                    derivations[d] = (
+                        P,
+                        tuple(ids[S2] for S2 in reversed(table[S][P])),
+                    )
+            threshold, alias = __alias_table__(
+                np.array([self.tags[S][P] for P in P_list], dtype=float)
+            )
+            self._batch_tables.append((threshold, alias, derivations))
+        self._batch_buffers: List[List[Tuple[DerivableProgram, Tuple[int, ...]]]] = [
+            [] for _ in self._batch_tables
+        ]
+        self._batch_sizes = [__MIN_BATCH__ for _ in self._batch_tables]
+
+    def __draw_derivations__(self, s: int) -> None:
+        """
+        Refill the buffer of the s-th non-terminal, drawing twice as many derivations as the last time.
+        """
+        assert self._batch_tables is not None
+        threshold, alias, derivations = self._batch_tables[s]
+        k = self._batch_sizes[s]
+        self._batch_sizes[s] = min(2 * k, __MAX_BATCH__)
+        j = self._rng.integers(threshold.shape[0], size=k)
+        drawn = np.where(self._rng.random(k) < threshold[j], j, alias[j])
+        self._batch_buffers[s].extend(derivations[drawn].tolist())
+
     @classmethod
     def uniform(cls, grammar: DetGrammar[U, V, W]) -> "ProbDetGrammar[U, V, W]":
         return ProbDetGrammar(
@@ -1,5 +1,6 @@
 from abc import ABC, abstractstaticmethod
-from typing import Generator, List as TList, Any, Optional, Set, Tuple
+from typing import Dict, Iterable, Iterator, List as TList, Any, Optional, Set, Tuple
+import weakref
 
 from synth.syntax.type_system import (
     Arrow,
@@ -10,14 +11,53 @@ from synth.syntax.type_system import (
 )
 
 
+# Bit of each non-arrow type of a primitive in Program._dependencies, bit 0 stands for the variables
+__TYPE_BITS__: Dict[Type, int] = {}
+
+
+def __type_bit__(type: Type) -> int:
+    if type not in __TYPE_BITS__:
+        __TYPE_BITS__[type] = 1 << (len(__TYPE_BITS__) + 1)
+    return __TYPE_BITS__[type]
+
+
+def __types_mask__(types: Iterable[Type]) -> int:
+    mask = 1
+    for t in types:
+        mask |= __TYPE_BITS__.get(t, 0)
+    return mask
+
+
 class Program(ABC):
     """
     Object that represents a program: a lambda term with basic primitives.
+
+    Programs are immutable trees, their depth, length and used variables are computed once at construction,
+    the tuple of their sub-programs in post-order is computed the first time it is needed.
     """
 
+    __slots__ = (
+        "type",
+        "hash",
+        "_depth",
+        "_length",
+        # bit i is set if vari is used
+        "_variables",
+        # bits of the variables and of the types of the primitives that are not invariant for some constant types
+        "_dependencies",
+        # the sub-programs in post-order, None if not computed yet
+        "_post_order",
+        "__weakref__",
+    )
+
     def __init__(self, type: Type) -> None:
         self.type = type
         self.hash: int = 0
+        self._depth = 1
+        self._length = 1
+        self._variables = 0
+        self._dependencies = 0
+        self._post_order: Optional[Tuple["Program", ...]] = None
 
     def __hash__(self) -> int:
         return self.hash
@@ -26,30 +66,56 @@ class Program(ABC):
         return self.__str__()
 
     def used_variables(self) -> Set[int]:
-        s: Set[int] = set()
-        self.__add_used_variables__(s)
-        return s
-
-    def __add_used_variables__(self, vars: Set[int]) -> None:
-        pass
+        variables = self._variables
+        return {i for i in range(variables.bit_length()) if variables >> i & 1}
 
     def is_constant(self) -> bool:
         return False
 
     def is_invariant(self, constant_types: Set[PrimitiveType]) -> bool:
-        return True
+        return not self._dependencies & __types_mask__(constant_types)
 
     def count_constants(self) -> int:
         return int(self.is_constant())
 
     def length(self) -> int:
-        return 1
+        return self._length
 
     def depth(self) -> int:
-        return 1
+        return self._depth
 
-    def depth_first_iter(self) -> Generator["Program", None, None]:
-        yield self
+    def post_order(self) -> Tuple["Program", ...]:
+        """
+        The sub-programs of this program in post-order:
+        for a Function the sub-programs of its function, then of each of its arguments, then the Function itself.
+
+        The tuple is computed iteratively once then cached, the tuples already cached by sub-programs are reused.
+        """
+        if self._post_order is None:
+            # Build the reversed post-order from the reversed pre-order: a node, then its children from last to first
+            reversed_order: TList[Program] = []
+            stack: TList[Program] = [self]
+            while stack:
+                node = stack.pop()
+                cached = node._post_order
+                if cached is not None:
+                    reversed_order.extend(reversed(cached))
+                    continue
+                reversed_order.append(node)
+                if isinstance(node, Function):
+                    stack.append(node.function)
+                    stack.extend(node.arguments)
+                elif isinstance(node, Lambda):
+                    stack.append(node.body)
+            reversed_order.reverse()
+            self._post_order = tuple(reversed_order)
+        return self._post_order
+
+    def depth_first_iter(self) -> Iterator["Program"]:
+        """
+        Iterate over the sub-programs of this program in post-order, see post_order.
+        """
+        return iter(self.post_order())
 
     @abstractstaticmethod
     def __pickle__(o: "Program") -> Tuple:
@@ -57,18 +123,15 @@ class Program(ABC):
 
 
 class Variable(Program):
+    __slots__ = ("variable",)
     __hash__ = Program.__hash__
 
-    def is_invariant(self, constant_types: Set[PrimitiveType]) -> bool:
-        return False
-
     def __init__(self, variable: int, type: Type = UnknownType()):
         super().__init__(type)
         self.variable: int = variable
         self.hash = hash((self.variable, self.type))
-
-    def __add_used_variables__(self, vars: Set[int]) -> None:
-        vars.add(self.variable)
+        self._variables = 1 << variable
+        self._dependencies = 1
 
     def __str__(self) -> str:
         return "var" + format(self.variable)
@@ -81,6 +144,7 @@ class Variable(Program):
 
 
 class Constant(Program):
+    __slots__ = ("value", "_has_value")
     __hash__ = Program.__hash__
 
     def __init__(self, type: Type, value: Any = None, has_value: Optional[bool] = None):
@@ -120,19 +184,34 @@ class Constant(Program):
 
 
 class Function(Program):
+    __slots__ = ("function", "arguments")
     __hash__ = Program.__hash__
 
     def __init__(self, function: Program, arguments: TList[Program]):
         # Build automatically the type of the function
         type = function.type
         assert isinstance(type, Arrow)
-        args = type.arguments()[len(arguments) :]
-        my_type = FunctionType(*args, type.returns())
-
-        super().__init__(my_type)
+        args = type._arguments[len(arguments) :]
+        # Attributes are set here rather than in Program.__init__ since most programs are functions
+        self.type = FunctionType(*args, type._returns) if args else type._returns
         self.function = function
         self.arguments = arguments
-        self.hash = hash(tuple([arg for arg in self.arguments] + [self.function]))
+        self.hash = hash((*arguments, function))
+        depth = function._depth
+        length = function._length
+        variables = function._variables
+        dependencies = function._dependencies
+        for arg in arguments:
+            if arg._depth > depth:
+                depth = arg._depth
+            length += arg._length
+            variables |= arg._variables
+            dependencies |= arg._dependencies
+        self._depth = depth + 1
+        self._length = length
+        self._variables = variables
+        self._dependencies = dependencies
+        self._post_order = None
 
     def __pickle__(o: Program) -> Tuple:  # type: ignore[override]
         return Function, (o.function, o.arguments)  # type: ignore
@@ -147,6 +226,8 @@ class Function(Program):
             return s + ")"
 
     def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
         return (
             isinstance(other, Function)
             and self.function == other.function
@@ -159,44 +240,22 @@ class Function(Program):
             arg.is_constant() for arg in self.arguments
         )
 
-    def is_invariant(self, constant_types: Set[PrimitiveType]) -> bool:
-        return self.function.is_invariant(constant_types) and all(
-            arg.is_invariant(constant_types) for arg in self.arguments
-        )
-
     def count_constants(self) -> int:
         return self.function.count_constants() + sum(
             [arg.count_constants() for arg in self.arguments]
         )
 
-    def length(self) -> int:
-        return self.function.length() + sum([arg.length() for arg in self.arguments])
-
-    def depth(self) -> int:
-        return 1 + max(
-            self.function.depth(), max(arg.depth() for arg in self.arguments)
-        )
-
-    def __add_used_variables__(self, vars: Set[int]) -> None:
-        for el in [self.function] + self.arguments:
-            el.__add_used_variables__(vars)
-
-    def depth_first_iter(self) -> Generator["Program", None, None]:
-        for sub in self.function.depth_first_iter():
-            yield sub
-        for arg in self.arguments:
-            for sub in arg.depth_first_iter():
-                yield sub
-        yield self
-
 
 class Lambda(Program):
+    __slots__ = ("body",)
     __hash__ = Program.__hash__
 
     def __init__(self, body: Program, type: Type = UnknownType()):
         super().__init__(type)
         self.body = body
         self.hash = hash(94135 + hash(self.body))
+        self._depth = 1 + body._depth
+        self._variables = body._variables
 
     def __pickle__(o: Program) -> Tuple:  # type: ignore[override]
         return Lambda, (o.body, o.type)  # type: ignore
@@ -205,27 +264,19 @@ class Lambda(Program):
         return "(lambda " + format(self.body) + ")"
 
     def __eq__(self, other: Any) -> bool:
-        return isinstance(other, Lambda) and self.body == other.body
-
-    def __add_used_variables__(self, vars: Set[int]) -> None:
-        return self.body.__add_used_variables__(vars)
-
-    def depth(self) -> int:
-        return 1 + self.body.depth()
-
-    def depth_first_iter(self) -> Generator["Program", None, None]:
-        for sub in self.body.depth_first_iter():
-            yield sub
-        yield self
+        return self is other or (isinstance(other, Lambda) and self.body == other.body)
 
 
 class Primitive(Program):
+    __slots__ = ("primitive",)
     __hash__ = Program.__hash__
 
     def __init__(self, primitive: str, type: Type = UnknownType()):
         super().__init__(type)
         self.primitive = primitive
         self.hash = hash((self.primitive, self.type))
+        if not isinstance(type, (Arrow, UnknownType)):
+            self._dependencies = __type_bit__(type)
 
     def __pickle__(o: Program) -> Tuple:  # type: ignore[override]
         return Primitive, (o.primitive, o.type)  # type: ignore
@@ -243,6 +294,92 @@ class Primitive(Program):
         return isinstance(other, Primitive) and self.primitive == other.primitive
 
 
+class ProgramFactory:
+    """
+    Builds programs such that structurally equal programs built by the same factory are the same object.
+
+    Then comparing two programs of the factory that are equal is an identity check,
+    and the hash of a program is computed once when it is first built.
+    A sub-program is identified by its kind, its type and the identities of its children,
+    so building a program only hashes its direct children.
+    The table of the factory is weak: a program is dropped from it once it is no longer used elsewhere.
+
+    Constants are not shared since they can be assigned a value later.
+    """
+
+    def __init__(self) -> None:
+        self._table: "weakref.WeakValueDictionary[Any, Program]" = (
+            weakref.WeakValueDictionary()
+        )
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __unique__(self, key: Any, program: Program) -> Program:
+        unique = self._table.get(key)
+        if unique is None:
+            self._table[key] = program
+            return program
+        return unique
+
+    def variable(self, variable: int, type: Type = UnknownType()) -> Program:
+        key = ("var", variable, type)
+        unique = self._table.get(key)
+        if unique is None:
+            unique = self.__unique__(key, Variable(variable, type))
+        return unique
+
+    def primitive(self, primitive: str, type: Type = UnknownType()) -> Program:
+        key = ("prim", primitive, type)
+        unique = self._table.get(key)
+        if unique is None:
+            unique = self.__unique__(key, Primitive(primitive, type))
+        return unique
+
+    def function(self, function: Program, arguments: TList[Program]) -> Program:
+        function = self.intern(function)
+        arguments = [self.intern(arg) for arg in arguments]
+        key = (id(function), tuple(id(arg) for arg in arguments))
+        unique = self._table.get(key)
+        if unique is None:
+            unique = self.__unique__(key, Function(function, arguments))
+        return unique
+
+    def lambda_(self, body: Program, type: Type = UnknownType()) -> Program:
+        body = self.intern(body)
+        key = ("lambda", id(body), type)
+        unique = self._table.get(key)
+        if unique is None:
+            unique = self.__unique__(key, Lambda(body, type))
+        return unique
+
+    def intern(self, program: Program) -> Program:
+        """
+        Return the program of this factory equal to the given program.
+        Costs one lookup if the given program was built by this factory.
+        """
+        if isinstance(program, Function):
+            key: Any = (
+                id(program.function),
+                tuple(id(arg) for arg in program.arguments),
+            )
+            if self._table.get(key) is program:
+                return program
+            return self.function(program.function, program.arguments)
+        elif isinstance(program, Primitive):
+            key = ("prim", program.primitive, program.type)
+            return self.__unique__(key, program)
+        elif isinstance(program, Variable):
+            key = ("var", program.variable, program.type)
+            return self.__unique__(key, program)
+        elif isinstance(program, Lambda):
+            key = ("lambda", id(program.body), program.type)
+            if self._table.get(key) is program:
+                return program
+            return self.lambda_(program.body, program.type)
+        return program
+
+
 import copyreg
 
 for cls in [Primitive, Constant, Lambda, Function, Variable]:
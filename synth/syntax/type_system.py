@@ -4,14 +4,63 @@ A type can be either PolymorphicType, PrimitiveType, Arrow, or List
 """
 from typing import Any, Dict, List as TList, Optional, Set, Tuple
 
-from abc import ABC, abstractmethod, abstractstaticmethod
+from abc import ABC, ABCMeta, abstractmethod, abstractstaticmethod
+import inspect
 
 
-class Type(ABC):
+# The interned types: __TYPES__[(class, arguments)] = type
+# types containing an UnknownType are not interned, they would be kept forever
+__TYPES__: Dict[Tuple, "Type"] = {}
+# Memoised queries on interned types
+__UNIFICATIONS__: Dict[Tuple["Type", Tuple], "Type"] = {}
+__ENDS_WITH__: Dict[Tuple["Type", "Type"], Optional[Tuple["Type", ...]]] = {}
+
+
+def __memoisable__(key: Tuple["Type", Tuple]) -> bool:
+    """
+    Whether the unification of key can be memoised: all its types are interned.
+    """
+    t, unifier = key
+    return t._interned and all(
+        value._interned for _, value in unifier if isinstance(value, Type)
+    )
+
+
+class __TypeMeta__(ABCMeta):
+    """
+    Interns types: building a type equal to an existing one returns the existing object.
+    """
+
+    def __call__(cls, *args: Any, **kwargs: Any) -> Any:
+        if kwargs:
+            bound = inspect.signature(cls.__init__).bind(None, *args, **kwargs)
+            args = tuple(bound.arguments.values())[1:]
+        if not cls._internable or not all(  # type: ignore
+            arg._interned for arg in args if isinstance(arg, Type)
+        ):
+            t = super().__call__(*args)
+            t._interned = False
+            return t
+        key = (cls, args)
+        t = __TYPES__.get(key)
+        if t is None:
+            t = super().__call__(*args)
+            t._interned = True
+            __TYPES__[key] = t
+        return t
+
+
+class Type(ABC, metaclass=__TypeMeta__):
     """
     Object that represents a type.
+
+    Types are immutable and interned: two equal types are the same object,
+    thus comparing types is an identity check.
     """
 
+    __slots__ = ("hash", "_interned")
+    _internable = True
+
     def __init__(self) -> None:
         super().__init__()
         self.hash = 0
@@ -79,12 +128,19 @@ class Type(ABC):
         other = INT
         ends_with(self, other) = [Arrow(INT, INT), INT]
         """
-        return self.ends_with_rec(other, [])
+        if not self._interned or not other._interned:
+            return self.ends_with_rec(other, [])
+        key = (self, other)
+        if key not in __ENDS_WITH__:
+            arguments = self.ends_with_rec(other, [])
+            __ENDS_WITH__[key] = None if arguments is None else tuple(arguments)
+        out = __ENDS_WITH__[key]
+        return None if out is None else list(out)
 
     def ends_with_rec(
         self, other: "Type", arguments_list: TList["Type"]
     ) -> Optional[TList["Type"]]:
-        if self == other:
+        if self is other:
             return arguments_list
         if isinstance(self, Arrow):
             arguments_list.append(self.type_in)
@@ -97,6 +153,7 @@ class Type(ABC):
 
 
 class PolymorphicType(Type):
+    __slots__ = ("name",)
     __hash__ = Type.__hash__
 
     def __init__(self, name: str):
@@ -111,7 +168,7 @@ class PolymorphicType(Type):
         return format(self.name)
 
     def __eq__(self, o: object) -> bool:
-        return isinstance(o, PolymorphicType) and o.name == self.name
+        return self is o
 
     def is_polymorphic(self) -> bool:
         return True
@@ -128,6 +185,7 @@ class PolymorphicType(Type):
 
 
 class PrimitiveType(Type):
+    __slots__ = ("type_name",)
     __hash__ = Type.__hash__
 
     def __init__(self, type_name: str):
@@ -141,7 +199,7 @@ class PrimitiveType(Type):
         return format(self.type_name)
 
     def __eq__(self, o: object) -> bool:
-        return isinstance(o, PrimitiveType) and o.type_name == self.type_name
+        return self is o
 
     def __decompose_type_rec__(
         self,
@@ -156,12 +214,20 @@ class Arrow(Type):
     Represents a function.
     """
 
+    __slots__ = ("type_in", "type_out", "_arguments", "_returns", "_polymorphic")
     __hash__ = Type.__hash__
 
     def __init__(self, type_in: Type, type_out: Type):
         self.type_in = type_in
         self.type_out = type_out
         self.hash = hash((self.type_in, self.type_out))
+        self._polymorphic = type_in.is_polymorphic() or type_out.is_polymorphic()
+        if isinstance(type_out, Arrow):
+            self._arguments: Tuple[Type, ...] = (type_in,) + type_out._arguments
+            self._returns: Type = type_out._returns
+        else:
+            self._arguments = (type_in,)
+            self._returns = type_out
 
     def __pickle__(o: Type) -> Tuple:  # type: ignore[override]
         return Arrow, (o.type_in, o.type_out)  # type: ignore
@@ -175,11 +241,7 @@ class Arrow(Type):
         return super().__contains__(t) or t in self.type_in or t in self.type_out
 
     def __eq__(self, o: object) -> bool:
-        return (
-            isinstance(o, Arrow)
-            and o.type_in == self.type_in
-            and o.type_out == self.type_out
-        )
+        return self is o
 
     def __decompose_type_rec__(
         self,
@@ -193,22 +255,28 @@ class Arrow(Type):
         """
         Get the return type of this arrow.
         """
-        if isinstance(self.type_out, Arrow):
-            return self.type_out.returns()
-        return self.type_out
+        return self._returns
 
     def arguments(self) -> TList[Type]:
         """
         Get the list of arguments in the correct order of this arrow.
         """
-        if isinstance(self.type_out, Arrow):
-            return [self.type_in] + self.type_out.arguments()
-        return [self.type_in]
+        return list(self._arguments)
 
     def is_polymorphic(self) -> bool:
-        return self.type_in.is_polymorphic() or self.type_out.is_polymorphic()
+        return self._polymorphic
 
     def unify(self, unifier: Dict[str, "Type"]) -> "Type":
+        if not self._polymorphic:
+            return self
+        key = (self, tuple(unifier.items()))
+        if not __memoisable__(key):
+            return self.__unify__(unifier)
+        if key not in __UNIFICATIONS__:
+            __UNIFICATIONS__[key] = self.__unify__(unifier)
+        return __UNIFICATIONS__[key]
+
+    def __unify__(self, unifier: Dict[str, "Type"]) -> "Type":
         return Arrow(self.type_in.unify(unifier), self.type_out.unify(unifier))
 
     def depth(self) -> int:
@@ -219,11 +287,13 @@ class Arrow(Type):
 
 
 class List(Type):
+    __slots__ = ("element_type", "_polymorphic")
     __hash__ = Type.__hash__
 
     def __init__(self, element_type: Type):
         self.element_type = element_type
         self.hash = hash(18923 + hash(self.element_type))
+        self._polymorphic = element_type.is_polymorphic()
 
     def __pickle__(o: Type) -> Tuple:  # type: ignore[override]
         return List, (o.element_type,)  # type: ignore
@@ -235,7 +305,7 @@ class List(Type):
         return super().__contains__(t) or t in self.element_type
 
     def __eq__(self, o: object) -> bool:
-        return isinstance(o, List) and o.element_type == self.element_type
+        return self is o
 
     def __decompose_type_rec__(
         self,
@@ -245,9 +315,19 @@ class List(Type):
         self.element_type.__decompose_type_rec__(set_basic_types, set_polymorphic_types)
 
     def is_polymorphic(self) -> bool:
-        return self.element_type.is_polymorphic()
+        return self._polymorphic
 
     def unify(self, unifier: Dict[str, "Type"]) -> "Type":
+        if not self._polymorphic:
+            return self
+        key = (self, tuple(unifier.items()))
+        if not __memoisable__(key):
+            return self.__unify__(unifier)
+        if key not in __UNIFICATIONS__:
+            __UNIFICATIONS__[key] = self.__unify__(unifier)
+        return __UNIFICATIONS__[key]
+
+    def __unify__(self, unifier: Dict[str, "Type"]) -> "Type":
         return List(self.element_type.unify(unifier))
 
     def depth(self) -> int:
@@ -262,7 +342,10 @@ class UnknownType(Type):
     In case we need to define an unknown type
     """
 
+    __slots__ = ()
     __hash__ = Type.__hash__
+    # an unknown type is equal to no type, not even itself
+    _internable = False
 
     def __init__(self) -> None:
         super().__init__()
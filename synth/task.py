@@ -13,6 +13,8 @@ from typing import (
 )
 import _pickle as cPickle  # type: ignore
 import bz2
+import json
+import os
 
 from synth.specification import TaskSpecification
 from synth.syntax.program import Program
@@ -67,19 +69,57 @@ class Dataset(Generic[T]):
     def type_requests(self) -> Set[Type]:
         return set([task.type_request for task in self.tasks])
 
-    def save(self, path: str) -> None:
+    def save(self, path: str, chunk_size: int = 256) -> None:
         """
         Save this dataset in the specified file.
-        The dataset file is compressed.
+        The dataset file uses the chunked format of synth.chunked_dataset: tasks are stored
+        in compressed blocks of chunk_size tasks that can be read independently.
         """
-        with bz2.BZ2File(path, "w") as fd:
-            cPickle.dump(self, fd)
+        from synth.chunked_dataset import DatasetWriter
+
+        with DatasetWriter(path, self.metadata, chunk_size) as writer:
+            writer.extend(self)
 
     @classmethod
-    def load(cls, path: str) -> "Dataset[T]":
+    def load(cls, path: str, lazy: bool = False) -> "Dataset[T]":
         """
         Load the dataset object stored in this file.
+        If the file is a manifest written by save_manifest, the dataset joins its shards.
+        If lazy is True and the file is in the chunked format, return a ChunkedDataset view
+        that reads tasks on access instead of loading them all.
+        Datasets saved as a single bz2 pickle by previous versions are still loaded.
         """
+        from synth.chunked_dataset import ChunkedDataset, MAGIC
+
+        with open(path, "rb") as fd:
+            header = fd.read(len(MAGIC))
+        if header == MAGIC:
+            view: ChunkedDataset[T] = ChunkedDataset(path)
+            if lazy:
+                return view
+            with view:
+                return Dataset(view.tasks, view.metadata)
+        if header[:1] == b"{":
+            with open(path) as fd:
+                manifest = json.load(fd)
+            folder = os.path.dirname(path)
+            tasks: List[Task[T]] = []
+            for shard in manifest["shards"]:
+                tasks += cls.load(os.path.join(folder, shard["file"])).tasks
+            return Dataset(tasks, manifest["metadata"])
         with bz2.BZ2File(path, "rb") as fd:
             dataset: Dataset = cPickle.load(fd)
             return dataset
+
+    @classmethod
+    def save_manifest(
+        cls, path: str, shards: List[Dict[str, Any]], metadata: Dict[str, Any]
+    ) -> None:
+        """
+        Save in the specified file a JSON manifest of a dataset split in shards, which load reads as one dataset.
+        Each shard is a dictionary with the path of its dataset file relative to the manifest under "file",
+        and any other JSON information about the shard.
+        The metadata must be JSON serialisable.
+        """
+        with open(path, "w") as fd:
+            json.dump({"shards": shards, "metadata": metadata}, fd, indent=1)
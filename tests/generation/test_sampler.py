@@ -73,3 +73,35 @@ def test_seeding() -> None:
     b = ListSampler(bint, [0.2] * 5, max_depth=3, seed=10)
     for _ in range(1000):
         assert a.sample(type=List(INT)) == b.sample(type=List(INT))
+
+
+def test_batch_sampling() -> None:
+    lexicon = list(range(100))
+    sampler = UnionSampler(
+        {INT: LexiconSampler(lexicon, seed=10), BOOL: LexiconSampler([True, False])}
+    )
+    assert sampler.sample_batch(0, type=INT) == []
+    assert sampler.sample_batch(1, type=INT)[0] in lexicon
+    xs = sampler.sample_batch(1000, type=INT)
+    assert len(xs) == 1000 and all(isinstance(x, int) and x in lexicon for x in xs)
+    assert all(isinstance(x, bool) for x in sampler.sample_batch(10, type=BOOL))
+
+    a = ListSampler(sampler, [(2, 0.5), (4, 0.5)], max_depth=3, seed=10)
+    b = ListSampler(sampler, [(2, 0.5), (4, 0.5)], max_depth=3, seed=10)
+    batch = a.sample_batch(2000, type=List(INT))
+    sequential = [b.sample(type=List(INT)) for _ in range(2000)]
+    for lists in [batch, sequential]:
+        assert all(len(l) in [2, 4] for l in lists)
+        assert all(x in lexicon for l in lists for x in l)
+    # Same distribution of lengths and elements
+    mean = lambda l: sum(l) / len(l)
+    assert abs(mean([len(l) for l in batch]) - mean([len(l) for l in sequential])) < 0.2
+    assert (
+        abs(
+            mean([x for l in batch for x in l])
+            - mean([x for l in sequential for x in l])
+        )
+        < 2
+    )
+    nested = a.sample_batch(100, type=List(List(INT)))
+    assert all(len(l) in [2, 4] and all(len(x) in [2, 4] for x in l) for l in nested)
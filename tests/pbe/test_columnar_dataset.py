@@ -0,0 +1,124 @@
+import pathlib
+import pickle
+import random
+from typing import List as TList
+
+import pytest
+import torch
+
+from synth.pbe.columnar_dataset import ColumnarDataset, ColumnarPBE
+from synth.pbe.io_encoder import IOEncoder
+from synth.pbe.task_generator import reproduce_int_dataset
+from synth.semantic.evaluator import DSLEvaluator
+from synth.syntax.dsl import DSL
+from synth.syntax.program import Variable
+from synth.task import Task, Dataset
+from synth.specification import PBE, Example
+from synth.syntax.type_system import (
+    BOOL,
+    INT,
+    FunctionType,
+    List,
+    PolymorphicType,
+    Type,
+)
+
+
+syntax = {
+    "+": FunctionType(INT, INT, INT),
+    "head": FunctionType(List(PolymorphicType("a")), PolymorphicType("a")),
+    "1": INT,
+}
+semantics = {"+": lambda x: lambda y: x + y, "head": lambda l: l[0], "1": 1}
+dsl = DSL(syntax)
+type_requests = [
+    FunctionType(INT, List(INT), INT),
+    FunctionType(List(INT), List(INT), List(INT)),
+    FunctionType(INT, BOOL),
+]
+
+
+def random_dataset(size: int, type_requests: TList[Type]) -> Dataset[PBE]:
+    random.seed(0)
+
+    def value(t: Type) -> object:
+        if t == INT:
+            return random.randint(-10, 10)
+        elif t == BOOL:
+            return random.random() > 0.5
+        return [random.randint(-10, 10) for _ in range(random.randint(0, 5))]
+
+    tasks = []
+    for i in range(size):
+        t = random.choice(type_requests)
+        examples = [
+            Example([value(arg) for arg in t.arguments()], value(t.returns()))
+            for _ in range(random.randint(1, 6))
+        ]
+        tasks.append(
+            Task(t, PBE(examples), Variable(0, t.arguments()[0]), {"index": i})
+        )
+    return Dataset(tasks, {"seed": 0})
+
+
+def test_views(tmp_path: pathlib.Path) -> None:
+    dataset = random_dataset(100, type_requests)
+    columnar = ColumnarDataset.write(
+        tmp_path.as_posix(), dataset, dataset.metadata, batch_size=7
+    )
+    assert len(columnar) == len(dataset)
+    assert columnar.metadata == dataset.metadata
+    assert columnar.type_requests() == dataset.type_requests()
+    for task, original in zip(columnar, dataset):
+        assert isinstance(task.specification, ColumnarPBE)
+        assert task.type_request == original.type_request
+        assert task.solution == original.solution
+        assert task.metadata == original.metadata
+        examples = task.specification.examples
+        assert len(examples) == len(original.specification.examples)
+        for ex, original_ex in zip(examples, original.specification.examples):
+            assert ex.inputs == original_ex.inputs
+            assert ex.output == original_ex.output
+            assert type(ex.output) == type(original_ex.output)
+    assert columnar[-1].solution == dataset[-1].solution
+    with pytest.raises(IndexError):
+        columnar[len(dataset)]
+    # Pickled tasks hold their examples
+    task = pickle.loads(pickle.dumps(columnar[3]))
+    assert task == dataset[3]
+    assert len(pickle.loads(pickle.dumps(columnar))) == len(dataset)
+    # Reopening the folder
+    assert ColumnarDataset(tmp_path.as_posix())[5].specification.examples[0].inputs == (
+        dataset[5].specification.examples[0].inputs
+    )
+
+
+def test_only_int_lists(tmp_path: pathlib.Path) -> None:
+    dataset = Dataset([Task(FunctionType(INT, INT), PBE([Example([[[1]]], 1)]))])
+    with pytest.raises(ValueError):
+        ColumnarDataset.write(tmp_path.as_posix(), dataset)
+
+
+def test_encoding(tmp_path: pathlib.Path) -> None:
+    dataset = random_dataset(100, type_requests)
+    columnar = ColumnarDataset.write(tmp_path.as_posix(), dataset)
+    for lexicon in [list(range(-10, 11)), list(range(-5, 6)), [True, False, 3]]:
+        encoder = IOEncoder(64, lexicon)
+        for task, original in zip(columnar, dataset):
+            assert torch.equal(encoder.encode(task), encoder.encode(original))
+
+
+def test_reproduce(tmp_path: pathlib.Path) -> None:
+    dataset = random_dataset(100, [FunctionType(INT, List(INT), INT)])
+    # Without solutions the grammars have the default depth
+    for task in dataset:
+        task.solution = None
+    columnar = ColumnarDataset.write(tmp_path.as_posix(), dataset)
+    generators = [
+        reproduce_int_dataset(d, dsl, DSLEvaluator(semantics), seed=1)
+        for d in [dataset, columnar]
+    ]
+    assert generators[0][1] == generators[1][1]
+    for _ in range(20):
+        tasks = [generator.generate_task() for generator, _ in generators]
+        assert tasks[0] == tasks[1]
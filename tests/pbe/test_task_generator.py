@@ -1,3 +1,5 @@
+from typing import List as TList
+
 from synth.generation.sampler import LexiconSampler
 from synth.pbe.task_generator import TaskGenerator, basic_output_validator
 from synth.semantic.evaluator import DSLEvaluator
@@ -11,6 +13,7 @@ from synth.syntax.type_system import (
     List,
     PolymorphicType,
     PrimitiveType,
+    Type,
 )
 
 
@@ -81,4 +84,85 @@ def test_seed() -> None:
         assert g1.generate_task() == g2.generate_task()
 
 
+def test_batched_inputs() -> None:
+    tasks = []
+    for batch_inputs in [True, False]:
+        pcfg = ProbDetGrammar.uniform(CFG.depth_constraint(dsl, type_req, max_depth))
+        pcfg.init_sampling(10)
+        g = TaskGenerator(
+            LexiconSampler(int_lexicon, seed=10),
+            DSLEvaluator(semantics),
+            LexiconSampler([type_req], seed=10),
+            LexiconSampler([2, 3, 4], [0.25, 0.5, 0.25], seed=10),
+            {pcfg},
+            validator,
+            batch_inputs=batch_inputs,
+        )
+        tasks.append([g.generate_task() for _ in range(300)])
+        for task in tasks[-1]:
+            outputs = [ex.output for ex in task.specification.examples]
+            assert len(outputs) in [2, 3, 4]
+            assert len(set(outputs)) == len(outputs)
+            assert all(validator(output) for output in outputs)
+            assert all(
+                x in int_lexicon
+                for ex in task.specification.examples
+                for x in ex.inputs
+            )
+        # The batches adapt to the acceptance rate
+        assert g.difficulty[type_req][0] > 0
+        # The compiled solutions are not kept
+        assert g.evaluator.cache_stats["compiled"] == 0  # type: ignore
+    # Same distribution of tries
+    mean_tries = [sum(task.metadata["tries"] for task in l) / len(l) for l in tasks]
+    assert abs(mean_tries[0] - mean_tries[1]) < 0.5 * max(mean_tries)
+
+
 test_gen()
+
+
+def test_sample_input_hook() -> None:
+    class HookedGenerator(TaskGenerator):
+        calls = 0
+
+        def __sample_input__(self, arguments: TList[Type]) -> TList:
+            HookedGenerator.calls += 1
+            return [1 for _ in arguments]
+
+    pcfg = ProbDetGrammar.uniform(CFG.depth_constraint(dsl, type_req, max_depth))
+    pcfg.init_sampling(10)
+    g = HookedGenerator(
+        LexiconSampler(int_lexicon, seed=10),
+        DSLEvaluator(semantics),
+        LexiconSampler([type_req], seed=10),
+        LexiconSampler([1], seed=10),
+        {pcfg},
+        validator,
+    )
+    for _ in range(10):
+        task = g.generate_task()
+        assert task.specification.examples[0].inputs == [1]
+    assert HookedGenerator.calls >= 10
+
+
+def test_compile_skip_exceptions() -> None:
+    def bad(x: int) -> int:
+        raise ValueError
+
+    bad_syntax = {"+": FunctionType(INT, INT, INT), "bad": FunctionType(INT, INT)}
+    bad_semantics = {"+": semantics["+"], "bad": bad, "1": 1}
+    bad_dsl = DSL({**bad_syntax, "1": INT})
+    pcfg = ProbDetGrammar.uniform(CFG.depth_constraint(bad_dsl, type_req, max_depth))
+    g = TaskGenerator(
+        LexiconSampler(int_lexicon, seed=10),
+        DSLEvaluator(bad_semantics),
+        LexiconSampler([type_req], seed=10),
+        LexiconSampler([1], seed=10),
+        {pcfg},
+        validator,
+        skip_exceptions={ValueError},
+    )
+    program = bad_dsl.parse_program("(+ var0 (bad 1))", type_req)
+    # the invariant (bad 1) fails when compiling
+    assert g.__eval_input__(program, [3]) is None
+    assert g.__compile__(program)([3]) is None
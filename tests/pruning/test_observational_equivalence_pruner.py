@@ -0,0 +1,60 @@
+from synth.pruning.observational_equivalence_pruner import (
+    ObservationalEquivalencePruner,
+)
+from synth.semantic.evaluator import DSLEvaluator, __tuplify__
+from synth.syntax.grammars.cfg import CFG
+from synth.syntax.grammars.heap_search import HeapSearch
+from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
+from synth.syntax.dsl import DSL
+from synth.syntax.type_system import INT, FunctionType
+
+
+syntax = {
+    "+": FunctionType(INT, INT, INT),
+    "-": FunctionType(INT, INT, INT),
+    "1": INT,
+}
+semantics = {
+    "+": lambda x: lambda y: x + y,
+    "-": lambda x: lambda y: x - y,
+    "1": 1,
+}
+inputs = [[-3], [0], [5]]
+dsl = DSL(syntax)
+cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), 3)
+pcfg = ProbDetGrammar.uniform(cfg)
+
+
+def outputs(evaluator: DSLEvaluator, program) -> tuple:
+    return __tuplify__([evaluator.eval(program, input) for input in inputs])
+
+
+def test_no_equivalent_programs() -> None:
+    evaluator = DSLEvaluator(semantics)
+    pruner = ObservationalEquivalencePruner(evaluator, inputs)
+    seen = set()
+    last = 1.0
+    for program in HeapSearch(pcfg, pruner):
+        signature = outputs(evaluator, program)
+        assert signature not in seen
+        seen.add(signature)
+        p = pcfg.probability(program)
+        assert p <= last
+        last = p
+    assert pruner.pruned > 0
+
+
+def test_none_missing() -> None:
+    evaluator = DSLEvaluator(semantics)
+    expected = {outputs(evaluator, program) for program in HeapSearch(pcfg)}
+    pruner = ObservationalEquivalencePruner(evaluator, inputs)
+    found = {outputs(evaluator, program) for program in HeapSearch(pcfg, pruner)}
+    assert found == expected
+
+
+def test_bounded_table() -> None:
+    evaluator = DSLEvaluator(semantics)
+    pruner = ObservationalEquivalencePruner(evaluator, inputs, max_signatures=5)
+    programs = list(HeapSearch(pcfg, pruner))
+    assert pruner.stored == 5
+    assert len(programs) == len(set(programs))
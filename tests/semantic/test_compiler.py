@@ -0,0 +1,70 @@
+from synth.semantic.compiler import compile_program
+from synth.semantic.evaluator import DSLEvaluator
+from synth.syntax.grammars.cfg import CFG
+from synth.syntax.grammars.heap_search import enumerate_prob_grammar
+from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
+from synth.syntax.dsl import DSL
+from synth.syntax.program import Function, Primitive, Variable
+from synth.syntax.type_system import INT, FunctionType
+
+
+syntax = {
+    "+": FunctionType(INT, INT, INT),
+    "+1": FunctionType(INT, INT),
+    "1": INT,
+    "cste": INT,
+}
+
+semantics = {
+    "+": lambda x: lambda y: x + y,
+    "+1": lambda x: x + 1 if x < 3 else 1 // 0,
+    "1": 1,
+    "cste": 0,
+}
+dsl = DSL(syntax)
+cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), 4)
+
+
+def test_compile() -> None:
+    eval = DSLEvaluator(semantics)
+    eval.skip_exceptions.add(ZeroDivisionError)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    for i, program in enumerate(enumerate_prob_grammar(pcfg)):
+        if i >= 2000:
+            break
+        compiled = eval.compile(program)
+        for x in range(-3, 3):
+            assert compiled([x]) == eval.eval(program, [x])
+
+
+def test_parameters() -> None:
+    program = Function(
+        Primitive("+", syntax["+"]),
+        [
+            Primitive("cste", INT),
+            Function(Primitive("+1", syntax["+1"]), [Variable(0, INT)]),
+        ],
+    )
+    compiled = compile_program(program, semantics, set(), ("cste",))
+    for c in range(-3, 3):
+        for x in range(-3, 2):
+            assert compiled([x], c) == x + 1 + c
+
+
+def test_invariant() -> None:
+    calls = []
+    semantics_with_calls = dict(semantics)
+    semantics_with_calls["+1"] = lambda x: calls.append(x) or x + 1
+    program = Function(
+        Primitive("+", syntax["+"]),
+        [
+            Function(Primitive("+1", syntax["+1"]), [Primitive("1", INT)]),
+            Variable(0, INT),
+        ],
+    )
+    compiled = compile_program(program, semantics_with_calls, set())
+    # (+1 1) is evaluated once at compile time
+    assert len(calls) == 1
+    for x in range(10):
+        assert compiled([x]) == x + 2
+    assert len(calls) == 1
@@ -1,7 +1,15 @@
 from synth.syntax.grammars.cfg import CFG
+from synth.syntax.grammars.heap_search import enumerate_prob_grammar
 from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
-from synth.semantic.evaluator import DSLEvaluator, __tuplify__
+from synth.semantic.evaluation_cache import EvaluationCache
+from synth.semantic.evaluator import (
+    DSLEvaluator,
+    DSLEvaluatorWithConstant,
+    __tuplify__,
+)
 from synth.syntax.dsl import DSL
+from synth.syntax.program import ProgramFactory
+from synth.specification import Example
 from synth.syntax.type_system import (
     INT,
     STRING,
@@ -67,3 +75,239 @@ def test_use_cache() -> None:
                 )
         except Exception as e:
             assert False, e
+
+
+def test_factory() -> None:
+    factory = ProgramFactory()
+    eval = DSLEvaluator(semantics, factory=factory)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    pcfg.init_sampling(0)
+    for _ in range(100):
+        program = pcfg.sample_program(factory=factory)
+        same = dsl.parse_program(str(program), cfg.type_request)
+        assert dsl.parse_program(str(program), cfg.type_request, factory) is program
+        for i in range(-25, 25):
+            assert eval.eval(same, [i]) == program.length() + i - 1
+            # the cache only holds programs of the factory
+            assert all(factory.intern(p) is p for p in eval._cache[__tuplify__([i])])
+
+
+def test_eval_batch() -> None:
+    eval = DSLEvaluator(semantics)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    pcfg.init_sampling(0)
+    programs = [pcfg.sample_program() for _ in range(100)]
+    for target in programs[:10]:
+        examples = [Example([i], target.length() + i - 1) for i in range(-5, 5)]
+        mask = eval.eval_batch(programs, examples)
+        assert len(mask) == len(programs)
+        for program, solved in zip(programs, mask):
+            assert solved == (program.length() == target.length())
+
+
+def test_eval_batch_skip_exceptions() -> None:
+    eval = DSLEvaluator({"+1": lambda x: x + 1 if x < 0 else 1 // 0})
+    eval.skip_exceptions.add(ZeroDivisionError)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    pcfg.init_sampling(0)
+    programs = [pcfg.sample_program() for _ in range(100)]
+    examples = [Example([-2], None)]
+    mask = eval.eval_batch(programs, examples)
+    for program, solved in zip(programs, mask):
+        assert solved == (eval.eval(program, [-2]) is None)
+
+
+def test_eval_batch_shared_cache() -> None:
+    eval = DSLEvaluator({"+1": lambda x: x + 1 if x < 0 else 1 // 0})
+    eval.skip_exceptions.add(ZeroDivisionError)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    pcfg.init_sampling(0)
+    programs = [pcfg.sample_program() for _ in range(100)]
+    outputs = [eval.eval(program, [-2]) for program in programs]
+    hits = eval._cache_hits
+    mask = eval.eval_batch(programs, [Example([-2], None)])
+    # every program was already evaluated by eval
+    assert eval._cache_hits - hits == len(programs)
+    for program, output, solved in zip(programs, outputs, mask):
+        assert solved == (output is None)
+        assert eval.eval(program, [-2]) == output
+
+
+def test_eval_incremental() -> None:
+    eval = DSLEvaluator({"+1": lambda x: x + 1 if x < 0 else 1 // 0})
+    eval.skip_exceptions.add(ZeroDivisionError)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    inputs = [[i] for i in range(-5, 5)]
+    enumerator = enumerate_prob_grammar(pcfg)
+    programs = list(enumerator)
+    outputs = [
+        [eval.eval_incremental(program, inputs, i) for i in range(len(inputs))]
+        for program in programs
+    ]
+    # each unique sub-program is evaluated once per input:
+    # one lookup for itself, one for its function and one for its argument
+    unique = len(enumerator.hash_table_global)
+    assert eval._total_requests <= 3 * unique * len(inputs)
+    for program, program_outputs in zip(programs, outputs):
+        assert program_outputs == [eval.eval(program, input) for input in inputs]
+
+
+def test_bounded_incremental() -> None:
+    pcfg = ProbDetGrammar.uniform(cfg)
+    programs = list(enumerate_prob_grammar(pcfg))
+    unbounded = DSLEvaluator(semantics)
+    for kwargs in [{"cache_size": 20}, {"cache_memory": 1000}]:
+        eval = DSLEvaluator(semantics, **kwargs)  # type: ignore
+        for i in range(50):
+            inputs = [[i], [i + 1]]
+            for program in programs:
+                assert eval.eval_incremental(
+                    program, inputs, 1
+                ) == unbounded.eval_incremental(program, inputs, 1)
+            assert eval.cache_stats["incremental"] <= kwargs.get("cache_size", 20)
+            assert eval._incremental_memory <= kwargs.get("cache_memory", 0)
+        assert eval.cache_stats["evictions"] > 0
+    assert unbounded.cache_stats["incremental"] > 20
+    for keep_cache in [False, True]:
+        eval = DSLEvaluator(semantics, cache_size=100, keep_cache=keep_cache)
+        for program in programs:
+            eval.eval_incremental(program, [[1], [2]], 0)
+        eval.clear_cache()
+        entries = eval.cache_stats["incremental"]
+        # the programs of the next task are other objects and the first input is shared
+        for program in enumerate_prob_grammar(pcfg):
+            eval.eval_incremental(program, [[1], [3]], 0)
+        # nothing is evaluated again with keep_cache
+        assert (eval.cache_stats["incremental"] == entries) == keep_cache
+
+
+def test_bounded_cache() -> None:
+    eval = DSLEvaluator(semantics, cache_size=50)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    pcfg.init_sampling(0)
+    for _ in range(100):
+        program = pcfg.sample_program()
+        for i in range(-25, 25):
+            assert eval.eval(program, [i]) == program.length() + i - 1
+        assert eval.cache_stats["entries"] <= 50
+    stats = eval.cache_stats
+    assert stats["evictions"] > 0
+    assert stats["memory"] > 0
+    assert 0 < stats["hit_rate"] < 1
+    # the last evaluated program is the most recently used
+    assert eval._cache[__tuplify__([24])][program] == program.length() + 23
+
+
+def test_keep_cache() -> None:
+    pcfg = ProbDetGrammar.uniform(cfg)
+    pcfg.init_sampling(0)
+    programs = [pcfg.sample_program() for _ in range(20)]
+    for keep_cache in [False, True]:
+        eval = DSLEvaluator(semantics, cache_size=1000, keep_cache=keep_cache)
+        assert eval.cache_hit_rate == 0
+        for program in programs:
+            eval.eval(program, [1])
+        eval.clear_cache()
+        hits = eval._cache_hits
+        for program in programs:
+            eval.eval(program, [1])
+        # each program is found at once in a kept cache
+        assert (eval._cache_hits - hits == len(programs)) == keep_cache
+
+
+def test_evaluation_cache_inputs() -> None:
+    program = dsl.parse_program("(+1 var0)", FunctionType(INT, INT))
+    cache = EvaluationCache(max_entries=2)
+    cache[(1,)] = {program: 2}
+    cache[(2,)] = {program: 3}
+    del cache[(1,)]
+    # the id of deleted inputs is not given to new inputs
+    cache[(3,)] = {program: 4}
+    assert [cache[key][program] for key in [(2,), (3,)]] == [3, 4]
+    # the inputs are forgotten with their last entry
+    cache[(4,)] = {program: 5}
+    cache.trim()
+    assert list(cache) == [(3,), (4,)]
+    assert cache.entries == 2
+
+
+def test_with_constant_bounded_cache() -> None:
+    constant_semantics = {"+1": lambda x: x + 1, "cste_in": None, "cste_out": None}
+    constant_syntax = {"+1": FunctionType(INT, INT), "cste_in": INT, "cste_out": INT}
+    constant_cfg = CFG.depth_constraint(
+        DSL(constant_syntax), FunctionType(INT, INT), max_depth
+    )
+    pcfg = ProbDetGrammar.uniform(constant_cfg)
+    pcfg.init_sampling(0)
+    programs = [pcfg.sample_program() for _ in range(100)]
+    unbounded = DSLEvaluatorWithConstant(constant_semantics, {INT})
+    for kwargs in [{"cache_size": 20}, {"cache_memory": 1000}]:
+        eval = DSLEvaluatorWithConstant(constant_semantics, {INT}, **kwargs)  # type: ignore
+        for program in programs:
+            for i in range(-5, 5):
+                assert eval.eval_with_constant(
+                    program, [i], 10, 100
+                ) == unbounded.eval_with_constant(program, [i], 10, 100)
+            stats = eval.cache_stats
+            assert stats["entries"] <= kwargs.get("cache_size", stats["entries"])
+            assert stats["memory"] <= kwargs.get("cache_memory", stats["memory"])
+        assert eval.cache_stats["evictions"] > 0
+        eval.clear_cache()
+        assert eval.cache_stats["entries"] == 0
+
+
+def test_bounded_compiled() -> None:
+    constant_semantics = {"+1": lambda x: x + 1, "cste_in": None, "cste_out": None}
+    constant_syntax = {"+1": FunctionType(INT, INT), "cste_in": INT, "cste_out": INT}
+    constant_cfg = CFG.depth_constraint(
+        DSL(constant_syntax), FunctionType(INT, INT), 12
+    )
+    examples = [Example([1], 3)]
+    eval = DSLEvaluator(semantics, cache_size=20)
+    for depth in range(2, 30):
+        program = dsl.parse_program(
+            "(+1 " * depth + "var0" + ")" * depth, cfg.type_request
+        )
+        eval.compile(program)([1])
+        assert eval.cache_stats["compiled"] <= 20
+    eval_cste = DSLEvaluatorWithConstant(constant_semantics, {INT}, cache_size=20)
+    for program in enumerate_prob_grammar(ProbDetGrammar.uniform(constant_cfg)):
+        eval_cste.check_with_constant(program, examples, [0], [0])
+        assert eval_cste.cache_stats["compiled"] <= 20
+    for evaluator in [eval, eval_cste]:
+        assert evaluator.cache_stats["compiled"] > 0
+        assert evaluator.cache_stats["evictions"] > 0
+
+
+def test_check() -> None:
+    eval = DSLEvaluator({"+1": lambda x: x + 1 if x < 0 else 1 // 0})
+    eval.skip_exceptions.add(ZeroDivisionError)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    pcfg.init_sampling(0)
+    programs = [pcfg.sample_program() for _ in range(100)]
+    target = programs[0]
+    # the first example only rejects the variable, the second one rejects the programs of another length
+    examples = [Example([5], None), Example([-10], target.length() - 11)]
+    for program in programs:
+        assert eval.check(program, examples) == all(
+            eval.eval(program, ex.inputs) == ex.output for ex in examples
+        )
+    assert sum(eval.check_rejections) == sum(
+        program.length() != target.length() for program in programs
+    )
+    # the most discriminating example is now tried first
+    assert eval._check_order == [1, 0]
+
+
+def test_check_incremental() -> None:
+    eval = DSLEvaluator({"+1": lambda x: x + 1 if x < 0 else 1 // 0})
+    eval.skip_exceptions.add(ZeroDivisionError)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    target = list(enumerate_prob_grammar(pcfg))[-1]
+    examples = [Example([5], None), Example([-10], target.length() - 11)]
+    for program in enumerate_prob_grammar(pcfg):
+        assert eval.check_incremental(program, examples) == all(
+            eval.eval(program, ex.inputs) == ex.output for ex in examples
+        )
+    # the most discriminating example is tried first, as in check
+    assert eval._check_order == [1, 0]
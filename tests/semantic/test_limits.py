@@ -0,0 +1,75 @@
+from synth.semantic.evaluator import DSLEvaluator
+from synth.semantic.limits import EvaluationLimits
+from synth.specification import Example
+from synth.syntax.dsl import DSL
+from synth.syntax.type_system import INT, FunctionType, List
+
+
+syntax = {
+    "double": FunctionType(List(INT), List(INT)),
+    "square": FunctionType(List(INT), List(INT)),
+    "map": FunctionType(FunctionType(INT, INT), List(INT), List(INT)),
+    "+1": FunctionType(INT, INT),
+}
+
+semantics = {
+    "double": lambda l: l + l,
+    "square": lambda l: [x * x for x in l],
+    "map": lambda f: lambda l: [f(x) for x in l],
+    "+1": lambda x: x + 1,
+}
+dsl = DSL(syntax)
+type_request = FunctionType(List(INT), List(INT))
+
+
+def test_list_length() -> None:
+    limits = EvaluationLimits(max_list_length=10)
+    eval = DSLEvaluator(semantics, limits=limits)
+    program = dsl.parse_program("(double (double var0))", type_request)
+    assert eval.eval(program, [[1, 2]]) == [1, 2] * 4
+    assert eval.eval(program, [[1, 2, 3]]) is None
+    assert limits.violations == 1
+
+
+def test_int_magnitude() -> None:
+    eval = DSLEvaluator(semantics, limits=EvaluationLimits(max_int=100))
+    program = dsl.parse_program("(square (square var0))", type_request)
+    assert eval.eval(program, [[1, 3]]) == [1, 81]
+    assert eval.eval(program, [[1, 4]]) is None
+    assert eval.compile(program)([[1, 4]]) is None
+    assert eval.compile(program)([[1, 3]]) == [1, 81]
+
+
+def test_steps() -> None:
+    limits = EvaluationLimits(max_steps=20)
+    eval = DSLEvaluator(semantics, limits=limits)
+    # the calls made by map to its function argument are counted
+    program = dsl.parse_program("(map +1 var0)", type_request)
+    assert eval.eval(program, [list(range(5))]) == list(range(1, 6))
+    assert eval.eval(program, [list(range(10))]) is None
+    # the budget is per evaluation
+    assert eval.eval(program, [list(range(4))]) == list(range(1, 5))
+    assert eval.compile(program)([list(range(10))]) is None
+    assert eval.compile(program)([list(range(4))]) == list(range(1, 5))
+
+
+def test_steps_not_memoised() -> None:
+    syntax = {
+        "id": FunctionType(List(INT), List(INT)),
+        "cat": FunctionType(List(INT), List(INT), List(INT)),
+    }
+    semantics = {"id": lambda l: l, "cat": lambda a: lambda b: a + b}
+    dsl = DSL(syntax)
+    l = [1, 2, 3, 4, 5]
+    program = dsl.parse_program("(cat (id var0) (id (id (id var0))))", type_request)
+    # eval_incremental stores the outputs of the sub-program objects
+    sub_program = program.arguments[1].arguments[0]
+    eval = DSLEvaluator(semantics, limits=EvaluationLimits(max_steps=18))
+    assert eval.eval(program, [l]) is None
+    # the sub-programs evaluated when running out of steps are not failures
+    assert eval.eval(sub_program, [l]) == l
+    assert eval.eval_incremental(program, [[l]], 0) is None
+    assert eval.eval_incremental(sub_program, [[l]], 0) == l
+    eval = DSLEvaluator(semantics, limits=EvaluationLimits(max_steps=18))
+    mask = eval.eval_batch([program, sub_program], [Example([l], l)])
+    assert mask.tolist() == [False, True]
@@ -0,0 +1,91 @@
+from math import log2
+
+from synth.semantic.evaluator import DSLEvaluator
+from synth.semantic.limits import EvaluationLimits
+from synth.syntax.grammars.bottom_up_search import enumerate_prob_grammar_bottom_up
+from synth.syntax.grammars.cfg import CFG
+from synth.syntax.grammars.heap_search import enumerate_prob_grammar
+from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
+from synth.syntax.dsl import DSL
+from synth.syntax.type_system import (
+    INT,
+    STRING,
+    FunctionType,
+    List,
+    PolymorphicType,
+    PrimitiveType,
+)
+
+
+syntax = {
+    "+": FunctionType(INT, INT, INT),
+    "head": FunctionType(List(PolymorphicType("a")), PolymorphicType("a")),
+    "non_reachable": PrimitiveType("non_reachable"),
+    "1": INT,
+    "non_productive": FunctionType(INT, STRING),
+}
+
+semantics = {"+": lambda x: lambda y: x + y, "1": 1, "head": lambda l: l[0]}
+
+
+def test_unicity_bottomUpSearch() -> None:
+    dsl = DSL(syntax)
+    for max_depth in [3, 4]:
+        cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+        pcfg = ProbDetGrammar.uniform(cfg)
+        seen = set()
+        for program in enumerate_prob_grammar_bottom_up(pcfg):
+            assert program not in seen
+            seen.add(program)
+        assert len(seen) == cfg.size()
+
+
+def test_order_bottomUpSearch() -> None:
+    dsl = DSL(syntax)
+    max_depth = 3
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    enumerator = enumerate_prob_grammar_bottom_up(pcfg)
+    last = 0
+    for program in enumerator:
+        # the cost of a program is at most 1 per derivation away from its -log2 probability
+        cost = -log2(pcfg.probability(program))
+        assert cost >= last - program.length()
+        last = max(last, cost)
+
+
+def test_dedup_bottomUpSearch() -> None:
+    dsl = DSL(syntax)
+    max_depth = 4
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    evaluator = DSLEvaluator(semantics)
+    inputs = [[-2], [0], [3]]
+    enumerator = enumerate_prob_grammar_bottom_up(pcfg, evaluator, inputs)
+    signatures = set()
+    for program in enumerator:
+        outputs = [evaluator.eval(program, input) for input in inputs]
+        assert outputs == enumerator.current_outputs
+        assert tuple(outputs) not in signatures
+        signatures.add(tuple(outputs))
+    assert enumerator.pruned > 0
+    expected = set(
+        tuple(evaluator.eval(program, input) for input in inputs)
+        for program in enumerate_prob_grammar(pcfg)
+    )
+    assert signatures == expected
+
+
+def test_limits_bottomUpSearch() -> None:
+    dsl = DSL(syntax)
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), 4)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    inputs = [[-2], [0], [3]]
+    limits = EvaluationLimits(max_steps=10)
+    signatures = []
+    for evaluator in [DSLEvaluator(semantics), DSLEvaluator(semantics, limits=limits)]:
+        enumerator = enumerate_prob_grammar_bottom_up(pcfg, evaluator, inputs)
+        signatures.append(set(tuple(enumerator.current_outputs) for _ in enumerator))
+    # the budget is spent on each application, not on the whole search
+    assert signatures[0] == signatures[1]
+    assert limits.violations == 0
@@ -1,3 +1,8 @@
+import pathlib
+
+import pytest
+
+import synth.syntax.grammars.cfg as cfg_module
 from synth.syntax.grammars.cfg import CFG
 from synth.syntax.dsl import DSL
 from synth.syntax.program import Primitive
@@ -55,3 +60,37 @@ def test_depth_constraint() -> None:
         assert (
             res not in cfg
         ), f"Program depth:{res.depth()} should NOT be in the TTCFG max_depth:{max_depth}"
+
+
+def test_cache_folder(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    dsl = DSL(syntax)
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), 4)
+    for _ in range(2):
+        cached = CFG.depth_constraint(
+            DSL(syntax), FunctionType(INT, INT), 4, cache_folder=str(tmp_path)
+        )
+        assert cached == cfg
+        assert str(cached) == str(cfg)
+    assert len(list(tmp_path.glob("cfg_*.pickle"))) == 1
+    CFG.depth_constraint(dsl, FunctionType(INT, INT), 5, cache_folder=str(tmp_path))
+    assert len(list(tmp_path.glob("cfg_*.pickle"))) == 2
+    # the files of another version are not loaded
+    monkeypatch.setattr(cfg_module, "__CACHE_VERSION__", -1)
+    CFG.depth_constraint(dsl, FunctionType(INT, INT), 5, cache_folder=str(tmp_path))
+    assert len(list(tmp_path.glob("cfg_*.pickle"))) == 3
+
+
+def test_arguments_table() -> None:
+    dsl = DSL(syntax)
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), 4)
+    table = cfg.arguments_table()
+    assert set(table) == set(cfg.rules)
+    var0 = dsl.parse_program("var0", FunctionType(INT, INT))
+    for S in cfg.rules:
+        for P in cfg.rules[S]:
+            assert len(table[S][P]) == cfg.arguments_length_for(S, P)
+            if len(table[S][P]) == 2:
+                information, current = cfg.derive(cfg.start_information(), S, P)
+                assert table[S][P][0] == current
+                _, lst = cfg.derive_all(information, current, var0)
+                assert table[S][P][1] == lst[-1]
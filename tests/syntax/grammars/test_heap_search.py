@@ -1,11 +1,18 @@
+from typing import Any, Tuple
+
+from synth.pruning.pruner import Pruner
 from synth.syntax.grammars.heap_search import (
     Bucket,
+    HeapSearch,
     enumerate_prob_grammar,
+    enumerate_prob_grammar_array,
+    enumerate_prob_grammar_bounded,
     enumerate_bucket_prob_grammar,
 )
 from synth.syntax.grammars.cfg import CFG
 from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
 from synth.syntax.dsl import DSL
+from synth.syntax.program import Primitive, Program, ProgramFactory
 from synth.syntax.type_system import (
     INT,
     STRING,
@@ -13,6 +20,7 @@ from synth.syntax.type_system import (
     List,
     PolymorphicType,
     PrimitiveType,
+    Type,
 )
 
 
@@ -37,6 +45,44 @@ def test_unicity_heapSearch() -> None:
     assert len(seen) == cfg.size()
 
 
+def test_factory_heapSearch() -> None:
+    dsl = DSL(syntax)
+    max_depth = 3
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    factory = ProgramFactory()
+    expected = list(enumerate_prob_grammar(pcfg))
+    programs = list(enumerate_prob_grammar(pcfg, factory))
+    assert programs == expected
+    for program in programs:
+        assert factory.intern(program) is program
+        # sub-programs are shared
+        for sub_program in program.depth_first_iter():
+            assert factory.intern(sub_program) is sub_program
+
+
+class RejectOne(Pruner[Tuple[Tuple[Type, Any], Program]]):
+    def accept(self, obj: Tuple[Tuple[Type, Any], Program]) -> bool:
+        return not (isinstance(obj[1], Primitive) and obj[1].primitive == "1")
+
+
+def test_pruner_heapSearch() -> None:
+    dsl = DSL(syntax)
+    max_depth = 3
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    expected = set()
+    for program in enumerate_prob_grammar(pcfg):
+        if all(str(sub_program) != "1" for sub_program in program.depth_first_iter()):
+            expected.add(program)
+    found = set()
+    for program in HeapSearch(pcfg, RejectOne()):
+        # rejected programs are not used to build larger programs either
+        assert program in expected
+        found.add(program)
+    assert found == expected
+
+
 def test_order_heapSearch() -> None:
     dsl = DSL(syntax)
     max_depth = 3
@@ -49,6 +95,78 @@ def test_order_heapSearch() -> None:
         last = p
 
 
+def test_unicity_arrayHeapSearch() -> None:
+    dsl = DSL(syntax)
+    max_depth = 3
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    seen = set()
+    for program in enumerate_prob_grammar_array(pcfg):
+        assert program not in seen
+        seen.add(program)
+    assert len(seen) == cfg.size()
+
+
+def test_order_arrayHeapSearch() -> None:
+    dsl = DSL(syntax)
+    max_depth = 4
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    expected = [pcfg.probability(program) for program in enumerate_prob_grammar(pcfg)]
+    probabilities = [
+        pcfg.probability(program) for program in enumerate_prob_grammar_array(pcfg)
+    ]
+    assert len(probabilities) == len(expected)
+    for p, q in zip(probabilities, expected):
+        assert abs(p - q) <= 1e-12
+
+
+def test_unicity_costBandSearch() -> None:
+    dsl = DSL(syntax)
+    max_depth = 3
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    for max_programs in [3, 10, 1000]:
+        seen = set()
+        for program in enumerate_prob_grammar_bounded(pcfg, max_programs):
+            assert program not in seen
+            seen.add(program)
+        assert len(seen) == cfg.size()
+
+
+def test_order_costBandSearch() -> None:
+    dsl = DSL(syntax)
+    max_depth = 4
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    expected = [pcfg.probability(program) for program in enumerate_prob_grammar(pcfg)]
+    for max_programs in [10, 1000]:
+        probabilities = [
+            pcfg.probability(program)
+            for program in enumerate_prob_grammar_bounded(pcfg, max_programs)
+        ]
+        assert len(probabilities) == len(expected)
+        for p, q in zip(probabilities, expected):
+            assert abs(p - q) <= 1e-12
+
+
+def test_zero_probability_costBandSearch() -> None:
+    dsl = DSL(syntax)
+    max_depth = 3
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    P = list(pcfg.probabilities[pcfg.start].keys())[0]
+    pcfg.probabilities[pcfg.start][P] = 0
+    expected = list(enumerate_prob_grammar(pcfg))
+    programs = list(enumerate_prob_grammar_bounded(pcfg, 10))
+    assert set(programs) == set(expected)
+    assert len(programs) == len(expected)
+    probabilities = [pcfg.probability(program) for program in programs]
+    assert 0 in probabilities
+    for p, q in zip(probabilities, probabilities[1:]):
+        assert p >= q - 1e-12
+
+
 def test_unicity_bucketSearch() -> None:
     dsl = DSL(syntax)
     max_depth = 3
@@ -1,57 +1,79 @@
-# from synth.syntax.grammars.heap_search import enumerate_pcfg
-# from synth.syntax.grammars.pcfg_splitter import split
-# from synth.syntax.grammars.cfg import CFG
-# from synth.syntax.grammars.concrete_pcfg import ConcretePCFG
-# from synth.syntax.dsl import DSL
-# from synth.syntax.type_system import (
-#     INT,
-#     STRING,
-#     FunctionType,
-#     List,
-#     PolymorphicType,
-#     PrimitiveType,
-# )
-
-
-# syntax = {
-#     "+": FunctionType(INT, INT, INT),
-#     "-": FunctionType(INT, INT, INT),
-#     "head": FunctionType(List(PolymorphicType("a")), PolymorphicType("a")),
-#     "non_reachable": PrimitiveType("non_reachable"),
-#     "1": INT,
-#     "non_productive": FunctionType(INT, STRING),
-# }
-
-
-# def test_unicity() -> None:
-#     dsl = DSL(syntax)
-#     max_depth = 4
-#     cfg = CFG.from_dsl(dsl, FunctionType(INT, INT), max_depth)
-#     pcfg = ConcretePCFG.uniform(cfg)
-#     for splits in [2, 4, 5]:
-#         fragments, _ = split(pcfg, splits, desired_ratio=1.05)
-#         seen = set()
-#         for sub_pcfg in fragments:
-#             for program in enumerate_pcfg(sub_pcfg):
-#                 assert program not in seen
-#                 seen.add(program)
-
-
-# def prout_test_none_missing() -> None:
-#     dsl = DSL(syntax)
-#     max_depth = 3
-#     cfg = CFG.from_dsl(dsl, FunctionType(INT, INT), max_depth)
-#     pcfg = ConcretePCFG.uniform(cfg)
-#     seen = set()
-#     for program in enumerate_pcfg(pcfg):
-#         seen.add(program)
-#     for splits in [2, 4, 5]:
-#         fragments, _ = split(pcfg, splits, desired_ratio=1.05)
-#         new_seen = set()
-#         for sub_pcfg in fragments:
-#             a = set()
-#             for program in enumerate_pcfg(sub_pcfg):
-#                 a.add(program)
-#             new_seen |= a
-#         assert len(seen.difference(new_seen)) == 0, seen.difference(new_seen)
-#         assert len(new_seen.difference(seen)) == 0, new_seen.difference(seen)
+from synth.syntax.grammars.heap_search import enumerate_prob_grammar
+from synth.syntax.grammars.pcfg_splitter import split
+from synth.syntax.grammars.cfg import CFG
+from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
+from synth.syntax.dsl import DSL
+from synth.syntax.type_system import (
+    INT,
+    STRING,
+    FunctionType,
+    List,
+    PolymorphicType,
+    PrimitiveType,
+)
+
+
+syntax = {
+    "+": FunctionType(INT, INT, INT),
+    "-": FunctionType(INT, INT, INT),
+    "head": FunctionType(List(PolymorphicType("a")), PolymorphicType("a")),
+    "non_reachable": PrimitiveType("non_reachable"),
+    "1": INT,
+    "non_productive": FunctionType(INT, STRING),
+}
+
+
+def test_unicity() -> None:
+    dsl = DSL(syntax)
+    max_depth = 4
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    for splits in [2, 4, 5]:
+        fragments, _ = split(pcfg, splits, desired_ratio=1.05)
+        seen = set()
+        for sub_pcfg in fragments:
+            for program in enumerate_prob_grammar(sub_pcfg):
+                assert program not in seen
+                seen.add(program)
+
+
+def test_none_missing() -> None:
+    dsl = DSL(syntax)
+    max_depth = 3
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    seen = set()
+    for program in enumerate_prob_grammar(pcfg):
+        seen.add(program)
+    for splits in [2, 4, 5]:
+        fragments, _ = split(pcfg, splits, desired_ratio=1.05)
+        new_seen = set()
+        for sub_pcfg in fragments:
+            a = set()
+            for program in enumerate_prob_grammar(sub_pcfg):
+                a.add(program)
+            new_seen |= a
+        assert len(seen.difference(new_seen)) == 0, seen.difference(new_seen)
+        assert len(new_seen.difference(seen)) == 0, new_seen.difference(seen)
+
+
+def test_probabilities() -> None:
+    dsl = DSL(syntax)
+    max_depth = 3
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+    pcfg = ProbDetGrammar.uniform(cfg)
+    fragments, ratio = split(pcfg, 4, desired_ratio=1.05)
+    assert len(fragments) == 4
+    masses = []
+    for sub_pcfg in fragments:
+        last = 1.0
+        mass = 0.0
+        for program in enumerate_prob_grammar(sub_pcfg):
+            p = sub_pcfg.probability(program)
+            assert abs(p - pcfg.probability(program)) <= 1e-12
+            assert p <= last
+            last = p
+            mass += p
+        masses.append(mass)
+    assert abs(sum(masses) - 1) <= 1e-6
+    assert abs(max(masses) / min(masses) - ratio) <= 1e-6
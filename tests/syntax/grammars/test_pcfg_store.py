@@ -0,0 +1,99 @@
+import random
+
+import numpy as np
+
+from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
+from synth.syntax.grammars.cfg import CFG
+from synth.syntax.grammars.pcfg_store import PCFGStore
+from synth.syntax.dsl import DSL
+from synth.syntax.type_system import (
+    INT,
+    STRING,
+    FunctionType,
+    List,
+    PolymorphicType,
+    PrimitiveType,
+)
+
+
+syntax = {
+    "+": FunctionType(INT, INT, INT),
+    "-": FunctionType(INT, INT, INT),
+    "head": FunctionType(List(PolymorphicType("a")), PolymorphicType("a")),
+    "non_reachable": PrimitiveType("non_reachable"),
+    "1": INT,
+    "2": INT,
+    "non_productive": FunctionType(INT, STRING),
+}
+dsl = DSL(syntax)
+cfgs = [
+    CFG.depth_constraint(dsl, FunctionType(INT, INT), 4),
+    CFG.depth_constraint(dsl, FunctionType(INT, INT, INT), 3),
+]
+
+
+def random_pcfg(cfg: CFG) -> ProbDetGrammar:
+    return ProbDetGrammar(
+        cfg, {S: {P: random.random() for P in cfg.rules[S]} for S in cfg.rules}
+    )
+
+
+def assert_same(pcfg: ProbDetGrammar, stored: ProbDetGrammar) -> None:
+    assert stored.grammar == pcfg.grammar
+    for S in pcfg.rules:
+        assert set(stored.probabilities[S]) == set(pcfg.probabilities[S])
+        for P, p in pcfg.probabilities[S].items():
+            assert np.isclose(stored.probabilities[S][P], p)
+
+
+def test_append_and_reload(tmp_path) -> None:
+    random.seed(0)
+    pcfgs = [random_pcfg(cfgs[i % 2]) for i in range(7)]
+    store = PCFGStore(str(tmp_path))
+    assert len(store) == 0
+    store.extend(pcfgs[:3])
+    store.append(pcfgs[3])
+    assert len(store) == 4
+    # Reopen and append without rewriting
+    store = PCFGStore(str(tmp_path))
+    assert len(store) == 4
+    store.extend(pcfgs[4:])
+    store = PCFGStore(str(tmp_path))
+    assert len(store) == len(pcfgs)
+    for pcfg, stored in zip(pcfgs, store):
+        assert_same(pcfg, stored)
+    for pcfg, stored in zip(pcfgs[5:], store.iterate(5)):
+        assert_same(pcfg, stored)
+    assert_same(pcfgs[-1], store[-1])
+    # The structure of each grammar is stored once
+    assert len(list(tmp_path.glob("structure_*.pickle"))) == 2
+
+
+def test_missing_derivation(tmp_path) -> None:
+    pcfg = ProbDetGrammar.uniform(cfgs[0])
+    S = next(iter(pcfg.rules))
+    P = next(iter(pcfg.probabilities[S]))
+    del pcfg.probabilities[S][P]
+    store = PCFGStore(str(tmp_path))
+    store.append(pcfg)
+    assert P not in store[0].probabilities[S]
+    assert_same(pcfg, store[0])
+
+
+def test_interrupted_append(tmp_path) -> None:
+    random.seed(1)
+    pcfgs = [random_pcfg(cfg) for cfg in cfgs]
+    store = PCFGStore(str(tmp_path))
+    store.append(pcfgs[0])
+    # Simulate a crash while writing the index entry of a second grammar
+    with open(tmp_path / "probabilities.bin", "ab") as fd:
+        fd.write(b"\0" * 10)
+    with open(tmp_path / "index.bin", "ab") as fd:
+        fd.write(b"\0" * 5)
+    store = PCFGStore(str(tmp_path))
+    assert len(store) == 1
+    store.append(pcfgs[1])
+    store = PCFGStore(str(tmp_path))
+    assert len(store) == 2
+    for pcfg, stored in zip(pcfgs, store):
+        assert_same(pcfg, stored)
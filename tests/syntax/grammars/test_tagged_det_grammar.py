@@ -1,6 +1,8 @@
+import warnings
+
 import numpy as np
 
-from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar
+from synth.syntax.grammars.tagged_det_grammar import ProbDetGrammar, __alias_table__
 from synth.syntax.grammars.cfg import CFG
 from synth.syntax.dsl import DSL
 from synth.syntax.grammars.ttcfg import TTCFG
@@ -85,3 +87,44 @@ def test_depth() -> None:
         g = pcfg.sampling()
         for _ in range(200):
             assert next(g).depth() <= max_depth
+
+
+def test_sample_programs() -> None:
+    dsl = DSL(syntax)
+    for max_depth in [3, 7, 11]:
+        cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), max_depth)
+        pcfg = ProbDetGrammar.uniform(cfg)
+        pcfg.init_sampling(100)
+        cpy = ProbDetGrammar.uniform(cfg)
+        cpy.init_sampling(100)
+        programs = pcfg.sample_programs(2000)
+        assert programs == cpy.sample_programs(2000)
+        for program in programs:
+            assert program in cfg
+            assert program.depth() <= max_depth
+        # The derivations from the start are drawn with their probabilities
+        for P, probability in pcfg.probabilities[cfg.start].items():
+            frequency = sum(
+                1 for program in programs if getattr(program, "function", program) == P
+            ) / len(programs)
+            assert abs(frequency - probability) < 0.05
+
+
+def test_sample_programs_from_samples() -> None:
+    dsl = DSL(syntax)
+    cfg = CFG.depth_constraint(dsl, FunctionType(INT, INT), 5)
+    samples = [
+        dsl.parse_program(p, FunctionType(INT, INT)) for p in ["(+ var0 1)", "(- 1 2)"]
+    ]
+    pcfg = ProbDetGrammar.pcfg_from_samples(cfg, samples)
+    pcfg.init_sampling(1)
+    for program in pcfg.sample_programs(200):
+        assert pcfg.probability(program) > 0
+
+
+def test_alias_table_zero_weights() -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        threshold, alias = __alias_table__(np.zeros(3))
+    assert not np.isnan(threshold).any()
+    assert ((0 <= alias) & (alias < 3)).all()
@@ -1,8 +1,10 @@
 from typing import Generator, List
 import random
 
-from synth.syntax.program import Primitive, Function, Program, Variable
-from synth.syntax.type_system import BOOL, INT, FunctionType
+import gc
+
+from synth.syntax.program import Primitive, Function, Program, ProgramFactory, Variable
+from synth.syntax.type_system import BOOL, INT, STRING, FunctionType
 
 
 def __gen2list__(g: Generator) -> List:
@@ -64,3 +66,64 @@ def test_is_using_all_variables() -> None:
             Primitive("f", FunctionType(*[INT for _ in range(c + 1)])), sub_vars
         )
         assert len(f.used_variables()) == c - 1
+
+
+def test_factory() -> None:
+    factory = ProgramFactory()
+    f = Primitive("f", FunctionType(INT, BOOL, INT))
+    fun = factory.function(f, [Primitive("a", INT), factory.variable(0, BOOL)])
+    same = Function(
+        Primitive("f", FunctionType(INT, BOOL, INT)),
+        [Primitive("a", INT), Variable(0, BOOL)],
+    )
+    assert fun is not same
+    assert factory.intern(same) is fun
+    assert factory.intern(fun) is fun
+    assert factory.function(f, [factory.primitive("a", INT), Variable(0, BOOL)]) is fun
+    other = factory.function(f, [Primitive("b", INT), Variable(0, BOOL)])
+    assert other is not fun and other != fun
+    fun2 = factory.function(f, [fun, Variable(0, BOOL)])
+    assert fun2.arguments[0] is fun
+    assert factory.intern(Function(f, [same, Variable(0, BOOL)])) is fun2
+    assert factory.lambda_(fun) is factory.lambda_(same)
+    # The table does not keep programs alive
+    size = len(factory)
+    del fun2
+    gc.collect()
+    assert len(factory) == size - 1
+
+
+def test_cached_properties() -> None:
+    a, s, b = (
+        Primitive("a", INT),
+        Primitive("s", STRING),
+        Variable(2, BOOL),
+    )
+    f = Primitive("f", FunctionType(INT, BOOL, INT))
+    g = Primitive("g", FunctionType(STRING, INT))
+    fun = Function(f, [Function(g, [s]), b])
+    assert fun.depth() == 3
+    assert fun.length() == 4
+    assert fun.used_variables() == {2}
+    assert Function(f, [a, Variable(0, BOOL)]).used_variables() == {0}
+    assert Function(g, [s]).is_invariant(set())
+    assert not Function(g, [s]).is_invariant({STRING})
+    assert Function(g, [s]).is_invariant({INT})
+    assert not fun.is_invariant(set())
+    assert not hasattr(fun, "__dict__")
+
+
+def test_post_order() -> None:
+    i, b, f = (
+        Primitive("a", INT),
+        Variable(0, BOOL),
+        Primitive("f", FunctionType(INT, BOOL, INT)),
+    )
+    fun = Function(f, [i, b])
+    fun2 = Function(f, [fun, b])
+    fun3 = Function(f, [fun2, b])
+    # the post-order of fun2 is reused
+    assert fun2.post_order() == (f, f, i, b, fun, b, fun2)
+    assert fun3.post_order() == (f, f, f, i, b, fun, b, fun2, b, fun3)
+    assert fun3.post_order() is fun3.post_order()
+    assert list(fun3.depth_first_iter()) == list(fun3.post_order())
@@ -14,6 +14,8 @@ from synth.syntax.type_system import (
     EmptyList,
 )
 from typing import List as TList, Set, Tuple
+import copy
+import pickle
 import random
 
 
@@ -138,3 +140,43 @@ def test_contains() -> None:
     assert BOOL not in t
     assert PolymorphicType("b") in t
     assert Arrow(INT, EmptyList) in t
+
+
+def test_interning() -> None:
+    t = Arrow(List(INT), Arrow(PolymorphicType("a"), PrimitiveType("int")))
+    assert t is FunctionType(List(INT), PolymorphicType("a"), INT)
+    assert pickle.loads(pickle.dumps(t)) is t
+    assert copy.deepcopy(t) is t
+    assert t.unify({"a": BOOL}) is t.unify({"a": BOOL})
+    assert t.unify({"a": BOOL}) is FunctionType(List(INT), BOOL, INT)
+    assert UnknownType() is not UnknownType()
+    assert Arrow(type_in=INT, type_out=BOOL) is Arrow(INT, BOOL)
+    assert List(element_type=INT) is List(INT)
+
+
+def test_unknown_not_kept() -> None:
+    import synth.syntax.type_system as type_system
+
+    caches = [
+        type_system.__TYPES__,
+        type_system.__UNIFICATIONS__,
+        type_system.__ENDS_WITH__,
+    ]
+    sizes = [len(cache) for cache in caches]
+    t = FunctionType(PolymorphicType("a"), List(UnknownType()), INT)
+    assert t.unify({"a": UnknownType()}).arguments()[1].element_type is not None
+    assert FunctionType(INT, UnknownType()).ends_with(UnknownType()) is None
+    assert t.ends_with(INT) is not None
+    assert guess_type([object()]) is not guess_type([object()])
+    # types containing an UnknownType are neither interned nor memoised
+    assert [len(cache) for cache in caches] == sizes
+
+
+def test_ends_with() -> None:
+    t = FunctionType(Arrow(INT, INT), List(INT), INT)
+    assert t.ends_with(INT) == [Arrow(INT, INT), List(INT)]
+    assert t.ends_with(Arrow(List(INT), INT)) == [Arrow(INT, INT)]
+    assert t.ends_with(BOOL) is None
+    # the memoised arguments are not shared
+    t.ends_with(INT).append(BOOL)
+    assert t.ends_with(INT) == [Arrow(INT, INT), List(INT)]
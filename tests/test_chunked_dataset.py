@@ -0,0 +1,93 @@
+import bz2
+import pathlib
+import pickle
+import random
+
+import pytest
+
+from synth.chunked_dataset import ChunkedDataset, DatasetWriter, convert
+from synth.syntax.type_system import INT, FunctionType, List
+from synth.syntax.program import Variable
+from synth.task import Task, Dataset
+from synth.specification import PBE, Example
+
+
+def random_dataset(size: int) -> Dataset[PBE]:
+    random.seed(0)
+    return Dataset(
+        [
+            Task(
+                FunctionType(INT, INT, INT) if i % 2 else FunctionType(List(INT), INT),
+                PBE(
+                    [
+                        Example(
+                            [random.randint(0, 100), random.randint(0, 100)],
+                            random.randint(0, 100),
+                        )
+                        for _ in range(5)
+                    ]
+                ),
+                Variable(0, INT) if random.random() > 0.5 else None,
+                metadata={"index": i},
+            )
+            for i in range(size)
+        ],
+        metadata={"something": False, "else": "is", "coming": 42},
+    )
+
+
+def test_random_access(tmp_path: pathlib.Path) -> None:
+    file_path = (tmp_path / "dataset.pickle").as_posix()
+    dataset = random_dataset(100)
+    with DatasetWriter(file_path, dataset.metadata, chunk_size=7) as writer:
+        writer.extend(dataset)
+    view: ChunkedDataset[PBE] = ChunkedDataset(file_path, cached_blocks=2)
+    assert len(view) == len(dataset)
+    assert view.metadata == dataset.metadata
+    assert view.type_requests() == dataset.type_requests()
+    assert view.tasks == dataset.tasks
+    assert [task for task in view] == dataset.tasks
+    for i in random.sample(range(len(dataset)), 30):
+        assert view[i] == dataset[i]
+    assert view[-1] == dataset[-1]
+    assert view[5:40:3] == dataset[5:40:3]
+    with pytest.raises(IndexError):
+        view[len(dataset)]
+    # Pickling reopens the file
+    assert pickle.loads(pickle.dumps(view)).tasks == dataset.tasks
+
+
+def test_save_and_load(tmp_path: pathlib.Path) -> None:
+    file_path = (tmp_path / "dataset.pickle").as_posix()
+    dataset = random_dataset(50)
+    dataset.save(file_path, chunk_size=8)
+    assert Dataset[PBE].load(file_path) == dataset
+    lazy = Dataset[PBE].load(file_path, lazy=True)
+    assert isinstance(lazy, ChunkedDataset)
+    assert lazy.tasks == dataset.tasks
+    empty: Dataset[PBE] = Dataset([])
+    empty.save(file_path)
+    assert Dataset[PBE].load(file_path) == empty
+
+
+def test_convert(tmp_path: pathlib.Path) -> None:
+    old_path = (tmp_path / "old.pickle").as_posix()
+    new_path = (tmp_path / "new.pickle").as_posix()
+    dataset = random_dataset(30)
+    with bz2.BZ2File(old_path, "w") as fd:
+        pickle.dump(dataset, fd)
+    assert Dataset[PBE].load(old_path) == dataset
+    convert(old_path, new_path)
+    assert Dataset[PBE].load(new_path) == dataset
+
+
+def test_save_over_view(tmp_path: pathlib.Path) -> None:
+    file_path = (tmp_path / "dataset.pickle").as_posix()
+    dataset = random_dataset(50)
+    dataset.save(file_path, chunk_size=8)
+    with Dataset[PBE].load(file_path, lazy=True) as view:  # type: ignore
+        # the file being read is only replaced once written
+        view.save(file_path, chunk_size=4)
+        assert view.tasks == dataset.tasks
+    assert Dataset[PBE].load(file_path) == dataset
+    assert list(tmp_path.iterdir()) == [tmp_path / "dataset.pickle"]
@@ -61,3 +61,32 @@ def test_dataset_behaviour() -> None:
     assert dataset[-5:-1] == dataset.tasks[-5:-1]
     assert dataset.tasks == [x for x in dataset]
     assert len(dataset) == len(dataset.tasks)
+
+
+def test_dataset_manifest(tmp_path: pathlib.Path) -> None:
+    random.seed(0)
+    shards = [
+        Dataset(
+            [
+                Task(
+                    FunctionType(INT, INT),
+                    PBE([Example([random.randint(0, 100)], random.randint(0, 100))]),
+                    metadata={"index": i},
+                )
+                for i in range(10)
+            ]
+        )
+        for _ in range(3)
+    ]
+    for i, shard in enumerate(shards):
+        shard.save((tmp_path / f"dataset.shard{i}.pickle").as_posix())
+    file_path = tmp_path / "dataset.pickle"
+    metadata = {"seed": 0}
+    Dataset.save_manifest(
+        file_path.as_posix(),
+        [{"file": f"dataset.shard{i}.pickle", "size": 10} for i in range(3)],
+        metadata,
+    )
+    loaded = Dataset[PBE].load(file_path.as_posix())
+    assert loaded.tasks == [task for shard in shards for task in shard]
+    assert loaded.metadata == metadata